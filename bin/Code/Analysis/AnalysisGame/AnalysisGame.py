@@ -354,12 +354,7 @@ class AnalysisGame(QtCore.QObject):
     @staticmethod
     def _update_move_indexes(move, mrm, pos_act):
         xcp = move.position_before
-        move.complexity = AnalysisIndexes.calc_complexity(xcp, mrm)
-        move.winprobability = AnalysisIndexes.calc_winprobability(xcp, mrm)
-        move.narrowness = AnalysisIndexes.calc_narrowness(xcp, mrm)
-        move.efficientmobility = AnalysisIndexes.calc_efficientmobility(xcp, mrm)
-        move.piecesactivity = AnalysisIndexes.calc_piecesactivity(xcp, mrm)
-        move.exchangetendency = AnalysisIndexes.calc_exchangetendency(xcp, mrm)
+        AnalysisIndexes.set_move_indexes(move, xcp, mrm)
 
         rm = mrm.li_rm[pos_act]
         nag, _ = mrm.set_nag_color(rm)
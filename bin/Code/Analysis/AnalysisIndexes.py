@@ -1,6 +1,7 @@
 import math
+import os
 from html import escape
-from typing import Any, Tuple, Dict
+from typing import Dict, Tuple
 
 import FasterCode
 
@@ -61,8 +62,77 @@ def _compute_gmo(mrm) -> float:
     return float(gmo34) + (gmo68 ** 0.8) + (gmo100 ** 0.5)
 
 
-def _compute_context_variables(cp, mrm, is_white: bool) -> Dict[str, Any]:
-    """Construye el diccionario de variables para la fórmula."""
+# Variables de las fórmulas, en el orden de los argumentos de las funciones compiladas
+FORMULA_VARIABLES = ("xpiec", "xpie", "xmov", "xeval", "xstm", "xplm", "xshow", "xgmo", "xmat", "xpow", "xcompl")
+
+FORMULA_NAMES = {
+    "abs": abs,
+    "round": round,
+    "min": min,
+    "max": max,
+    "pow": pow,
+    "sqrt": math.sqrt,
+    "log": math.log,
+    "exp": math.exp,
+}
+
+# Índices guardados en cada movimiento analizado: atributo del movimiento, fórmula
+MOVE_INDEXES = (
+    ("complexity", "complexity"),
+    ("winprobability", "winprobability"),
+    ("narrowness", "narrowness"),
+    ("efficientmobility", "efficientmobility"),
+    ("piecesactivity", "piecesactivity"),
+    ("exchangetendency", "simplification"),
+)
+
+
+class Formula:
+    """Fórmula de un fichero .formula compilada a una función de las variables de FORMULA_VARIABLES."""
+
+    def __init__(self, cual: str, path: str, mtime: float):
+        self.cual = cual
+        self.path = path
+        self.mtime = mtime
+        self.function = None
+        self.uses_compl = False
+        try:
+            with open(path, "rt") as f:
+                text = f.read().strip()
+            code = compile(f"lambda {', '.join(FORMULA_VARIABLES)}: ({text})", path, "eval")
+            # Entorno restringido por seguridad
+            self.function = eval(code, {"__builtins__": {}, **FORMULA_NAMES})
+            self.uses_compl = "xcompl" in text
+        except Exception:
+            self.function = None
+
+    def calc(self, variables: tuple, compl: float = 0.0) -> float:
+        if self.function is None:
+            return 0.0
+        try:
+            return float(self.function(*variables, compl))
+        except Exception:
+            return 0.0
+
+
+_dic_formulas: Dict[str, Formula] = {}
+
+
+def get_formula(cual: str) -> Formula:
+    """Fórmula compilada de la caché, se vuelve a compilar si el fichero cambia."""
+    path = Code.path_resource("IntFiles", "Formulas", f"{cual}.formula")
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    formula = _dic_formulas.get(cual)
+    if formula is None or formula.mtime != mtime:
+        formula = _dic_formulas[cual] = Formula(cual, path, mtime)
+    return formula
+
+
+def formula_variables(cp, mrm) -> tuple:
+    """Valores de las variables de las fórmulas, sin xcompl, en el orden de FORMULA_VARIABLES."""
     (
         total_material,
         white_material,
@@ -71,69 +141,78 @@ def _compute_context_variables(cp, mrm, is_white: bool) -> Dict[str, Any]:
         black_pieces,
     ) = _compute_material_balance(cp)
 
+    is_white = cp.is_white
     gmo = _compute_gmo(mrm)
     mov = FasterCode.set_fen(cp.fen())
     base_eval = mrm.li_rm[0].centipawns_abs() if mrm.li_rm else 0
     plm = (cp.num_moves - 1) * 2 + (0 if is_white else 1)
     xshow = 0.01 * (1 if is_white else -1)
 
-    return {
-        "xpiec": white_pieces if is_white else black_pieces,
-        "xpie": white_pieces + black_pieces,
-        "xmov": mov,
-        "xeval": base_eval if is_white else -base_eval,
-        "xstm": 1 if is_white else -1,
-        "xplm": plm,
-        "xshow": xshow,
-        "xgmo": gmo,
-        "xmat": total_material,
-        "xpow": white_material if is_white else black_material,
-    }
+    return (
+        white_pieces if is_white else black_pieces,  # xpiec
+        white_pieces + black_pieces,  # xpie
+        mov,  # xmov
+        base_eval if is_white else -base_eval,  # xeval
+        1 if is_white else -1,  # xstm
+        plm,  # xplm
+        xshow,  # xshow
+        gmo,  # xgmo
+        total_material,  # xmat
+        white_material if is_white else black_material,  # xpow
+    )
+
+
+def calc_formulas(li_cual, variables: tuple) -> list:
+    """Valores de varias fórmulas con las mismas variables, xcompl se calcula una sola vez si se usa."""
+    li_formulas = [get_formula(cual) for cual in li_cual]
+    compl = 0.0
+    if any(formula.uses_compl for formula in li_formulas):
+        compl = get_formula("complexity").calc(variables)
+    return [formula.calc(variables, compl) for formula in li_formulas]
 
 
 def calc_formula(cual: str, cp, mrm) -> float:
-    """Evalúa una fórmula desde un archivo usando el contexto del tablero y análisis."""
+    """Evalúa una fórmula usando el contexto del tablero y análisis."""
     if not mrm.li_rm:
         return 0.0
+    return calc_formulas((cual,), formula_variables(cp, mrm))[0]
 
-    try:
-        formula_path = Code.path_resource("IntFiles", "Formulas", f"{cual}.formula")
-        with open(formula_path, "rt") as f:
-            formula = f.read().strip()
-    except (FileNotFoundError, IOError):
-        return 0.0
-
-    is_white = cp.is_white
-    context = _compute_context_variables(cp, mrm, is_white)
-
-    # Reemplazo de variables en la fórmula
-    for key, value in context.items():
-        if key in formula:
-            formula = formula.replace(key, f"{float(value):.10f}")
 
-    # Soporte para xcompl (recursivo)
-    if "xcompl" in formula:
-        compl_value = calc_formula("complexity", cp, mrm)
-        formula = formula.replace("xcompl", f"{compl_value:.10f}")
+def set_move_indexes(move, cp, mrm):
+    """Calcula y guarda en el movimiento los índices de MOVE_INDEXES."""
+    if mrm.li_rm:
+        li_values = calc_formulas([cual for key, cual in MOVE_INDEXES], formula_variables(cp, mrm))
+    else:
+        li_values = [0.0] * len(MOVE_INDEXES)
+    for (key, cual), value in zip(MOVE_INDEXES, li_values):
+        setattr(move, key, value)
+
+
+def set_game_indexes(game, only_missing: bool = True):
+    """
+    Índices de MOVE_INDEXES de todos los movimientos analizados de la partida:
+    primero la matriz de variables de todas las posiciones, luego cada fórmula compilada sobre ella.
+    """
+    li_moves = [
+        move for move in game.li_moves if move.analysis and not (only_missing and hasattr(move, "complexity"))
+    ]
+    if not li_moves:
+        return
+    matrix = []
+    for move in li_moves:
+        mrm = move.analysis[0]
+        matrix.append(formula_variables(move.position_before, mrm) if mrm.li_rm else None)
+
+    li_formulas = [get_formula(cual) for key, cual in MOVE_INDEXES]
+    if any(formula.uses_compl for formula in li_formulas):
+        formula_compl = get_formula("complexity")
+        li_compl = [formula_compl.calc(variables) if variables else 0.0 for variables in matrix]
+    else:
+        li_compl = [0.0] * len(matrix)
 
-    try:
-        # Entorno restringido para eval por seguridad
-        allowed_names = {
-            "abs": abs,
-            "round": round,
-            "min": min,
-            "max": max,
-            "pow": pow,
-            "sqrt": math.sqrt,
-            "log": math.log,
-            "exp": math.exp,
-        }
-
-        # Evaluar con entorno restringido
-        result = eval(formula, {"__builtins__": {}}, allowed_names)
-        return float(result)
-    except Exception:
-        return 0.0
+    for (key, cual), formula in zip(MOVE_INDEXES, li_formulas):
+        for move, variables, compl in zip(li_moves, matrix, li_compl):
+            setattr(move, key, formula.calc(variables, compl) if variables else 0.0)
 
 
 def lb_levels(x):
@@ -316,6 +395,7 @@ def gen_indexes(game, elos, alm):
 
     n = {True: 0, False: 0}
     nmoves_analyzed = {True: 0, False: 0}
+    set_game_indexes(game)
     for move in game.li_moves:
         is_white = move.is_white()
         if move.analysis:
@@ -345,14 +425,6 @@ def gen_indexes(game, elos, alm):
                 domination[not is_white] += 1
             average[is_white] += mrm.li_rm[0].centipawns_abs() - pts
 
-            if not hasattr(move, "complexity"):
-                cp = move.position_before
-                move.complexity = calc_complexity(cp, mrm)
-                move.winprobability = calc_winprobability(cp, mrm)
-                move.narrowness = calc_narrowness(cp, mrm)
-                move.efficientmobility = calc_efficientmobility(cp, mrm)
-                move.piecesactivity = calc_piecesactivity(cp, mrm)
-                move.exchangetendency = calc_exchangetendency(cp, mrm)
             complexity[is_white] += move.complexity
             narrowness[is_white] += move.narrowness
             efficientmobility[is_white] += move.efficientmobility
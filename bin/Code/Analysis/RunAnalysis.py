@@ -26,6 +26,7 @@ from Code.Base.Constantes import (
     RUNA_PAUSE,
     RUNA_RESUME,
     RUNA_PROGRESS,
+    RUNA_POSITION,
 )
 from Code.BestMoveTraining import BMT
 from Code.Config import Configuration
@@ -34,9 +35,8 @@ from Code.Engines.EngineManagerAnalysis import EngineManagerAnalysis
 from Code.Nags.Nags import NAG_3
 from Code.Openings import OpeningsStd
 from Code.QT import QTUtils
-from Code.SQL import UtilSQL
 from Code.Themes import AssignThemes
-from Code.Z import Util
+from Code.Z import Util, UtilIPC
 
 
 class CPU:
@@ -44,8 +44,8 @@ class CPU:
 
     def __init__(self, filebase: str):
         # Configuración de IPC
-        self.ipc_send = UtilSQL.IPC(f"{filebase}_receive.sqlite", False)
-        self.ipc_receive = UtilSQL.IPC(f"{filebase}_send.sqlite", False)
+        self.ipc_send = UtilIPC.IPC(f"{filebase}_receive.ipc", False)
+        self.ipc_receive = UtilIPC.IPC(f"{filebase}_send.ipc", False)
 
         # Estado del análisis
         self.configuration: Optional[Configuration.Configuration] = None
@@ -68,6 +68,7 @@ class CPU:
         self._last_progress_npos = 0
         self._progress_interval = 0.15
         self._progress_delta = 5
+        self.with_progress = True
 
     def xreceive(self) -> None:
         """Recibe órdenes del proceso principal, vaciando toda la cola IPC"""
@@ -103,6 +104,8 @@ class CPU:
 
         if key == RUNA_CONFIGURATION:
             self._process_configuration(orden)
+        elif key == RUNA_POSITION:
+            self._process_position(orden)
         elif key == RUNA_GAME:
             self._process_game(orden)
         elif key == RUNA_TERMINATE:
@@ -156,7 +159,26 @@ class CPU:
         """Procesa un juego para análisis"""
         game = orden.dv["GAME"]
         recno = orden.dv["RECNO"]
+        dic_analysis = orden.dv.get("ANALYSIS")
+        if dic_analysis:
+            self.ag.set_analysis_positions(dic_analysis)
+        self.with_progress = dic_analysis is None  # the progress of the positions is shown by the scheduler
         self.analyze(game, recno)
+        self.with_progress = True
+
+    def _process_position(self, orden: RunAnalysisControl.Orden) -> None:
+        """Analiza una posición con las jugadas que se han hecho en ella"""
+        if self.is_closed:
+            return
+        self.is_analyzing = True
+        mrm = self.ag.analyze_position(orden.dv["FEN"], orden.dv["PV"], orden.dv["MOVES"], orden.dv["MRM"])
+        self.is_analyzing = False
+
+        orden_resp = RunAnalysisControl.Orden()
+        orden_resp.key = RUNA_POSITION
+        orden_resp.set("FENM2", orden.dv["FENM2"])
+        orden_resp.set("MRM", mrm)
+        self.send(orden_resp)
 
     def _check_data(self):
         # Guard de re-entrancia: si ya estamos analizando un juego, solo
@@ -166,7 +188,8 @@ class CPU:
         if self.is_analyzing:
             self._process_control_orders()
             return
-        self.procesa()
+        while self.procesa() and not self.is_paused:  # the orders sent while analyzing, without waiting the timer
+            self.xreceive()
 
     def launch_analysis(self):
         self.ag = AnalyzeGame(self, self.alm)
@@ -231,6 +254,8 @@ class CPU:
         """
         if self.is_closed:
             return False
+        if not self.with_progress:
+            return True
 
         now = time.monotonic()
         should_send = False
@@ -712,33 +737,43 @@ class AnalyzeGame:
         timer.stop()
         return not self.cpu.is_closed
 
+    def set_analysis_positions(self, dic_analysis: dict):
+        """Análisis de las posiciones hechos por los workers, fenm2 -> mrm, xprocesa los toma de la cache"""
+        for fenm2, mrm in dic_analysis.items():
+            self.manager_analysis.cache_analysis[fenm2] = mrm
+
+    def analyze_position(self, fen, pv, li_moves, mrm):
+        """Analiza la posición tras pv, añadiendo al mrm las jugadas de li_moves que no estén. None si se cancela"""
+
+        def gui_dispatch(rm, ms):
+            return self.check_pause_close()
+
+        for a1h8 in li_moves:
+            if mrm is not None and mrm.search_rm(a1h8)[1] >= 0:
+                continue
+            if not self.check_pause_close():
+                return None
+            game = Game.Game(fen=fen)
+            game.read_pv(f"{pv} {a1h8}" if pv else a1h8)
+            movement = len(game) - 1
+            if mrm is None:
+                mrm, pos = self.manager_analysis.analyze_move(game, movement, gui_dispatch)
+                if mrm is None or pos < 0:
+                    return None
+            else:
+                mrm = self.manager_analysis.add_move_analysis(mrm, game, movement, gui_dispatch)
+                if mrm is None:
+                    return None
+                mrm.ordena()
+                self.manager_analysis.set_cache(game.move(movement).position_before.fenm2(), mrm)
+        return mrm
+
     def xprocesa(self, game):
         self.si_bmt_blunders = False
         self.si_bmt_brilliancies = False
         self.si_mates = False
 
-        if self.alm.num_moves:
-            li_moves = []
-            lni = Util.ListaNumerosImpresion(self.alm.num_moves)
-            num_move = int(game.first_num_move())
-            is_white = not game.starts_with_black
-            for nRaw in range(game.num_moves()):
-                must_save = lni.if_in_list(num_move)
-                if must_save:
-                    if is_white:
-                        if not self.alm.white:
-                            must_save = False
-                    elif not self.alm.black:
-                        must_save = False
-                if must_save:
-                    li_moves.append(nRaw)
-                is_white = not is_white
-                if is_white:
-                    num_move += 1
-
-            self.li_selected = li_moves
-        else:
-            self.li_selected = None
+        self.li_selected = RunAnalysisControl.selected_moves(self.alm, game) if self.alm.num_moves else None
 
         si_blunders = self.pgnblunders or self.oriblunders or self.bmtblunders or self.tacticblunders
         si_brilliancies = self.fnsbrilliancies or self.pgnbrilliancies or self.bmtbrilliancies
@@ -752,36 +787,7 @@ class AnalyzeGame:
 
         xlibro_aperturas = self.book
 
-        is_white = self.white
-        is_black = self.black
-
-        if self.li_players:
-            for x in ["BLACK", "WHITE"]:
-                player = game.get_tag(x)
-                if player:
-                    player = player.upper()
-                    si = False
-                    for uno in self.li_players:
-                        si_z = uno.endswith("*")
-                        si_a = uno.startswith("*")
-                        uno = uno.replace("*", "").strip().upper()
-                        if si_a:
-                            if player.endswith(uno):
-                                si = True
-                            if si_z:  # form para poner si_a y si_z
-                                si = uno in player
-                        elif si_z:
-                            if player.startswith(uno):
-                                si = True
-                        elif uno == player:
-                            si = True
-                        if si:
-                            break
-                    if not si:
-                        if x == "BLACK":
-                            is_black = False
-                        else:
-                            is_white = False
+        is_white, is_black = RunAnalysisControl.players_sides(self.li_players, game, self.white, self.black)
 
         if not (is_white or is_black):
             return
@@ -876,12 +882,7 @@ class AnalyzeGame:
 
                 cp = move.position_before
                 mrm, pos_act = move.analysis
-                move.complexity = AnalysisIndexes.calc_complexity(cp, mrm)
-                move.winprobability = AnalysisIndexes.calc_winprobability(cp, mrm)
-                move.narrowness = AnalysisIndexes.calc_narrowness(cp, mrm)
-                move.efficientmobility = AnalysisIndexes.calc_efficientmobility(cp, mrm)
-                move.piecesactivity = AnalysisIndexes.calc_piecesactivity(cp, mrm)
-                move.exchangetendency = AnalysisIndexes.calc_exchangetendency(cp, mrm)
+                AnalysisIndexes.set_move_indexes(move, cp, mrm)
 
                 rm = mrm.li_rm[pos_act]
                 nag, color = mrm.set_nag_color(rm)
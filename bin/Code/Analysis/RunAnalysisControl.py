@@ -16,11 +16,11 @@ from Code.Base.Constantes import (
     RUNA_PAUSE,
     RUNA_RESUME,
     RUNA_PROGRESS,
+    RUNA_POSITION,
 )
 from Code.BestMoveTraining import BMT
 from Code.QT import Colocacion, Controles, Iconos, LCDialog, ScreenUtils
-from Code.SQL import UtilSQL
-from Code.Z import Util, XRun
+from Code.Z import Util, UtilIPC, XRun
 
 
 class Orden:
@@ -50,11 +50,11 @@ class IPCAnalysis:
 
         folder_tmp = Code.configuration.temporary_folder()
         filebase = Util.opj(folder_tmp, huella)
-        file_send = f"{filebase}_send.sqlite"
-        file_receive = f"{filebase}_receive.sqlite"
+        file_send = f"{filebase}_send.ipc"
+        file_receive = f"{filebase}_receive.ipc"
 
-        self.ipc_send = UtilSQL.IPC(file_send, True)
-        self.ipc_receive = UtilSQL.IPC(file_receive, True)
+        self.ipc_send = UtilIPC.IPC(file_send, True)
+        self.ipc_receive = UtilIPC.IPC(file_receive, True)
 
         orden = Orden()
         orden.key = RUNA_CONFIGURATION
@@ -113,13 +113,34 @@ class Worker:
     def __init__(self, alm):
         self.huella = Util.huella()
         self.ipc = IPCAnalysis(alm, self.huella)
+        self.in_flight = collections.deque()  # (RUNA_GAME, recno) or (RUNA_POSITION, fenm2) in the order sent
+        self.num_positions = 0
+        self.terminated = False
 
-    def send_game(self, game, recno):
+    def send_game(self, game, recno, dic_analysis=None):
         orden = Orden()
         orden.key = RUNA_GAME
         orden.dv["GAME"] = game
         orden.dv["RECNO"] = recno
+        if dic_analysis:
+            orden.dv["ANALYSIS"] = dic_analysis
         self.ipc.send(orden)
+        self.in_flight.append((RUNA_GAME, recno))
+
+    def send_position(self, task):
+        orden = Orden()
+        orden.key = RUNA_POSITION
+        orden.dv["FENM2"] = task.fenm2
+        orden.dv["FEN"] = task.fen
+        orden.dv["PV"] = task.pv
+        orden.dv["MOVES"] = sorted(task.st_moves)
+        orden.dv["MRM"] = task.mrm
+        self.ipc.send(orden)
+        self.in_flight.append((RUNA_POSITION, task.fenm2))
+
+    def received(self):
+        if self.in_flight:
+            self.in_flight.popleft()
 
     def close(self):
         if not self.ipc.closed:
@@ -145,15 +166,113 @@ class Worker:
         self.ipc.send_pause()
 
     def send_terminate(self):
+        self.terminated = True
         self.ipc.send_terminate()
 
 
+def players_sides(li_players, game, is_white, is_black):
+    """
+    (is_white, is_black): the sides to analyze, when there is a list of players only the sides they play.
+    """
+    if li_players:
+        for x in ["BLACK", "WHITE"]:
+            player = game.get_tag(x)
+            if player:
+                player = player.upper()
+                si = False
+                for uno in li_players:
+                    si_z = uno.endswith("*")
+                    si_a = uno.startswith("*")
+                    uno = uno.replace("*", "").strip().upper()
+                    if si_a:
+                        if player.endswith(uno):
+                            si = True
+                        if si_z:  # form para poner si_a y si_z
+                            si = uno in player
+                    elif si_z:
+                        if player.startswith(uno):
+                            si = True
+                    elif uno == player:
+                        si = True
+                    if si:
+                        break
+                if not si:
+                    if x == "BLACK":
+                        is_black = False
+                    else:
+                        is_white = False
+    return is_white, is_black
+
+
+def selected_moves(alm, game):
+    """
+    Positions of the moves to analyze, all of them or the numbers of moves in alm.num_moves.
+    """
+    if not alm.num_moves:
+        return list(range(len(game)))
+    li_moves = []
+    lni = Util.ListaNumerosImpresion(alm.num_moves)
+    num_move = int(game.first_num_move())
+    is_white = not game.starts_with_black
+    for nRaw in range(game.num_moves()):
+        must_save = lni.if_in_list(num_move)
+        if must_save:
+            if is_white:
+                if not alm.white:
+                    must_save = False
+            elif not alm.black:
+                must_save = False
+        if must_save:
+            li_moves.append(nRaw)
+        is_white = not is_white
+        if is_white:
+            num_move += 1
+    return li_moves
+
+
+def engine_alm(alm):
+    engines = Code.configuration.engines
+    return engines.engine_analyzer() if alm.engine == "default" else engines.search(alm.engine)
+
+
+def positions_to_analyze(alm, game, book, full_history=False):
+    """
+    List of (fenm2, fen, pv, move) of the moves of the game that the worker will analyze, the same selection
+    than AnalyzeGame.xprocesa. fen and pv are the position before the move as Game.fen_pv_hasta, only the moves
+    after the last capture or pawn move are sent and replayed, or all of them with full_history.
+    """
+    is_white, is_black = players_sides(alm.li_players, game, alm.white, alm.black)
+    if not (is_white or is_black):
+        return []
+
+    li_pos_moves = selected_moves(alm, game)
+    if book is not None:
+        while li_pos_moves and book.get_list_moves(game.move(li_pos_moves[0]).position.fen()):
+            del li_pos_moves[0]
+
+    li_resp = []
+    for pos_move in li_pos_moves:
+        move = game.move(pos_move)
+        if alm.standard_openings and move.in_the_opening:
+            continue
+        if not (is_white if move.position_before.is_white else is_black):
+            continue
+        if not alm.delete_previous and move.analysis:
+            continue
+        if full_history:
+            fen = None if game.is_fen_initial() else game.first_position.fen()
+            pv = game.pv_hasta(pos_move - 1)
+        else:
+            fen, pv = game.fen_pv_hasta(pos_move - 1)
+        li_resp.append((move.position_before.fenm2(), fen, pv, move.movimiento()))
+    return li_resp
+
+
 class ListRegs:
     def __init__(self, db_games, nregs: int, li_seleccionadas):
         self.db_games = db_games
         self.li_recnos = li_seleccionadas if li_seleccionadas else list(range(nregs))
         self._prefetch_lock = threading.Lock()
-        self.dic_worker = {}
 
     def get_next_for_prefetch(self):
         with self._prefetch_lock:
@@ -161,24 +280,10 @@ class ListRegs:
                 return None
             return self.li_recnos.pop(0)
 
-    def assign_to_worker(self, worker, recno):
-        self.dic_worker[worker.huella] = recno
-
     def return_to_queue(self, recno):
         with self._prefetch_lock:
             self.li_recnos.insert(0, recno)
 
-    def get_game(self, worker):
-        with self._prefetch_lock:
-            if not self.li_recnos:
-                return None
-            recno = self.li_recnos.pop(0)
-            self.dic_worker[worker.huella] = recno
-            return recno
-
-    def received_game(self, worker):
-        self.dic_worker[worker.huella] = None
-
     def is_finished(self):
         with self._prefetch_lock:
             return len(self.li_recnos) == 0
@@ -187,11 +292,148 @@ class ListRegs:
         with self._prefetch_lock:
             return len(self.li_recnos)
 
-    def remove_worker(self, worker: Worker):
-        recno = self.dic_worker.get(worker.huella)
-        if recno is not None:
-            self.return_to_queue(recno)
-            self.dic_worker[worker.huella] = None
+
+class PositionTask:
+    def __init__(self, fenm2, fen, pv):
+        self.fenm2 = fenm2
+        self.fen = fen
+        self.pv = pv
+        self.st_moves = set()  # moves played in the games, all of them must be in the analysis
+        self.mrm = None
+        self.is_running = False
+        self.is_queued = False
+        self.st_recnos = set()  # games waiting for this analysis
+
+    def is_done(self):
+        if self.mrm is None or self.is_running:
+            return False
+        return all(self.mrm.search_rm(a1h8)[1] >= 0 for a1h8 in self.st_moves)
+
+
+class GameTask:
+    def __init__(self, recno, game):
+        self.recno = recno
+        self.game = game
+        self.st_pending = set()
+        self.dic_analysis = {}
+
+
+class PositionScheduler:
+    """
+    The games are divided in positions, a position repeated in several games (openings) is analyzed once, by fenm2,
+    with all the moves played in it. The workers take the positions one by one from a common queue, so a long game
+    is analyzed by all the workers at the same time. When all the positions of a game are analyzed, the game is sent
+    to a worker with the analysis, to make the rest of the work (indexes, variations, blunders, themes...).
+    """
+
+    def __init__(self, alm, max_open_games: int, max_done: int = 4096):
+        self.alm = alm
+        self.max_open_games = max_open_games
+        self.max_done = max_done
+        self.book = None
+        if alm.book is not None:
+            self.book = alm.book.clone()
+            self.book.polyglot()
+        engine = engine_alm(alm)
+        self.full_history = engine is not None and engine.with_history()
+
+        self.dic_tasks = {}  # fenm2 -> PositionTask of the games open
+        self.dic_done = collections.OrderedDict()  # fenm2 -> PositionTask of the games finished, the last ones
+        self.queue_positions = collections.deque()
+        self.dic_games = {}  # recno -> GameTask waiting for positions
+        self.queue_games = collections.deque()  # GameTask with all the positions analyzed
+        self.num_positions = 0
+        self.num_positions_done = 0
+
+    def can_open_game(self):
+        return len(self.dic_games) + len(self.queue_games) < self.max_open_games
+
+    def is_empty(self):
+        return not self.dic_games and not self.queue_games
+
+    def add_game(self, recno, game):
+        game_task = GameTask(recno, game)
+        for fenm2, fen, pv, a1h8 in positions_to_analyze(self.alm, game, self.book, self.full_history):
+            task = self.dic_tasks.get(fenm2)
+            if task is None:
+                task = self.dic_done.pop(fenm2, None)
+                if task is None:
+                    task = PositionTask(fenm2, fen, pv)
+                self.dic_tasks[fenm2] = task
+            if a1h8 not in task.st_moves:
+                task.st_moves.add(a1h8)
+                if not (task.is_running or task.is_queued or task.is_done()):
+                    self.queue(task)
+                    self.num_positions += 1
+            task.st_recnos.add(recno)
+            game_task.st_pending.add(fenm2)
+
+        self.dic_games[recno] = game_task
+        self.check_game(game_task)
+
+    def check_game(self, game_task: GameTask):
+        for fenm2 in list(game_task.st_pending):
+            task = self.dic_tasks[fenm2]
+            if task.is_done():
+                game_task.st_pending.remove(fenm2)
+                game_task.dic_analysis[fenm2] = task.mrm
+        if not game_task.st_pending:
+            del self.dic_games[game_task.recno]
+            self.queue_games.append(game_task)
+            for fenm2 in game_task.dic_analysis:
+                self.release(fenm2, game_task.recno)
+
+    def release(self, fenm2, recno):
+        task = self.dic_tasks[fenm2]
+        task.st_recnos.discard(recno)
+        if not task.st_recnos:
+            del self.dic_tasks[fenm2]
+            self.dic_done[fenm2] = task
+            if len(self.dic_done) > self.max_done:
+                self.dic_done.popitem(last=False)
+
+    def queue(self, task: PositionTask, first=False):
+        task.is_queued = True
+        if first:
+            self.queue_positions.appendleft(task)
+        else:
+            self.queue_positions.append(task)
+
+    def next_position(self) -> PositionTask | None:
+        if not self.queue_positions:
+            return None
+        task = self.queue_positions.popleft()
+        task.is_queued = False
+        task.is_running = True
+        return task
+
+    def next_game(self) -> GameTask | None:
+        return self.queue_games.popleft() if self.queue_games else None
+
+    def position_analyzed(self, fenm2, mrm):
+        task = self.dic_tasks.get(fenm2)
+        if task is None:
+            return
+        task.is_running = False
+        if mrm is not None:
+            task.mrm = mrm
+        if not task.is_done():  # cancelled or moves added while it was being analyzed
+            self.queue(task, True)
+            return
+        self.num_positions_done += 1
+        for recno in list(task.st_recnos):
+            game_task = self.dic_games.get(recno)
+            if game_task is not None:
+                self.check_game(game_task)
+
+    def position_returned(self, fenm2):
+        task = self.dic_tasks.get(fenm2)
+        if task is not None and task.is_running:
+            task.is_running = False
+            self.queue(task, True)
+
+    def game_returned(self, game_task: GameTask):
+        self.queue_games.appendleft(game_task)
 
 
 class GamePrefetcher(QtCore.QThread):
@@ -257,6 +499,10 @@ class GamePrefetcher(QtCore.QThread):
                 return result
         return None
 
+    def is_empty(self):
+        with self._lock:
+            return not self._buffer
+
     def stop(self):
         self._stop_requested = True
         self._space_available.set()
@@ -290,6 +536,11 @@ class AnalysisMassiveWithWorkers(QtCore.QThread):
         buffer_size = max(8, alm.workers * 2)
         self.prefetcher = GamePrefetcher(self.db_games, self.list_regs, buffer_size)
 
+        self.scheduler = PositionScheduler(alm, max(32, alm.workers * 8))
+        self.max_in_flight = 2  # one to analyze while the next one is sent
+        self.dic_games_sent = {}
+        self.queue_removed = collections.deque()
+
         self._is_canceled = False
         self._is_paused = False
         self._pause_cond = threading.Condition()
@@ -301,12 +552,9 @@ class AnalysisMassiveWithWorkers(QtCore.QThread):
         self.gen_workers()
 
     def gen_workers(self):
-        num_workers = min(self.alm.workers, self.nregs)
-        for num_worker in range(num_workers):
+        for num_worker in range(self.alm.workers):  # a game is analyzed by all the workers
             worker = Worker(self.alm)
             self.li_workers.append(worker)
-            if not self.send_game_worker(worker):
-                break
             self.dic_huellas_workers[worker.huella] = worker
 
     def get_worker(self, huella):
@@ -316,7 +564,6 @@ class AnalysisMassiveWithWorkers(QtCore.QThread):
         worker = Worker(self.alm)
         self.li_workers.append(worker)
         self.dic_huellas_workers[worker.huella] = worker
-        self.send_game_worker(worker)
         self.worker_added.emit(worker)
 
     def remove_worker(self, worker: Worker):
@@ -324,26 +571,65 @@ class AnalysisMassiveWithWorkers(QtCore.QThread):
             del self.dic_huellas_workers[worker.huella]
         if worker in self.li_workers:
             self.li_workers.remove(worker)
-        self.list_regs.remove_worker(worker)
+        self.queue_removed.append(worker)  # the orders sent are returned by the thread of the scheduler
 
-    def send_game_worker(self, worker: Worker):
+    def return_in_flight(self, worker: Worker):
+        while worker.in_flight:
+            key, value = worker.in_flight.pop()
+            if key == RUNA_GAME:
+                self.scheduler.game_returned(self.dic_games_sent.pop(value))
+            else:
+                self.scheduler.position_returned(value)
+
+    def read_game(self):
+        """
+        The next game of the list, None if there are no more or the prefetcher has not read it yet.
+        """
         result = self.prefetcher.get_game()
         if result is not None:
-            recno, game = result
-            self.list_regs.assign_to_worker(worker, recno)
-        else:
-            recno = self.list_regs.get_game(worker)
-            if recno is None:
-                worker.send_terminate()
-                return False
-            try:
-                game = self.db_games.read_game_recno(recno)
-            except sqlite3.ProgrammingError:  # si dos threads lo intentan a la vez
-                worker.send_terminate()
-                return False
-
-        worker.send_game(game, recno)
-        return True
+            return result
+        if self.prefetcher.isRunning():
+            return None
+        recno = self.list_regs.get_next_for_prefetch()
+        if recno is None:
+            return None
+        try:
+            return recno, self.db_games.read_game_recno(recno)
+        except sqlite3.ProgrammingError:  # si dos threads lo intentan a la vez
+            self.list_regs.return_to_queue(recno)
+            return None
+
+    def all_games_read(self):
+        return not self.prefetcher.isRunning() and self.prefetcher.is_empty() and self.list_regs.is_finished()
+
+    def feed_worker(self, worker: Worker):
+        """
+        Keeps max_in_flight orders sent to the worker, first the games ready, to save them soon, then the positions.
+        A worker that finishes before takes more positions, the orders sent can't be taken back.
+        """
+        while len(worker.in_flight) < self.max_in_flight:
+            game_task = self.scheduler.next_game()
+            if game_task is not None:
+                self.dic_games_sent[game_task.recno] = game_task
+                worker.send_game(game_task.game, game_task.recno, game_task.dic_analysis)
+                continue
+
+            task = self.scheduler.next_position()
+            while task is None and self.scheduler.can_open_game():
+                result = self.read_game()
+                if result is None:
+                    break
+                self.scheduler.add_game(*result)
+                if self.scheduler.queue_games:
+                    break
+                task = self.scheduler.next_position()
+            if task is not None:
+                worker.send_position(task)
+            elif not self.scheduler.queue_games:
+                break
+
+        if not worker.in_flight and not worker.terminated and self.scheduler.is_empty() and self.all_games_read():
+            worker.send_terminate()
 
     def cancel_process(self):
         self._is_canceled = True
@@ -374,11 +660,15 @@ class AnalysisMassiveWithWorkers(QtCore.QThread):
             if self._is_canceled:
                 break
 
+            while self.queue_removed:
+                self.return_in_flight(self.queue_removed.popleft())
+
             actives = 0
             for worker in list(self.li_workers):
                 if worker.is_closed():
                     continue
                 if not worker.is_working():
+                    self.return_in_flight(worker)
                     worker.close()
                     continue
 
@@ -388,10 +678,14 @@ class AnalysisMassiveWithWorkers(QtCore.QThread):
                 if order is None:
                     pass
 
+                elif order.key == RUNA_POSITION:
+                    self.run_position(worker, order)
+
                 elif order.key == RUNA_GAME:
                     self.run_game(worker, order)
 
                 elif order.key == RUNA_TERMINATE:
+                    self.return_in_flight(worker)
                     worker.close()
                     actives -= 1
                     continue
@@ -404,6 +698,9 @@ class AnalysisMassiveWithWorkers(QtCore.QThread):
                     if w:
                         self.worker_progress_changed.emit(w, current, total)
 
+                if not worker.is_closed():
+                    self.feed_worker(worker)
+
             if actives == 0:
                 break
 
@@ -425,14 +722,20 @@ class AnalysisMassiveWithWorkers(QtCore.QThread):
         if not self._is_canceled:
             self.finished_successfully.emit()
 
+    def run_position(self, worker: Worker, order: Orden):
+        worker.received()
+        self.scheduler.position_analyzed(order.get("FENM2"), order.get("MRM"))
+        worker.num_positions += 1
+        self.worker_progress_changed.emit(worker, worker.num_positions, self.scheduler.num_positions)
+
     def run_game(self, worker: Worker, order: Orden):
-        self.list_regs.received_game(worker)
-        self.send_game_worker(worker)
+        worker.received()
+        recno = order.get("RECNO")
+        self.dic_games_sent.pop(recno, None)
 
         game: Game.Game = order.get("GAME")
         if self.alm.accuracy_tags:
             game.add_accuracy_tags()
-        recno = order.get("RECNO")
 
         self.num_games_analyzed += 1
         self.game_analyzed.emit(recno, game, self.num_games_analyzed)
@@ -310,7 +310,7 @@ FIRST_BEST_MOVE, ALL_BEST_MOVES, ALL_MOVES, TOP2_FIRST_MOVES, TOP3_FIRST_MOVES =
     "3B",
 )
 
-RUNA_CONFIGURATION, RUNA_GAME, RUNA_TERMINATE, RUNA_HALT, RUNA_PAUSE, RUNA_RESUME, RUNA_PROGRESS = (
+RUNA_CONFIGURATION, RUNA_GAME, RUNA_TERMINATE, RUNA_HALT, RUNA_PAUSE, RUNA_RESUME, RUNA_PROGRESS, RUNA_POSITION = (
     "C",
     "G",
     "T",
@@ -318,6 +318,7 @@ RUNA_CONFIGURATION, RUNA_GAME, RUNA_TERMINATE, RUNA_HALT, RUNA_PAUSE, RUNA_RESUM
     "P",
     "U",
     "R",
+    "S",
 )
 
 TOP_RIGHT, ON_TOOLBAR = "tr", "tb"
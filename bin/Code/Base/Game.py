@@ -1,4 +1,6 @@
 from typing import Any, Dict, Optional, Union, List
+import array
+import sys
 import textwrap
 
 import FasterCode
@@ -49,6 +51,10 @@ from Code.Openings import OpeningsStd
 from Code.Z import Util
 
 
+SAVE_MAGIC = b"LCG"
+SAVE_VERSION = 1
+
+
 class Game:
     """
     Represent a single chess game, including initial position, moves,
@@ -183,25 +189,43 @@ class Game:
 
         If with_litags is False, PGN tags are not included in the saved data.
         """
-        game_data = {
-            "first_position": self.first_position.fen(),
-            "first_comment": self.first_comment,
-            "li_moves": [move.save() for move in self.li_moves],
-            "result": self.result,
-            "termination": self.termination,
-        }
-        if with_litags and self.li_tags:
-            game_data["li_tags"] = self.li_tags
-
         if self.first_position.is_initial():
             self.del_tag("FEN")
-        return Util.var2zip(game_data)
+        return SAVE_MAGIC + bytes([SAVE_VERSION]) + Util.var2zip(self.save_raw(with_litags))
+
+    def save_raw(self, with_litags: bool = True) -> tuple:
+        """
+        Uncompressed structure of save(): the moves as 16 bits codes in a bytes block, and the other data
+        of the moves (comments, nags, times, analysis, variations...) in a side table of (num_move, dict).
+        """
+        codes = array.array("H", [Move.move_code(move.movimiento()) for move in self.li_moves])
+        if sys.byteorder == "big":
+            codes.byteswap()
+        li_extras = []
+        for num, move in enumerate(self.li_moves):
+            if dic := move.save_extras():
+                li_extras.append((num, dic))
+        return (
+            self.first_position.fen(),
+            self.first_comment,
+            self.result,
+            self.termination,
+            self.li_tags if with_litags and self.li_tags else None,
+            codes.tobytes(),
+            li_extras,
+        )
 
     def restore(self, btxt_save) -> None:
         """
-        Restore the game from a compressed bytes object created by save().
+        Restore the game from a compressed bytes object created by save(), or by the previous format,
+        a zipped dict with a zipped dict per move.
         """
         self.reset()
+        if btxt_save and btxt_save.startswith(SAVE_MAGIC):
+            if raw := Util.zip2var(btxt_save[len(SAVE_MAGIC) + 1:]):
+                self.restore_raw(raw)
+            return
+
         game_data = Util.zip2var(btxt_save)
         if not game_data:
             return
@@ -212,16 +236,46 @@ class Game:
         self.termination = game_data["termination"]
         self.li_moves = []
         position_before_move = self.first_position.copia()
+        board = FasterCode.Board(position_before_move.fen())
+        fen_before = None
         for saved_move in game_data["li_moves"]:
             move = Move.Move(self, position_before=position_before_move)
-            move.restore(saved_move)
-            position_before_move = move.position.copia()
+            move.restore(saved_move, board, fen_before)
+            fen_before = move.fen()
             self.li_moves.append(move)
         self.assign_opening()
         self.si3repetidas()
         self.set_result()
         self.li_tags = game_data.get("li_tags", [])
 
+    def restore_raw(self, raw: tuple) -> None:
+        fen, self.first_comment, self.result, self.termination, li_tags, bcodes, li_extras = raw
+        self.first_position = Position.Position()
+        self.first_position.read_fen(fen)
+        codes = array.array("H")
+        codes.frombytes(bcodes)
+        if sys.byteorder == "big":
+            codes.byteswap()
+        dic_extras = dict(li_extras)
+
+        self.li_moves = []
+        position_before_move = self.first_position.copia()
+        board = FasterCode.Board(position_before_move.fen())
+        fen_before = None
+        for num, code in enumerate(codes):
+            a1h8 = Move.code_move(code)
+            move = Move.Move(self, position_before_move, None, a1h8[:2], a1h8[2:4], a1h8[4:])
+            if not move.play_board(board, fen_before):
+                move.position = move.position_before.copia()
+            if num in dic_extras:
+                move.restore_extras(dic_extras[num])
+            fen_before = move.fen()
+            self.li_moves.append(move)
+        self.assign_opening()
+        self.si3repetidas()
+        self.set_result()
+        self.li_tags = li_tags or []
+
     def __eq__(self, other) -> bool:
         return self.save() == other.save()
 
@@ -712,22 +766,16 @@ class Game:
             else:
                 break
 
-        is_white = self.is_white()
+        if not pv:
+            return self
 
+        board = FasterCode.Board(position.fen())
+        fen_before = None
         for mov in pv:
-            from_sq = mov[:2]
-            to_sq = mov[2:4]
-            if len(mov) == 5:
-                promotion = mov[4]
-                if is_white:
-                    promotion = promotion.upper()
-            else:
-                promotion = ""
-            ok, mens, move = Move.get_game_move(self, position, from_sq, to_sq, promotion)
-            if ok:
+            move = Move.Move(self, position_before=position, from_sq=mov[:2], to_sq=mov[2:4], promotion=mov[4:])
+            if move.play_board(board, fen_before):
                 self.li_moves.append(move)
-                position = move.position
-            is_white = not is_white
+                fen_before = move.fen()
         return self
 
     def get_position(self, pos: int) -> Position.Position:
@@ -882,6 +930,18 @@ class Game:
     def pv_hasta(self, njug: int) -> str:
         return " ".join([move.movimiento() for move in self.li_moves[: njug + 1]])
 
+    def fen_pv_hasta(self, njug: int) -> tuple[Optional[str], str]:
+        """
+        (fen, pv) of the position after the move njug, without the moves before the last capture or pawn move:
+        fen is the position after it and pv the moves from it, none of the previous positions can be repeated.
+        fen is None for the initial position, when there is no capture or pawn move it is the first position.
+        """
+        for pos in range(njug, -1, -1):
+            move = self.li_moves[pos]
+            if move.position.mov_pawn_capt == 0:
+                return move.position.fen(), " ".join([mv.movimiento() for mv in self.li_moves[pos + 1 : njug + 1]])
+        return None if self.is_fen_initial() else self.first_position.fen(), self.pv_hasta(njug)
+
     def remove_last_move(self, is_white: bool) -> int:
         del self.li_moves[-1]
         self.set_unknown()
@@ -950,7 +1010,7 @@ class Game:
     def assign_opening(self) -> None:
         OpeningsStd.ap.assign_opening(self)
         if self.is_fen_initial():
-            if self.pending_opening:
+            if self.pending_opening or self.opening is None:
                 self.del_tag("Opening")
                 self.del_tag("ECO")
             else:
@@ -1596,30 +1656,18 @@ def pgn_to_game(pgn):
 
 
 def read_games(pgnfile):
-    with Util.OpenCodec(pgnfile) as f:
-        si_b_cab = True
-        lineas = []
-        nbytes = 0
-        last_line = ""
-        for linea in f:
-            nbytes += len(linea)
-            if si_b_cab:
-                if linea and linea[0] != "[":
-                    si_b_cab = False
-            elif last_line == "" and linea.startswith("["):
-                ln = linea.strip()
-                if ln.endswith("]"):
-                    ln = ln[:-1]
-                    if ln.endswith('"') and ln.count('"') > 1:
-                        ok, p = pgn_game("".join(lineas))
-                        yield nbytes, p
-                        lineas = []
-                        si_b_cab = True
-            lineas.append(linea)
-            last_line = linea.strip()
-        if lineas:
-            ok, p = pgn_game("".join(lineas))
-            yield nbytes, p
+    """
+    Games of a pgn file, with the position in bytes of the end of each one.
+    """
+    decode = Util.Decode()
+    decode.read_file(pgnfile)
+    with FasterCode.PGNreader(pgnfile, 0) as fpgn:
+        for offset, length in fpgn.games_raw():
+            pgn = decode.decode(fpgn.bpgn())
+            if "\r" in pgn:
+                pgn = pgn.replace("\r\n", "\n")
+            ok, p = pgn_game(pgn)
+            yield offset + length, p
 
 
 def game_without_variations(game: Game):
@@ -48,6 +48,7 @@ class Move:
     ):
         self.game = game
         self.analysis = None
+        self._li_extras = []
         self.position_before = position_before
         self.position = position
         self._in_the_opening = None
@@ -74,6 +75,55 @@ class Move:
 
         self._phase = PHASE_NODEFINED
 
+    # Positions can be kept only as FEN (see play_board), and are created on first use.
+    @property
+    def position_before(self):
+        if self._position_before is None and self._fen_before is not None:
+            self._position_before = Position.Position().read_fen(self._fen_before)
+        return self._position_before
+
+    @position_before.setter
+    def position_before(self, position):
+        self._position_before = position
+        self._fen_before = None
+
+    @property
+    def position(self):
+        if self._position is None and self._fen is not None:
+            self._position = Position.Position().read_fen(self._fen)
+            self._position.li_extras = self._li_extras
+        return self._position
+
+    @position.setter
+    def position(self, position):
+        self._position = position
+        self._fen = None
+
+    def play_board(self, board, fen_before=None) -> bool:
+        """
+        Play the move in board (FasterCode.Board in position_before) keeping only the FENs,
+        the Position objects are created when they are needed.
+        fen_before: FEN of position_before, when it is not set as a Position.
+        """
+        if fen_before is not None:
+            self._position_before = None
+            self._fen_before = fen_before
+        mv = board.play_expv(self.from_sq, self.to_sq, self.promotion)
+        if not mv:
+            return False
+        self._position = None
+        self._fen = board.get_fen()
+        self._li_extras = Position.infomove_extras(mv)
+        return True
+
+    def fen(self):
+        return self._fen if self._position is None and self._fen is not None else self.position.fen()
+
+    def fen_before(self):
+        if self._position_before is None and self._fen_before is not None:
+            return self._fen_before
+        return self.position_before.fen()
+
     @property
     def in_the_opening(self) -> bool:
         if self._in_the_opening is None:
@@ -198,6 +248,9 @@ class Move:
         return self.game.is_draw() and self.game.last_jg() == self
 
     def base_pgn(self):
+        if self._position_before is None and self._fen_before is not None:
+            FasterCode.set_fen(self._fen_before)
+            return Position.pgn_lce(self.is_white(), self.from_sq, self.to_sq, self.promotion.lower())
         return self.position_before.pgn(self.from_sq, self.to_sq, self.promotion.lower())
 
     def add_nag(self, nag):
@@ -252,12 +305,16 @@ class Move:
         self.li_themes = []
 
     def is_white(self):
+        if self._position_before is None and self._fen_before is not None:
+            return " w " in self._fen_before
         return self.position_before.is_white
 
     def fen_base(self):
         return self.position.fen_base()
 
     def fenm2(self):
+        if self._position is None and self._fen is not None:
+            return FasterCode.fen_fenm2(self._fen)
         return self.position.fenm2()
 
     def pv2dgt(self):
@@ -306,6 +363,8 @@ class Move:
         return self.pgn_html_base(with_figurines) + self.resto()
 
     def num_move(self):
+        if self._position_before is None and self._fen_before is not None:
+            return max(int(self._fen_before.rsplit(" ", 1)[1]), 1)
         return self.position_before.num_moves
 
     def sounds_list(self):
@@ -466,10 +525,13 @@ class Move:
     def distancia(self):
         return Position.distancia(self.from_sq, self.to_sq)
 
-    def save(self, with_variations: bool = True):
-        dic = {"move": self.movimiento()}
+    def save_extras(self, with_variations: bool = True) -> dict:
+        """
+        Data of the move apart from the move itself, variations as Game.save_raw() structures.
+        """
+        dic = {}
         if len(self.variations) and with_variations:
-            dic["variations"] = self.variations.save()
+            dic["variations"] = self.variations.save_raw()
         if self.comment:
             dic["comment"] = self.comment
         if self.time_ms:
@@ -484,18 +546,32 @@ class Move:
             mrm, pos = self.analysis
             save_mrm = mrm.save()
             dic["analysis"] = [save_mrm, pos]
+        return dic
+
+    def save(self, with_variations: bool = True):
+        dic = self.save_extras(with_variations)
+        dic["move"] = self.movimiento()
         return Util.var2zip(dic)
 
-    def restore(self, block):
+    def restore(self, block, board=None, fen_before=None):
+        """
+        board: optional FasterCode.Board in position_before, the positions are then created lazily (see play_board).
+        """
         dic = Util.zip2var(block)
 
         move = dic["move"]
         self.from_sq, self.to_sq, self.promotion = move[:2], move[2:4], move[4:]
 
-        cp = self.position_before.copia()
-        cp.play(self.from_sq, self.to_sq, self.promotion.lower())
-        self.position = cp
+        if board is None:
+            cp = self.position_before.copia()
+            cp.play(self.from_sq, self.to_sq, self.promotion.lower())
+            self.position = cp
+        elif not self.play_board(board, fen_before):
+            self.position = self.position_before.copia()
 
+        self.restore_extras(dic)
+
+    def restore_extras(self, dic):
         if "variations" in dic:
             self.variations.restore(dic["variations"])
         if "comment" in dic:
@@ -585,6 +661,33 @@ class Move:
         return -1
 
 
+DIC_PROMOTION_CODE = {"": 0, "q": 1, "r": 2, "b": 3, "n": 4}
+DIC_CODE_PROMOTION = {v: k for k, v in DIC_PROMOTION_CODE.items()}
+
+
+def move_code(a1h8: str) -> int:
+    """
+    16 bits code of a move: from (6 bits), to (6 bits), promotion (3 bits).
+    """
+    return (
+        (ord(a1h8[0]) - 97 + (ord(a1h8[1]) - 49) * 8)
+        | (ord(a1h8[2]) - 97 + (ord(a1h8[3]) - 49) * 8) << 6
+        | DIC_PROMOTION_CODE[a1h8[4:].lower()] << 12
+    )
+
+
+def code_move(code: int) -> str:
+    from_pos = code & 63
+    to_pos = (code >> 6) & 63
+    return (
+        chr(from_pos % 8 + 97)
+        + chr(from_pos // 8 + 49)
+        + chr(to_pos % 8 + 97)
+        + chr(to_pos // 8 + 49)
+        + DIC_CODE_PROMOTION[code >> 12]
+    )
+
+
 def get_game_move(game, position_before, from_sq, to_sq, promotion):
     position = position_before.copia()
     promotion = promotion.lower() if promotion else ""
@@ -623,14 +726,20 @@ class Variations:
         """
         return [variation.save() for variation in self.li_variations]
 
+    def save_raw(self):
+        return [variation.save_raw() for variation in self.li_variations]
+
     def restore(self, li):
         """
-        Restore the variation list from serialized games.
+        Restore the variation list from serialized games, bytes blocks or save_raw() structures.
         """
         self.li_variations = []
         for sv in li:
             game = Code.Base.Game.Game()
-            game.restore(sv)
+            if isinstance(sv, bytes):
+                game.restore(sv)
+            else:
+                game.restore_raw(sv)
             self.li_variations.append(game)
 
     def __len__(self):
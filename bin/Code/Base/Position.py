@@ -21,6 +21,9 @@ from Code.Base.Constantes import (
 from Code.Translations import TrListas
 
 
+DIC_CASTLES_LOST = {"e1": "KQ", "h1": "K", "a1": "Q", "e8": "kq", "h8": "k", "a8": "q"}
+
+
 class Position:
     """
     Represent a chess position including board pieces, side to move,
@@ -322,41 +325,61 @@ class Position:
 
     def play(self, from_a1h8, to_a1h8, promotion=""):
         self.set_lce()
-        if promotion is None:
-            promotion = ""
-        mv = FasterCode.move_expv(from_a1h8, to_a1h8, promotion)
+        mv = FasterCode.move_expv(from_a1h8, to_a1h8, promotion or "")
         if not mv:
             return False, "Error"
+        self.play_infomove(mv)
+        return True, self.li_extras
 
-        self.li_extras = []
-
-        enr_k = mv.iscastle_k()
-        enr_q = mv.iscastle_q()
-        en_pa = mv.is_enpassant()
-
-        if promotion:
-            promotion = promotion.upper() if self.is_white else promotion.lower()
-            self.li_extras.append(("c", to_a1h8, promotion))
-
-        elif enr_k:
-            if self.is_white:
-                self.li_extras.append(("m", "h1", "f1"))
-            else:
-                self.li_extras.append(("m", "h8", "f8"))
+    def play_board(self, board, from_a1h8, to_a1h8, promotion=""):
+        """
+        Same as play, but the move is checked with a FasterCode.Board that is in this position,
+        and the board follows the move, so replaying a game doesn't generate or parse any FEN.
+        """
+        mv = board.play_expv(from_a1h8, to_a1h8, promotion or "")
+        if not mv:
+            return False, "Error"
+        self.play_infomove(mv)
+        return True, self.li_extras
 
-        elif enr_q:
-            if self.is_white:
-                self.li_extras.append(("m", "a1", "d1"))
+    def play_infomove(self, mv):
+        """
+        Update the position in place with a legal move (FasterCode.InfoMove generated in this position).
+        """
+        squares = self.squares
+        from_a1h8 = mv.xfrom()
+        to_a1h8 = mv.xto()
+
+        piece = squares.pop(from_a1h8)
+        is_capture = to_a1h8 in squares
+        is_pawn = piece in "Pp"
+        squares[to_a1h8] = piece
+
+        self.li_extras = infomove_extras(mv)
+        for extra in self.li_extras:
+            if extra[0] == "c":
+                squares[extra[1]] = extra[2]
+            elif extra[0] == "m":
+                squares[extra[2]] = squares.pop(extra[1])
             else:
-                self.li_extras.append(("m", "a8", "d8"))
+                del squares[extra[1]]
+                is_capture = True
 
-        elif en_pa:
-            capt = self.en_passant.replace("6", "5").replace("3", "4")
-            self.li_extras.append(("b", capt))
+        if self.castles != "-":
+            lost = DIC_CASTLES_LOST.get(from_a1h8, "") + DIC_CASTLES_LOST.get(to_a1h8, "")
+            if lost:
+                self.castles = "".join(c for c in self.castles if c not in lost) or "-"
 
-        self.read_fen(FasterCode.get_fen())  # despues de li_extras, por si enpassant
+        if is_pawn and abs(ord(to_a1h8[1]) - ord(from_a1h8[1])) == 2:
+            self.en_passant = from_a1h8[0] + ("3" if self.is_white else "6")
+        else:
+            self.en_passant = "-"
 
-        return True, self.li_extras
+        self.mov_pawn_capt = 0 if is_pawn or is_capture else self.mov_pawn_capt + 1
+        if not self.is_white:
+            self.num_moves += 1
+        self.is_white = not self.is_white
+        self.legal()
 
     def pr_board(self):
         """
@@ -378,14 +401,7 @@ class Position:
 
     def pgn(self, from_sq, to_sq, promotion=""):
         self.set_lce()
-        promotion = promotion or ""
-        if Code.configuration.x_notation_style == NOTATION_ALGEBRAIC:
-            return FasterCode.get_pgn(from_sq, to_sq, promotion)
-
-        if Code.configuration.x_notation_style == NOTATION_LONGALGEBRAIC:
-            return FasterCode.get_pgn_longalgebraic(from_sq, to_sq, promotion)
-
-        return FasterCode.get_pgn_descriptive(self.is_white, from_sq, to_sq, promotion)
+        return pgn_lce(self.is_white, from_sq, to_sq, promotion)
 
     def get_fenm2(self):
         self.set_lce()
@@ -821,6 +837,38 @@ def distancia(from_sq, to_sq):
     return ((ord(from_sq[0]) - ord(to_sq[0])) ** 2 + (ord(from_sq[1]) - ord(to_sq[1])) ** 2) ** 0.5
 
 
+def pgn_lce(is_white, from_sq, to_sq, promotion=""):
+    """
+    Move in the configured notation, in the position set in FasterCode.
+    """
+    promotion = promotion or ""
+    if Code.configuration.x_notation_style == NOTATION_ALGEBRAIC:
+        return FasterCode.get_pgn(from_sq, to_sq, promotion)
+
+    if Code.configuration.x_notation_style == NOTATION_LONGALGEBRAIC:
+        return FasterCode.get_pgn_longalgebraic(from_sq, to_sq, promotion)
+
+    return FasterCode.get_pgn_descriptive(is_white, from_sq, to_sq, promotion)
+
+
+def infomove_extras(mv) -> list:
+    """
+    li_extras of a move (FasterCode.InfoMove): promotion, rook move when castling, pawn captured en passant.
+    """
+    from_a1h8 = mv.xfrom()
+    to_a1h8 = mv.xto()
+    promotion = mv.promotion()
+    if promotion:
+        return [("c", to_a1h8, promotion.upper() if to_a1h8[1] == "8" else promotion)]
+    if mv.iscastle_k():
+        return [("m", f"h{from_a1h8[1]}", f"f{from_a1h8[1]}")]
+    if mv.iscastle_q():
+        return [("m", f"a{from_a1h8[1]}", f"d{from_a1h8[1]}")]
+    if mv.is_enpassant():
+        return [("b", to_a1h8[0] + from_a1h8[1])]
+    return []
+
+
 def legal_fenm2(fen):
     """
     Normalize a FEN-like string and return its fenm2 representation.
@@ -10,17 +10,65 @@ from Code.QT import QTMessages
 from Code.SQL import UtilSQL
 
 
+VERSION_BOOK = 1  # 1: KEY signed 64-bit INTEGER, before CKEY = FasterCode.int_str(key)
+
+SQL_INSERT = "INSERT INTO BOOK( KEY, MOVE, WEIGHT, SCORE, DEPTH, LEARN ) VALUES( ?, ?, ?, ?, ?, ? )"
+
+DIC_SQL_COLLISIONS = {
+    "add": f"{SQL_INSERT} ON CONFLICT( KEY, MOVE ) DO UPDATE SET WEIGHT=WEIGHT+excluded.WEIGHT, "
+    "SCORE=SCORE+excluded.SCORE, DEPTH=DEPTH+excluded.DEPTH, LEARN=LEARN+excluded.LEARN",
+    "discard": f"{SQL_INSERT} ON CONFLICT( KEY, MOVE ) DO NOTHING",
+    "replace": f"{SQL_INSERT} ON CONFLICT( KEY, MOVE ) DO UPDATE SET WEIGHT=excluded.WEIGHT, "
+    "SCORE=excluded.SCORE, DEPTH=excluded.DEPTH, LEARN=excluded.LEARN",
+}
+
+
+def key_db(key: int) -> int:
+    """Polyglot key (unsigned) -> KEY of the table, sqlite integers are signed."""
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+def key_book(key: int) -> int:
+    return key + (1 << 64) if key < 0 else key
+
+
 class DBPolyglot:
     def __init__(self, path):
         self.path = path
         created = os.path.isfile(path)
         self.conexion = sqlite3.connect(path)
         if not created:
-            self.conexion.execute(
-                "CREATE TABLE IF NOT EXISTS BOOK( CKEY TEXT, MOVE INT, WEIGHT INT, SCORE INT, DEPTH INT, LEARN INT);"
-            )
-            self.conexion.execute("CREATE INDEX IF NOT EXISTS CKEY_INDEX ON BOOK( CKEY );")
+            self.create_table()
             self.import_previous()
+        else:
+            (version,) = self.conexion.execute("PRAGMA user_version").fetchone()
+            if version < VERSION_BOOK:
+                self.migrate_text_keys()
+
+    def create_table(self):
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS BOOK( KEY INTEGER NOT NULL, MOVE INTEGER NOT NULL, WEIGHT INT, SCORE INT, "
+            "DEPTH INT, LEARN INT, PRIMARY KEY( KEY, MOVE ) );"
+        )
+        self.conexion.execute(f"PRAGMA user_version = {VERSION_BOOK}")
+
+    def migrate_text_keys(self):
+        li_fields = [row[1] for row in self.conexion.execute("PRAGMA table_info(BOOK)")]
+        if "CKEY" not in li_fields:
+            self.create_table()
+            return
+        self.conexion.create_function("KEY_DB", 1, lambda ckey: key_db(FasterCode.str_int(ckey)), deterministic=True)
+        self.conexion.execute("BEGIN")
+        self.conexion.execute("ALTER TABLE BOOK RENAME TO BOOK_CKEY")
+        self.conexion.execute("DROP INDEX IF EXISTS CKEY_INDEX")
+        self.create_table()
+        self.conexion.execute(
+            "INSERT OR REPLACE INTO BOOK( KEY, MOVE, WEIGHT, SCORE, DEPTH, LEARN ) "
+            "SELECT KEY_DB(CKEY), MOVE, WEIGHT, SCORE, DEPTH, LEARN FROM BOOK_CKEY ORDER BY ROWID"
+        )
+        self.conexion.execute("DROP TABLE BOOK_CKEY")
+        self.conexion.commit()
+        self.conexion.execute("VACUUM")
 
     def __enter__(self):
         return self
@@ -34,45 +82,32 @@ class DBPolyglot:
             self.conexion.close()
             self.conexion = None
 
+    @staticmethod
+    def entry_values(entry):
+        return key_db(entry.key), entry.move, entry.weight, entry.score, entry.depth, entry.learn
+
     def insert_entry(self, entry):
-        sql = "INSERT INTO BOOK( CKEY, MOVE, WEIGHT, SCORE, DEPTH, LEARN ) VALUES( ?, ?, ?, ?, ?, ? );"
-        cursor = self.conexion.execute(
-            sql,
-            (
-                FasterCode.int_str(entry.key),
-                entry.move,
-                entry.weight,
-                entry.score,
-                entry.depth,
-                entry.learn,
-            ),
-        )
+        sql = "INSERT OR REPLACE INTO BOOK( KEY, MOVE, WEIGHT, SCORE, DEPTH, LEARN ) VALUES( ?, ?, ?, ?, ?, ? )"
+        cursor = self.conexion.execute(sql, self.entry_values(entry))
         return cursor.lastrowid
 
     def update_entry(self, rowid, entry):
         sql = "UPDATE BOOK SET WEIGHT=?, SCORE=?, DEPTH=?, LEARN=? WHERE ROWID=?"
         self.conexion.execute(sql, (entry.weight, entry.score, entry.depth, entry.learn, rowid))
 
+    def replace_entries(self, li_entries, collisions):
+        """
+        collisions with the moves in the book: "add" the values, "discard" the new entry, or "replace" the entry,
+        with a weight of 0 the move is removed.
+        """
+        self.conexion.executemany(DIC_SQL_COLLISIONS[collisions], [self.entry_values(entry) for entry in li_entries])
+        if collisions == "replace":
+            li_delete = [(key_db(entry.key), entry.move) for entry in li_entries if entry.weight == 0]
+            if li_delete:
+                self.conexion.executemany("DELETE FROM BOOK WHERE KEY=? AND MOVE=? AND WEIGHT=0", li_delete)
+
     def replace_entry(self, entry, collisions):
-        sql = "SELECT ROWID, WEIGHT, SCORE, DEPTH, LEARN FROM BOOK WHERE CKEY=? AND MOVE=?"
-        ckey = FasterCode.int_str(entry.key)
-        cursor = self.conexion.execute(sql, (ckey, entry.move))
-        if row := cursor.fetchone():
-            rowid, weight, score, depth, learn = row
-            if collisions == "add":
-                entry.weight += weight
-                entry.score += score
-                entry.depth += depth
-                entry.learn += learn
-            elif collisions == "discard":
-                return
-            else:
-                if entry.weight == 0:
-                    self.delete(rowid)
-                    return
-            self.update_entry(rowid, entry)
-        else:
-            self.insert_entry(entry)
+        self.replace_entries([entry], collisions)
 
     def delete(self, rowid):
         sql = "DELETE FROM BOOK WHERE rowid = ?"
@@ -91,7 +126,11 @@ class DBPolyglot:
         return rowid
 
     def import_previous(self):
-        old_folder = Util.opj(Code.configuration.paths.folder_polyglots_factory(), "old")
+        def old_folder():
+            folder = Util.opj(Code.configuration.paths.folder_polyglots_factory(), "old")
+            Util.create_folder(folder)
+            return folder
+
         mkbin_path = f"{self.path[:-5]}mkbin"
         if os.path.isfile(mkbin_path):
             pol_mkbin = FasterCode.Polyglot(mkbin_path)
@@ -99,27 +138,18 @@ class DBPolyglot:
                 self.insert_entry(entry)
             self.conexion.commit()
             pol_mkbin.close()
-            Util.create_folder(old_folder)
-            shutil.move(mkbin_path, old_folder)
+            shutil.move(mkbin_path, old_folder())
 
         dbbin_path = f"{self.path[:-5]}dbbin"
         if os.path.isfile(dbbin_path):
             db_ant = UtilSQL.DictSQL(dbbin_path)
             dic = db_ant.as_dictionary()
             db_ant.close()
-            for key_str, dic_moves in dic.items():
-                for move, entry in dic_moves.items():
-                    sql = "SELECT ROWID FROM BOOK WHERE CKEY=? AND MOVE=?"
-                    cursor = self.conexion.execute(sql, (key_str, move))
-                    row = cursor.fetchone()
-                    if row:
-                        rowid = row[0]
-                        self.update_entry(rowid, entry)
-                    else:
-                        self.insert_entry(entry)
+            for dic_moves in dic.values():
+                for entry in dic_moves.values():
+                    self.insert_entry(entry)
             self.conexion.commit()
-            Util.create_folder(old_folder)
-            shutil.move(dbbin_path, old_folder)
+            shutil.move(dbbin_path, old_folder())
 
     def __len__(self):
         sql = "SELECT COUNT(*) FROM BOOK"
@@ -129,9 +159,8 @@ class DBPolyglot:
 
     def get_entries(self, fen):
         key = FasterCode.hash_polyglot8(fen)
-        ckey = FasterCode.int_str(key)
-        sql = "SELECT ROWID, MOVE, WEIGHT, SCORE, DEPTH, LEARN FROM BOOK WHERE CKEY=?"
-        cursor = self.conexion.execute(sql, (ckey,))
+        sql = "SELECT ROWID, MOVE, WEIGHT, SCORE, DEPTH, LEARN FROM BOOK WHERE KEY=?"
+        cursor = self.conexion.execute(sql, (key_db(key),))
         rows = cursor.fetchall()
         li_resp = []
         if rows:
@@ -150,30 +179,24 @@ class DBPolyglot:
         return li_resp
 
     def get_all(self):
-        sql = "SELECT DISTINCT length(CKEY) FROM BOOK"
-        cursor = self.conexion.execute(sql)
-        li_length = [int(x[0]) for x in cursor.fetchall()]
-        li_length.sort()
-
-        sql = "SELECT CKEY, MOVE, WEIGHT, SCORE, DEPTH, LEARN FROM BOOK WHERE LENGTH(CKEY) = ? ORDER BY CKEY"
-
-        for length in li_length:
-            cursor = self.conexion.execute(sql, (length,))
-            while True:
-                row = cursor.fetchone()
-                if not row:
-                    break
-                entry = FasterCode.Entry()
-                (
-                    ckey,
-                    entry.move,
-                    entry.weight,
-                    entry.score,
-                    entry.depth,
-                    entry.learn,
-                ) = row
-                entry.key = FasterCode.str_int(ckey)
-                yield entry
+        # In the order of the polyglot books, by the unsigned key: first the keys saved as positive numbers
+        sql = "SELECT KEY, MOVE, WEIGHT, SCORE, DEPTH, LEARN FROM BOOK WHERE KEY %s 0 ORDER BY KEY, MOVE"
+
+        for condition in (">=", "<"):
+            cursor = self.conexion.execute(sql % condition)
+            while rows := cursor.fetchmany(10_000):
+                for row in rows:
+                    entry = FasterCode.Entry()
+                    (
+                        key,
+                        entry.move,
+                        entry.weight,
+                        entry.score,
+                        entry.depth,
+                        entry.learn,
+                    ) = row
+                    entry.key = key_book(key)
+                    yield entry
 
         yield None
 
@@ -1,7 +1,10 @@
 # This code is a translation to python from pg_key.c and pg_show.c released in the public domain by Michel Van den Bergh
 # http://alpha.uhasselt.be/Research/Algebra/Toga
 
+import collections
+import mmap
 import os
+import struct
 import sys
 
 import FasterCode
@@ -15,6 +18,11 @@ from Code.Base.Constantes import (
     TOP3_FIRST_MOVES,
 )
 
+ENTRY_SIZE = 16
+ENTRY_STRUCT = struct.Struct(">QHHI")  # key, move, weight, learn
+KEY_STRUCT = struct.Struct(">Q")
+MAX_BOOK_FILES = 16
+
 
 class Entry:
     key = 0
@@ -39,6 +47,112 @@ class Entry:
         return {"e1h1": "e1g1", "e1a1": "e1c1", "e8h8": "e8g8", "e8a8": "e8c8"}.get(pv, pv)
 
 
+class BookFile:
+    """
+    Polyglot book mapped in memory, kept open between probes, the entries are decoded with struct.
+    """
+
+    def __init__(self, path: str, stamp: tuple):
+        self.path = path
+        self.stamp = stamp  # mtime, size: when it changes the book is mapped again
+        self.num_entries = stamp[1] // ENTRY_SIZE
+        self.mm = None
+        if self.num_entries:
+            with open(path, "rb") as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self.num_entries = 0
+
+    def lower_bound(self, key: int, first: int = 0) -> int:
+        last = self.num_entries
+        unpack_from = KEY_STRUCT.unpack_from
+        mm = self.mm
+        while first < last:
+            middle = (first + last) // 2
+            if unpack_from(mm, middle * ENTRY_SIZE)[0] < key:
+                first = middle + 1
+            else:
+                last = middle
+        return first
+
+    def entries_from(self, pos: int, key: int) -> list:
+        li = []
+        unpack_from = ENTRY_STRUCT.unpack_from
+        mm = self.mm
+        while pos < self.num_entries:
+            xkey, move, weight, learn = unpack_from(mm, pos * ENTRY_SIZE)
+            if xkey != key:
+                break
+            entry = Entry()
+            entry.key = key
+            entry.move = move
+            entry.weight = weight
+            entry.learn = learn
+            li.append(entry)
+            pos += 1
+        return li
+
+    def probe(self, key: int) -> list:
+        if not self.num_entries:
+            return []
+        return self.entries_from(self.lower_bound(key), key)
+
+    def probe_many(self, keys) -> dict:
+        """
+        {key: entries} of all the keys, in order of key the search of each one starts where the previous ended.
+        """
+        dic = {}
+        first = 0
+        for key in sorted(set(keys)):
+            if not self.num_entries:
+                dic[key] = []
+                continue
+            first = self.lower_bound(key, first)
+            dic[key] = li = self.entries_from(first, key)
+            first += len(li)
+        return dic
+
+
+_dic_book_files: "collections.OrderedDict[str, BookFile]" = collections.OrderedDict()
+
+
+def book_file(path) -> BookFile:
+    """
+    BookFile of the path from the cache of books open, raises OSError if it doesn't exist.
+    """
+    path = str(path)
+    st = os.stat(path)
+    stamp = st.st_mtime_ns, st.st_size
+    bfile = _dic_book_files.get(path)
+    if bfile is not None:
+        if bfile.stamp == stamp:
+            _dic_book_files.move_to_end(path)
+            return bfile
+        bfile.close()
+    bfile = _dic_book_files[path] = BookFile(path, stamp)
+    while len(_dic_book_files) > MAX_BOOK_FILES:
+        _dic_book_files.popitem(last=False)[1].close()
+    return bfile
+
+
+def close_book(path):
+    """
+    To call before writing or removing the book, in Windows a file mapped can't be changed.
+    """
+    bfile = _dic_book_files.pop(str(path), None)
+    if bfile is not None:
+        bfile.close()
+
+
+def sort_by_weight(li: list) -> list:
+    li.sort(key=lambda x: x.weight, reverse=True)
+    return li
+
+
 class Polyglot:
     """
     fen = "rnbqkbnr/pppppppp/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
@@ -53,100 +167,28 @@ class Polyglot:
 
     def __init__(self, path=None):
         self.path = path
-        self.f = None
 
     def __enter__(self):
-        self.f = open(self.path, "rb")
+        book_file(self.path)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.f:
-            self.f.close()
-            self.f = None
-
-    def int_from_file(self, length, r):
-        cad = self.f.read(length)
-
-        if len(cad) != length:
-            return True, 0
-        for c in cad:
-            r = (r << 8) + c
-        return False, r
-
-    def entry_from_file(self):
-        entry = Entry()
-
-        r = 0
-        ret, r = self.int_from_file(8, r)
-        if ret:
-            return True, None
-        entry.key = r
-
-        ret, r = self.int_from_file(2, r)
-        if ret:
-            return True, None
-        entry.move = r & 0xFFFF
-
-        ret, r = self.int_from_file(2, r)
-        if ret:
-            return True, None
-        entry.weight = r & 0xFFFF
-
-        ret, r = self.int_from_file(4, r)
-        if ret:
-            return True, None
-        entry.learn = r & 0xFFFFFFFF
-
-        return False, entry
-
-    def find_key(self, key):
-        first = -1
-        try:
-            self.f.seek(-16, os.SEEK_END)
-        except OSError:
-            entry = Entry()
-            entry.key = key + 1
-            return -1, entry
-
-        last = self.f.tell() // 16
-        ret, last_entry = self.entry_from_file()
-        while True:
-            if last - first == 1:
-                return last, last_entry
-
-            middle = (first + last) // 2
-            self.f.seek(16 * middle, os.SEEK_SET)
-            ret, middle_entry = self.entry_from_file()
-            if key <= middle_entry.key:
-                last = middle
-                last_entry = middle_entry
-            else:
-                first = middle
+        pass
 
     def lista(self, path, fen):
-
-        with open(path, "rb") as self.f:
-            return self.xlista(fen)
+        return sort_by_weight(book_file(path).probe(FasterCode.hash_polyglot8(fen)))
 
     def xlista(self, fen):
-        key = FasterCode.hash_polyglot8(fen)
-
-        offset, entry = self.find_key(key)
-        li = []
-        if entry and entry.key == key:
-            li.append(entry)
-
-            self.f.seek(16 * (offset + 1), os.SEEK_SET)
-            while True:
-                ret, entry = self.entry_from_file()
-                if ret or (entry.key != key):
-                    break
-
-                li.append(entry)
-
-            li.sort(key=lambda x: x.weight, reverse=True)
-
-        return li
+        return self.lista(self.path, fen)
+
+    def probe_many(self, keys) -> dict:
+        """
+        {key: entries sorted by weight} of the polyglot keys.
+        """
+        dic = book_file(self.path).probe_many(keys)
+        for li in dic.values():
+            sort_by_weight(li)
+        return dic
 
 
 class Line:
@@ -1,5 +1,7 @@
+import heapq
 import math
 import os
+import struct
 import time
 
 import FasterCode
@@ -7,7 +9,7 @@ from PySide6 import QtCore, QtWidgets
 
 import Code
 from Code.Z import Util
-from Code.Base import Game, Position
+from Code.Base import Game
 from Code.Base.Constantes import (
     BLACK,
     CALCWEIGHT_NUMGAMES,
@@ -16,10 +18,13 @@ from Code.Base.Constantes import (
     FEN_INITIAL,
     WHITE,
 )
+from Code.Books import Polyglot
 from Code.Databases import DBgames
 from Code.QT import Colocacion, Controles, FormLayout, Iconos, QTDialogs, QTMessages, QTUtils, SelectFiles
 from Code.SQL import UtilSQL
 
+ENTRIES_BATCH = 10_000  # entries saved together in the book in construction, and between refreshes of the progress
+
 
 class WExportarPGN(QtWidgets.QDialog):
     def __init__(self, parent, path_white, path_black):
@@ -154,6 +159,7 @@ class PolyglotExport:
         total = len(self.db_entries)
 
         bp = QTMessages.ProgressBarSimple(self.wpolyglot, _("Create book"), os.path.basename(path_bin), total)
+        Polyglot.close_book(path_bin)
         wpoly = FasterCode.PolyglotWriter(path_bin)
 
         bp.mostrar()
@@ -184,13 +190,14 @@ class PolyglotExport:
                     wpoly.write(xentry)
 
         cancelled = False
-        for entry in self.db_entries.get_all():
-            bp.inc()
+        for num, entry in enumerate(self.db_entries.get_all()):
             if entry is None:
                 break
-            if bp.is_canceled():
-                cancelled = True
-                break
+            if num % ENTRIES_BATCH == 0:
+                bp.pon(num)
+                if bp.is_canceled():
+                    cancelled = True
+                    break
             if entry.key != key_current:
                 save()
                 key_current = entry.key
@@ -389,13 +396,18 @@ class PolyglotImport:
 
         pol_import = FasterCode.Polyglot(path_bin)
         canceled = False
+        li_entries = []
         for entry in pol_import:
-            bp.inc()
-            if bp.is_canceled():
-                canceled = True
-                break
-            self.db_entries.replace_entry(entry, collisions)
+            li_entries.append(entry)
+            if len(li_entries) == ENTRIES_BATCH:
+                bp.pon(bp.actual + ENTRIES_BATCH)
+                if bp.is_canceled():
+                    canceled = True
+                    break
+                self.db_entries.replace_entries(li_entries, collisions)
+                li_entries = []
         if not canceled:
+            self.db_entries.replace_entries(li_entries, collisions)
             self.db_entries.commit()
         pol_import.close()
         bp.close()
@@ -429,13 +441,7 @@ class PolyglotImport:
             collisions,
         ) = resp
 
-        db = UtilSQL.DictBig()
-
-        def fadd(keymove, count, pts_add):
-            num, pts = db.get(keymove, (0, 0))
-            num += count
-            pts += pts_add
-            db[keymove] = num, pts
+        counter = BookCounter()
 
         dltmp = ImportarPGNDB(self.wpolyglot, os.path.basename(path_db))
         dltmp.show()
@@ -450,15 +456,15 @@ class PolyglotImport:
             li_players,
             ru,
             dltmp.dispatch,
-            fadd,
+            counter,
         )
         dltmp.close()
         if not ok:
-            db.close()
+            counter.close()
             db_games.close()
             return
 
-        self.merge(db, min_games, min_score, calc_weight, save_score, collisions)
+        self.merge(counter, min_games, min_score, calc_weight, save_score, collisions)
 
     def import_pgn(self):
         li_path_pgn = SelectFiles.select_pgns(self.wpolyglot)
@@ -483,15 +489,8 @@ class PolyglotImport:
             collisions,
         ) = resp
 
-        db = UtilSQL.DictBig()
+        counter = BookCounter()
         for path_pgn in li_path_pgn:
-
-            def fadd(keymove, count, pts_add):
-                num, pts = db.get(keymove, (0, 0))
-                num += count
-                pts += pts_add
-                db[keymove] = num, pts
-
             dltmp = ImportarPGNDB(self.wpolyglot, os.path.basename(path_pgn))
             dltmp.show()
             ok = self.add_pgn(
@@ -505,14 +504,14 @@ class PolyglotImport:
                 time.time,
                 0.1,
                 dltmp.dispatch,
-                fadd,
+                counter,
             )
             dltmp.close()
             if not ok:
-                db.close()
+                counter.close()
                 return
 
-        self.merge(db, min_games, min_score, calc_weight, save_score, collisions)
+        self.merge(counter, min_games, min_score, calc_weight, save_score, collisions)
 
     @staticmethod
     def add_pgn(
@@ -526,20 +525,10 @@ class PolyglotImport:
         ftime,
         time_dispatch,
         dispatch,
-        fadd,
+        counter,
     ):
         time_prev = ftime()
         cancelled = False
-        bfen_inicial = FEN_INITIAL.encode()
-        # accumulator: keymove -> (count, pts_sum)
-        acc = {}
-
-        def flush_acc():
-            if not acc:
-                return
-            for k, (ct, p) in acc.items():
-                fadd(k, ct, p)
-            acc.clear()
 
         with FasterCode.PGNreader(path_pgn, plies) as fpgn:
             bsize = fpgn.size
@@ -551,8 +540,6 @@ class PolyglotImport:
 
                 if (ftime() - time_prev) >= time_dispatch:
                     time_prev = ftime()
-                    # flush buffered updates before UI dispatch/check
-                    flush_acc()
                     if not dispatch(False, btell, num_games):
                         cancelled = True
                         break
@@ -581,49 +568,36 @@ class PolyglotImport:
                 else:
                     ok_black = ok_white = True
 
-                if b"FEN" in bdCab:
-                    bfen0 = bdCab[b"FEN"]
-                else:
-                    bfen0 = bfen_inicial
-                lipv = pv.split(" ")
-                is_white = b" w" in bfen0
-                for pos, bfen in enumerate(liFens):
-                    if in_opening and not Position.fen_in_opening(bfen.decode()):
-                        break
-                    ok = (is_white in st_side) and (ok_white if is_white else ok_black)
-                    if ok:
-                        mv = lipv[pos]
-                        move = FasterCode.string_movepolyglot(mv)
-                        key = FasterCode.hash_polyglot(bfen0)
-                        keymove = FasterCode.keymove_str(key, move)
-                        pt = pw if is_white else pb
-                        # accumulate
-                        c, s = acc.get(keymove, (0, 0))
-                        acc[keymove] = (c + 1, s + pt)
-                        # flush if buffer grows too large
-                        if len(acc) > 5000:
-                            flush_acc()
-
-                    is_white = not is_white
-                    bfen0 = bfen
+                fen = bdCab[b"FEN"].decode() if b"FEN" in bdCab else FEN_INITIAL
+                li_moves = FasterCode.xpv_polyglot(
+                    fen,
+                    FasterCode.pv_xpv(pv),
+                    plies,
+                    ok_white and WHITE in st_side,
+                    ok_black and BLACK in st_side,
+                    in_opening,
+                )
+                counter.add_moves(li_moves, pw, pb)
 
                 num_games += 1
 
-            # final flush after reading file
-            flush_acc()
-
         return not cancelled
 
-    def merge(self, db, min_games, min_score, calc_weight, save_score, collisions):
+    def merge(self, counter, min_games, min_score, calc_weight, save_score, collisions):
         with QTMessages.one_moment_please(self.wpolyglot, _("Saving...")):
-            g_nueva = iter(fuente_dbbig(db, min_games, min_score, calc_weight, save_score))
+            g_nueva = iter(fuente_counter(counter, min_games, min_score, calc_weight, save_score))
 
+            li_entries = []
             for n_key, dic_data in g_nueva:
                 if n_key is None:
                     break
-                for move, entry in dic_data.items():
-                    self.db_entries.replace_entry(entry, collisions)
-            db.close()
+                li_entries.extend(dic_data.values())
+                if len(li_entries) >= ENTRIES_BATCH:
+                    self.db_entries.replace_entries(li_entries, collisions)
+                    li_entries = []
+            self.db_entries.replace_entries(li_entries, collisions)
+            self.db_entries.commit()
+            counter.close()
 
             self.wpolyglot.set_position(self.wpolyglot.position, False)
 
@@ -718,8 +692,73 @@ class ImportarPGNDB(QtWidgets.QDialog):
         return not self._is_canceled
 
 
-def fuente_dbbig(db, min_games, min_score, calc_weight, save_score):
-    db_iter = iter(db.items())
+class BookCounter:
+    """
+    Games and points of every (key, move) of the games read to build a book.
+    They are counted in a dict of integers, key << 16 | move -> games << 40 | points, when it has max_size pairs it is
+    saved sorted to a temporary file, and items() merges the files in the order of the books, by key and move.
+    """
+
+    RECORD = struct.Struct("<QHQ")  # key, move, games << 40 | points
+    RECORDS_READ = 8192
+
+    def __init__(self, max_size=1_000_000):
+        self.max_size = max_size
+        self.dic = {}
+        self.li_paths = []
+
+    def add_moves(self, li_moves, pts_white, pts_black):
+        """li_moves: [(is_white, key, move)...] as FasterCode.xpv_polyglot"""
+        dic = self.dic
+        get = dic.get
+        add_white = (1 << 40) + pts_white
+        add_black = (1 << 40) + pts_black
+        for is_white, key, move in li_moves:
+            keymove = key << 16 | move
+            dic[keymove] = get(keymove, 0) + (add_white if is_white else add_black)
+        if len(dic) >= self.max_size:
+            self.save_run()
+
+    def save_run(self):
+        path = Code.configuration.temporary_file("bkc")
+        pack = self.RECORD.pack
+        li_items = sorted(self.dic.items())
+        with open(path, "wb") as f:
+            f.write(b"".join(pack(keymove >> 16, keymove & 0xFFFF, value) for keymove, value in li_items))
+        self.li_paths.append(path)
+        self.dic = {}
+
+    def read_run(self, path):
+        size = self.RECORD.size * self.RECORDS_READ
+        with open(path, "rb") as f:
+            while data := f.read(size):
+                for key, move, value in self.RECORD.iter_unpack(data):
+                    yield key << 16 | move, value
+
+    def items(self):
+        """(key, move, games, points) in the order of the books"""
+        li_runs = [self.read_run(path) for path in self.li_paths]
+        li_runs.append(iter(sorted(self.dic.items())))
+        current = None
+        total = 0
+        for keymove, value in heapq.merge(*li_runs):
+            if keymove != current:
+                if current is not None:
+                    yield current >> 16, current & 0xFFFF, total >> 40, total & 0xFFFFFFFFFF
+                current = keymove
+                total = 0
+            total += value
+        if current is not None:
+            yield current >> 16, current & 0xFFFF, total >> 40, total & 0xFFFFFFFFFF
+
+    def close(self):
+        self.dic = {}
+        for path in self.li_paths:
+            Util.remove_file(path)
+        self.li_paths = []
+
+
+def fuente_counter(counter, min_games, min_score, calc_weight, save_score):
     current_key = None
     dic = None
 
@@ -763,17 +802,13 @@ def fuente_dbbig(db, min_games, min_score, calc_weight, save_score):
             d[imove] = e
         return d
 
-    while True:
-        k, v = next(db_iter, (None, None))
-        if k is None:
-            break
-        key, move = FasterCode.str_keymove(k)
+    for key, move, num, suma in counter.items():
         if key != current_key:
             if current_key is not None and pasa_filtro(dic):
                 yield current_key, dic_entry(current_key, dic)
             current_key = key
             dic = {}
-        dic[move] = v
+        dic[move] = num, suma
     if current_key is not None:
         if pasa_filtro(dic):
             yield current_key, dic_entry(current_key, dic)
@@ -781,10 +816,11 @@ def fuente_dbbig(db, min_games, min_score, calc_weight, save_score):
     yield None, None
 
 
-def create_bin_from_dbbig(owner, path_bin, db, min_games, min_score, calc_weight, save_score, uniform):
-    g_nueva = iter(fuente_dbbig(db, min_games, min_score, calc_weight, save_score))
+def create_bin_from_counter(owner, path_bin, counter, min_games, min_score, calc_weight, save_score, uniform):
+    g_nueva = iter(fuente_counter(counter, min_games, min_score, calc_weight, save_score))
 
     with QTMessages.one_moment_please(owner, _("Saving...")):
+        Polyglot.close_book(path_bin)
         wpoly = FasterCode.PolyglotWriter(path_bin)
 
         for n_key, dic_data in g_nueva:
@@ -1055,27 +1091,16 @@ def add_db(
     li_players,
     unknown_convert,
     dispatch,
-    fadd,
+    counter,
 ):
     time_prev = time.time()
     cancelled = False
     st_results = {x.decode() for x in st_results}
-    # accumulator: keymove -> (count, pts_sum)
-    acc = {}
-
-    def flush_acc():
-        if not acc:
-            return
-        for k, (ct, p) in acc.items():
-            fadd(k, ct, p)
-        acc.clear()
 
     dispatch(True, db.all_reccount(), 0)
     for num_games, (xpv, result, white, black) in enumerate(db.yield_polyglot()):
         if (time.time() - time_prev) >= 0.1:
             time_prev = time.time()
-            # flush before updating UI
-            flush_acc()
             if not dispatch(False, num_games, num_games):
                 cancelled = True
                 break
@@ -1104,27 +1129,9 @@ def add_db(
             nada, fen, xpv = xpv.split("|")
         else:
             fen = FEN_INITIAL
-        lipv = FasterCode.xpv_lipv(xpv)[:plies]
-        is_white = " w" in fen
-        FasterCode.set_fen(fen)
-        for mv in lipv:
-            ok = (is_white in st_side) and (ok_white if is_white else ok_black)
-            if ok:
-                move = FasterCode.string_movepolyglot(mv)
-                fen = FasterCode.get_fen()
-                if in_opening and not Position.fen_in_opening(fen):
-                    break
-                key = FasterCode.hash_polyglot8(fen)
-                keymove = FasterCode.keymove_str(key, move)
-                pt = pw if is_white else pb
-                c, s = acc.get(keymove, (0, 0))
-                acc[keymove] = (c + 1, s + pt)
-                if len(acc) > 5000:
-                    flush_acc()
-            FasterCode.make_move(mv)
-            is_white = not is_white
-
-    # final flush
-    flush_acc()
+        li_moves = FasterCode.xpv_polyglot(
+            fen, xpv, plies, ok_white and WHITE in st_side, ok_black and BLACK in st_side, in_opening
+        )
+        counter.add_moves(li_moves, pw, pb)
 
     return not cancelled
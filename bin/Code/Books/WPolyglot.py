@@ -264,14 +264,14 @@ class WPolyglot(LCDialog.LCDialog):
             cursor = conn.cursor()
             cursor.execute(f"""
                 DELETE FROM BOOK 
-                WHERE (CKEY, WEIGHT) IN (
-                    SELECT b.CKEY, b.WEIGHT
+                WHERE (KEY, WEIGHT) IN (
+                    SELECT b.KEY, b.WEIGHT
                     FROM BOOK b
                     JOIN (
-                        SELECT CKEY, SUM(WEIGHT) as total_weight
+                        SELECT KEY, SUM(WEIGHT) as total_weight
                         FROM BOOK
-                        GROUP BY CKEY
-                    ) t ON b.CKEY = t.CKEY
+                        GROUP BY KEY
+                    ) t ON b.KEY = t.KEY
                     WHERE b.WEIGHT <= (t.total_weight * {tope / 100.0})
                 )
             """)
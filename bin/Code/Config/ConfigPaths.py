@@ -91,6 +91,9 @@ class ConfigPaths:
     def file_pers_openings(self):
         return self._to_config("persaperturas.pkd")
 
+    def file_openings_cache(self):
+        return self._to_config("OpeningsCache.pk")
+
     def file_video(self):
         return self._to_config("confvid.pkd")
 
@@ -103,6 +106,9 @@ class ConfigPaths:
     def file_analysis(self):
         return self._to_config("analisis.db")
 
+    def file_analysis_cache(self):
+        return self._to_config("AnalysisCache.db")
+
     def file_prompts(self):
         return self._to_config("Prompts.db")
 
@@ -9,7 +9,7 @@ from PySide6 import QtCore
 import Code
 from Code.Base import Game
 from Code.Base.Constantes import FEN_INITIAL, STANDARD_TAGS, TACTICTHEMES
-from Code.Databases import DBgamesST
+from Code.Databases import DBgamesST, DBgamesDuplicates, DBgamesPOS, DBgamesVersion, ImportPGN
 from Code.Openings import OpeningsStd
 from Code.SQL import UtilSQL, RowidReader
 from Code.Z import Util
@@ -83,6 +83,14 @@ class DBgames:
 
         self.with_plycount = "PLYCOUNT" in self.read_config("dcabs", {})
 
+        DBgamesVersion.check_triggers(self.conexion)
+        self.dup_index = DBgamesDuplicates.DuplicatesIndex(self.conexion)
+        if not self.dup_index.exists() and self.is_empty_table():
+            self.dup_index.check()
+
+        self.db_stat_positions = None
+        self.with_stat_positions = os.path.isfile(f"{self.path_file}.st2")
+
     def read_options(self):
         self.allows_duplicates = self.read_config("ALLOWS_DUPLICATES", True)
         self.allows_positions = self.read_config("ALLOWS_POSITIONS", True)
@@ -154,6 +162,7 @@ class DBgames:
                 self.conexion.execute("ROLLBACK")
                 raise
         self.conexion.commit()
+        DBgamesVersion.check_triggers(self.conexion)
         self.conexion.execute("VACUUM")
 
     def get_name(self):
@@ -332,6 +341,9 @@ class DBgames:
     def is_empty(self):
         return self.reccount() == 0
 
+    def is_empty_table(self):
+        return self.conexion.execute("SELECT 1 FROM Games LIMIT 1").fetchone() is None
+
     def close(self):
         if self.conexion:
             self.conexion.close()
@@ -339,6 +351,9 @@ class DBgames:
         if self.db_stat:
             self.db_stat.close()
             self.db_stat = None
+        if self.db_stat_positions:
+            self.db_stat_positions.close()
+            self.db_stat_positions = None
         if self.rowidReader:
             self.rowidReader.close()
             self.rowidReader = None
@@ -399,14 +414,18 @@ class DBgames:
             result = self.field(recno, "RESULT")
             if not fen and self.with_db_stat:
                 self.db_stat.append(pv, result, -1)
+            self.dup_index.remove(self.field(recno, "XPV"))
+            self.stat_positions_remove(recno)
             self.conexion.execute(c_sql, (self.li_row_ids[recno],))
             rowid = self.li_row_ids[recno]
             if rowid in self.cache:
                 del self.cache[rowid]
             del self.li_row_ids[recno]
+        self.dup_index.flush()
         if self.with_db_stat:
             self.db_stat.commit()
         self.conexion.commit()
+        self.stat_positions_flush()
 
     def remove_duplicates(self):
         li_mirar = [field for field in self.li_fields if field.upper() not in ("_DATA_", "ECO", "XPV", "PLYCOUNT")]
@@ -454,6 +473,76 @@ class DBgames:
     def get_summary(self, pv_base, dic_analisis, with_figurines, allmoves=True):
         return self.db_stat.get_summary(pv_base, dic_analisis, with_figurines, allmoves) if self.with_db_stat else []
 
+    def stat_positions(self):
+        if self.db_stat_positions is None:
+            self.db_stat_positions = DBgamesPOS.PositionSTAT(f"{self.path_file}.st2")
+            self.with_stat_positions = True
+        return self.db_stat_positions
+
+    def count_games(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM Games").fetchone()[0]
+
+    def version_stats(self):
+        return DBgamesVersion.read_version(self.conexion, DBgamesVersion.STATS)
+
+    def is_updated_stat_positions(self):
+        return self.stat_positions().is_updated(self.version_stats())
+
+    def stat_positions_following(self):
+        """
+        True if the changes of the games have to be added to the statistics by position, the .st2 exists and it was
+        up to date when the changes started. To call before changing Games.
+        """
+        if not self.with_stat_positions:
+            return False
+        db_stat_positions = self.stat_positions()
+        if db_stat_positions.version_start is None:
+            db_stat_positions.start_changes(self.version_stats())
+        return db_stat_positions.following
+
+    def stat_positions_append(self, fen, pv, result, white_elo, black_elo, date, r=+1):
+        """
+        A game to insert (r=+1) or to remove (r=-1) in the statistics by position, to call before changing Games,
+        saved with stat_positions_flush after the commit.
+        """
+        if self.stat_positions_following():
+            self.db_stat_positions.append(fen, pv, result, white_elo, black_elo, date, r)
+
+    def stat_positions_remove(self, recno):
+        if self.stat_positions_following():
+            fen, pv = self.get_pv(recno)
+            li_values = [self.field(recno, field) or None for field in ("RESULT", "WHITEELO", "BLACKELO", "DATE")]
+            self.stat_positions_append(fen, pv, *li_values, r=-1)
+
+    def stat_positions_flush(self):
+        if self.db_stat_positions is not None:
+            self.db_stat_positions.flush(self.version_stats())
+
+    def stat_positions_cancel(self):
+        if self.db_stat_positions is not None:
+            self.db_stat_positions.cancel()
+
+    def get_summary_positions(self, pv_base, dic_analisis, with_figurines, allmoves=True):
+        return self.stat_positions().get_summary(pv_base, dic_analisis, with_figurines, allmoves)
+
+    def rebuild_stat_positions(self, dispatch, depth):
+        """
+        Opening explorer by positions, file .st2, see DBgamesPOS.
+        """
+        if "RESULT" not in self.st_fields:
+            return
+        li_select = [field if field in self.st_fields else "NULL" for field in ("WHITEELO", "BLACKELO", "DATE")]
+        version = self.version_stats()
+        cursor = self.conexion.execute(f"SELECT XPV, RESULT, {', '.join(li_select)} FROM Games")
+        cursor.row_factory = None
+
+        def games():
+            for xpv, result, white_elo, black_elo, date in cursor:
+                fen, pv = self.read_xpv(xpv)
+                yield fen, pv, result, white_elo, black_elo, date
+
+        self.stat_positions().rebuild(games(), version, self.count_games(), depth, dispatch)
+
     def has_result_field(self):
         return "RESULT" in self.st_fields
 
@@ -552,7 +641,8 @@ class DBgames:
         sql = "SELECT ROWID, XPV FROM Games"
         if after_rowid:
             sql += f" WHERE ROWID > {after_rowid}"
-        cursor = self.conexion.execute(sql)
+        cursor = self.conexion.execute(f"{sql} ORDER BY ROWID")
+        board = FasterCode.Board()  # own board, the consumer can use FasterCode between yields
         while True:
             row = cursor.fetchone()
             if not row:
@@ -563,11 +653,11 @@ class DBgames:
                 yield rowid, fen, -1, ""
             else:
                 fen = FEN_INITIAL
-            set_fen(fen)
+            board.set_fen(fen)
             li_pv = FasterCode.xpv_pv(xpv).split(" ")
             for pos, pv in enumerate(li_pv):
-                make_move(pv)
-                fen = get_fen()
+                board.play(pv)
+                fen = board.get_fen()
                 yield rowid, fen, pos, " ".join(li_pv[: pos + 1])
 
     def yield_data(self, li_fields, filtro):
@@ -879,7 +969,10 @@ class DBgames:
             except sqlite3.Error:
                 pass
 
-    def import_pgns(self, ficheros, dl_tmp, rem_comvar_run=None, filter_func=None):
+    def import_pgns(self, ficheros, dl_tmp, rem_comvar_run=None, filter_func=None, parallel=None):
+        """
+        parallel: the files are parsed in a pool of processes, None = automatic by the size of the file.
+        """
         erroneos = duplicados = importados = 0
 
         allows_fen = self.allows_positions
@@ -908,12 +1001,12 @@ class DBgames:
         conexion = self.conexion
 
         st_xpv_bloque = set()  # control de duplicados
+        dup_index = self.dup_index
+        if duplicate_check:
+            dup_index.load(sum(os.path.getsize(file) for file in ficheros) // 500)
 
         dcabs = self.read_config("dcabs", drots.copy())
 
-        obj_decode = Util.Decode()
-        decode = obj_decode.decode
-
         conexion.execute("BEGIN IMMEDIATE")
         for file in ficheros:
             nomfichero = os.path.basename(file)
@@ -925,11 +1018,9 @@ class DBgames:
             dl_tmp.pon_titulo(nomfichero)
             next_n = random.randint(800, 1500)
 
-            obj_decode.read_file(file)
-
-            with PGNreader(file, self.depth_stat()) as fpgn:
+            with ImportPGN.PGNgames(file, self.depth_stat(), parallel) as fpgn:
                 bsize = fpgn.size
-                for n, (body, is_raw, pv, fens, bdCab, bdCablwr, btell) in enumerate(fpgn, 1):
+                for n, (body, is_raw, pv, xpv, d_cab, d_cablwr, binicio, btell) in enumerate(fpgn, 1):
                     if n == next_n:
                         if time.time() - t1 > 0.5:
                             if not dl_tmp.actualiza(
@@ -947,12 +1038,10 @@ class DBgames:
                     if not pv and not allows_cero_moves:
                         erroneos += 1
                         dl_tmp.refresh_gui()
-                        write_logs(fich_erroneos, fpgn.bpgn())
+                        write_logs(fich_erroneos, fpgn.bpgn(binicio, btell))
                         dl_tmp.refresh_gui()
                         continue
 
-                    d_cab = {decode(k).replace(" ", ""): decode(v).strip() for k, v in bdCab.items()}
-                    d_cablwr = {decode(k).replace(" ", ""): decode(v) for k, v in bdCablwr.items()}
                     dcabs.update(d_cablwr)
 
                     # Filtro previo: descartar partidas que no cumplan la condición
@@ -963,8 +1052,6 @@ class DBgames:
                             dl_tmp.refresh_gui()
                             continue
 
-                    xpv = pv_xpv(pv)
-
                     fen = d_cab.get("FEN", None)
                     if fen:
                         if fen == FEN_INITIAL:
@@ -974,14 +1061,14 @@ class DBgames:
                         else:
                             if not allows_fen:
                                 erroneos += 1
-                                write_logs(fich_erroneos, fpgn.bpgn())
+                                write_logs(fich_erroneos, fpgn.bpgn(binicio, btell))
                                 continue
                             xpv = "|%s|%s" % (fen, xpv)
 
                     if not fen:
                         if not allows_complete_games:
                             erroneos += 1
-                            write_logs(fich_erroneos, fpgn.bpgn())
+                            write_logs(fich_erroneos, fpgn.bpgn(binicio, btell))
                             continue
                         fen = None  # por si hay alguno vacio
 
@@ -992,12 +1079,11 @@ class DBgames:
 
                         # Duplicados respecto a las grabadas ya
                         else:
-                            cursor = conexion.execute("SELECT 1 FROM Games WHERE XPV = ? LIMIT 1", (xpv,))
-                            ok = cursor.fetchone() is None
+                            ok = not dup_index.is_duplicate(xpv)
 
                         if not ok:
                             duplicados += 1
-                            write_logs(fich_duplicados, fpgn.bpgn())
+                            write_logs(fich_duplicados, fpgn.bpgn(binicio, btell))
                             continue
 
                         st_xpv_bloque.add(xpv)
@@ -1009,9 +1095,11 @@ class DBgames:
                                 n_regs = 0
                                 dl_tmp.refresh_gui()
                                 conexion.executemany(sql, li_regs)
+                                dup_index.flush()
                                 li_regs = []
                                 st_xpv_bloque = set()
                                 conexion.commit()
+                                self.stat_positions_flush()
                                 dl_tmp.refresh_gui()
                                 if self.with_db_stat:
                                     self.db_stat.massive_append_set(False)
@@ -1048,13 +1136,18 @@ class DBgames:
 
                     if self.with_db_stat and fen is None and pv:
                         self.db_stat.append(pv, result)
+                    self.stat_positions_append(
+                        fen, pv, d_cab.get("RESULT"), d_cab.get("WHITEELO"), d_cab.get("BLACKELO"), d_cab.get("DATE")
+                    )
 
                     li_regs.append(reg)
+                    dup_index.append(xpv)
                     n_regs += 1
                     importados += 1
                     if n_regs == 50000:
                         n_regs = 0
                         conexion.executemany(sql, li_regs)
+                        dup_index.flush()
                         li_regs = []
                         st_xpv_bloque = set()
             if dl_tmp.is_canceled():
@@ -1064,11 +1157,14 @@ class DBgames:
 
         if li_regs:
             conexion.executemany(sql, li_regs)
+        dup_index.flush()
+        dup_index.bloom = None
 
         if self.with_db_stat:
             self.db_stat.massive_append_set(False)
             self.db_stat.commit()
         conexion.commit()
+        self.stat_positions_flush()
 
         dl_tmp.put_continue()
 
@@ -1103,8 +1199,12 @@ class DBgames:
         sql = f"INSERT INTO Games ({quoted_fields}) VALUES ({select_values});"
 
         pos_result = db.li_fields.index("RESULT") if "RESULT" in db.li_fields else None
+        li_pos_stat = self.stat_positions_indexes(db.li_fields)
 
         st_xpv_bloque = set()
+        dup_index = self.dup_index
+        if duplicate_check:
+            dup_index.load(len(li_recnos))
 
         li_regs = []
         n_regs = 0
@@ -1152,10 +1252,7 @@ class DBgames:
                 if row[0] in st_xpv_bloque:
                     ok = False
                 else:
-                    cursor = conexion.execute(
-                        "SELECT COUNT(*) FROM games WHERE XPV = ?", (row[0],)
-                    )  # No vale la variable xpv, que se ha cambiado
-                    ok = cursor.fetchone()[0] == 0
+                    ok = not dup_index.is_duplicate(row[0])  # No vale la variable xpv, que se ha cambiado
                 if not ok:
                     duplicados += 1
                     continue
@@ -1165,16 +1262,23 @@ class DBgames:
                 pv = xpv_pv(xpv)
                 result = row[pos_result]
                 self.db_stat.append(pv, result)
+            if self.stat_positions_following():
+                fen_row, pv_row = self.read_xpv(row[0])
+                li_values = [None if pos is None else row[pos] for pos in li_pos_stat]
+                self.stat_positions_append(fen_row, pv_row, *li_values)
 
             li_regs.append(row)
+            dup_index.append(row[0])
             n_regs += 1
             importados += 1
             if n_regs == 10000:
                 n_regs = 0
                 conexion.executemany(sql, li_regs)
+                dup_index.flush()
                 li_regs = []
                 st_xpv_bloque = set()
                 conexion.commit()
+                self.stat_positions_flush()
                 if self.with_db_stat:
                     self.db_stat.commit()
 
@@ -1182,10 +1286,13 @@ class DBgames:
         dl_tmp.put_saving()
         if li_regs:
             conexion.executemany(sql, li_regs)
+        dup_index.flush()
+        dup_index.bloom = None
         if self.with_db_stat:
             self.db_stat.massive_append_set(False)
             self.db_stat.commit()
         conexion.commit()
+        self.stat_positions_flush()
         dl_tmp.put_continue()
         return si_cols_cambiados
 
@@ -1226,15 +1333,32 @@ class DBgames:
         values = ",".join(["?"] * len(li_fields))
         return f"INSERT INTO Games ({fields}) VALUES ({values})"
 
-    def add_reg_lichess(self, sql, fen, pv, row, with_commit):
+    @staticmethod
+    def stat_positions_indexes(li_fields):
+        """
+        Positions in li_fields of RESULT, WHITEELO, BLACKELO and DATE, the fields of the statistics by position,
+        None the missing ones.
+        """
+        li_upper = [field.upper() for field in li_fields]
+        return [li_upper.index(field) if field in li_upper else None for field in DBgamesVersion.FIELDS_STATS]
+
+    def add_reg_lichess(self, sql, fen, pv, row, with_commit, li_pos_stat=None):
+        """
+        li_pos_stat: stat_positions_indexes of the tags of the row.
+        """
         xpv = f"|{fen}|{pv_xpv(pv)}"
+        if li_pos_stat and self.stat_positions_following():
+            self.stat_positions_append(fen, pv, *[None if pos is None else row[pos] for pos in li_pos_stat])
         plycount = (pv.count(" ") + 1) if pv else 0
         row.insert(0, plycount)
         row.insert(0, xpv)
+        self.dup_index.append(xpv)
         cursor = self.conexion.execute(sql, row)
         self.li_row_ids.append(cursor.lastrowid)
         if with_commit:
+            self.dup_index.flush()
             self.conexion.commit()
+            self.stat_positions_flush()
 
     def modify(self, recno, game_modificada: Game.Game, with_commit=True):
         resp = Util.Record()
@@ -1280,10 +1404,22 @@ class DBgames:
         rowid = self.li_row_ids[recno]
         sql = f"UPDATE Games SET {set_clause} WHERE ROWID = ?"
         try:
+            xpv_new = li_data[self.li_fields.index("XPV")]
+            self.dup_index.remove(self.field(recno, "XPV"))
+            self.dup_index.append(xpv_new)
+            if self.stat_positions_following():
+                self.stat_positions_remove(recno)
+                fen_new, pv_new = self.read_xpv(xpv_new)
+                li_values = [game_modificada.get_tag(tag) or None for tag in ("Result", "WhiteElo", "BlackElo", "Date")]
+                self.stat_positions_append(fen_new, pv_new, *li_values)
             self.conexion.execute(sql, li_data + [rowid])
             if with_commit:
+                self.dup_index.flush()
                 self.conexion.commit()
+                self.stat_positions_flush()
         except sqlite3.Error as e:
+            self.dup_index.cancel()
+            self.stat_positions_cancel()
             resp.ok = False
             resp.mens_error = str(e)
             return resp
@@ -1347,10 +1483,7 @@ class DBgames:
             fen_nue = game_new.first_position.fen()
             xpv_nue = f"|{fen_nue}|{xpv_nue}"
         if not self.allows_duplicates:
-            sql = "SELECT COUNT(*) FROM Games WHERE XPV = ?"
-            cursor = self.conexion.execute(sql, (xpv_nue,))
-            row = cursor.fetchone()
-            if row[0] > 0:
+            if self.dup_index.is_duplicate(xpv_nue):
                 resp.ok = False
                 resp.mens_error = _("This position is duplicated") if si_fen_nue else _("This game is duplicated")
                 return resp
@@ -1375,11 +1508,19 @@ class DBgames:
         cursor = None
         try:
             cursor = self.conexion.cursor()
+            self.dup_index.append(xpv_nue)
+            if self.stat_positions_following():
+                li_values = [game_new.get_tag(tag) or None for tag in ("WhiteElo", "BlackElo", "Date")]
+                self.stat_positions_append(fen_nue if si_fen_nue else None, pv_nue, result_nue, *li_values)
             cursor.execute(sql, li_data)
             if with_commit:
+                self.dup_index.flush()
                 self.conexion.commit()
+                self.stat_positions_flush()
             self.li_row_ids.append(cursor.lastrowid)
         except sqlite3.Error as e:
+            self.dup_index.cancel()
+            self.stat_positions_cancel()
             if with_commit:
                 self.conexion.rollback()
             resp.ok = False
@@ -1401,7 +1542,9 @@ class DBgames:
         return resp
 
     def commit(self):
+        self.dup_index.flush()
         self.conexion.commit()
+        self.stat_positions_flush()
         if self.with_db_stat:
             self.db_stat.commit()
 
@@ -1435,8 +1578,7 @@ class DBgames:
                 li.append(f'XPV LIKE "{xpv}%"')
 
         if li_rowids:
-            for rowid in li_rowids:
-                li.append(f"ROWID = {rowid}")
+            li.append(f"ROWID IN ({','.join(str(rowid) for rowid in sorted(set(li_rowids)))})")
 
         condicion = f"({' OR '.join(li)})"
         self.filter = condicion
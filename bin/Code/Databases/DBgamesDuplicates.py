@@ -0,0 +1,169 @@
+"""
+Duplicate detection for DBgames.
+
+Every XPV (first fen + moves) added to the Games table is saved also as a 64 bits hash in the table XPVHASH,
+when checking duplicates the hashes are loaded in a Bloom filter and only the games that pass the filter
+are searched by XPV in Games.
+The hashes of the games removed or modified are removed too. The index saves the version of the games it has
+(see DBgamesVersion), and it is built again when the games have been changed without following them here.
+"""
+import hashlib
+
+from Code.Databases import DBgamesVersion
+
+HASH_MASK = (1 << 64) - 1
+
+
+def xpv_hash(xpv: str) -> int:
+    return int.from_bytes(hashlib.blake2b(xpv.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class BloomFilter:
+    """
+    Bit array of 2**n bits, about 10 bits per item and 7 positions per item (false positives ~1%).
+    """
+
+    num_hashes = 7
+
+    def __init__(self, num_items: int):
+        num_bits = 1 << 16
+        while num_bits < num_items * 10:
+            num_bits <<= 1
+        self.mask = num_bits - 1
+        self.bits = bytearray(num_bits >> 3)
+
+    def add(self, xhash: int):
+        # Double hashing, from the two halves of the 64 bits hash
+        xhash &= HASH_MASK
+        pos = xhash & 0xFFFFFFFF
+        step = (xhash >> 32) | 1
+        mask = self.mask
+        bits = self.bits
+        for i in range(self.num_hashes):
+            bits[(pos & mask) >> 3] |= 1 << (pos & 7)
+            pos += step
+
+    def __contains__(self, xhash: int) -> bool:
+        xhash &= HASH_MASK
+        pos = xhash & 0xFFFFFFFF
+        step = (xhash >> 32) | 1
+        mask = self.mask
+        bits = self.bits
+        for i in range(self.num_hashes):
+            if not bits[(pos & mask) >> 3] & (1 << (pos & 7)):
+                return False
+            pos += step
+        return True
+
+
+class DuplicatesIndex:
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.bloom = None
+        self.li_added = []
+        self.li_removed = []
+        self.version_start = None  # version of the games before the changes pending
+        self._exists = None
+
+    def exists(self) -> bool:
+        if self._exists is None:
+            cursor = self.conexion.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='XPVHASH_VERSION'")
+            self._exists = cursor.fetchone() is not None
+        return self._exists
+
+    def read_version(self):
+        if not self.exists():
+            return None
+        row = self.conexion.execute("SELECT VERSION FROM XPVHASH_VERSION").fetchone()
+        return row[0] if row else None
+
+    def is_updated(self) -> bool:
+        version = self.read_version()
+        return version is not None and version == DBgamesVersion.read_version(self.conexion, DBgamesVersion.GAMES)
+
+    def check(self):
+        """
+        Build of the hashes when the version saved is not the version of the games: databases created before this
+        index or changed by a previous version, by other program, or by changes not followed here.
+        """
+        if self.is_updated():
+            return
+        for sql in (
+                "DROP TABLE IF EXISTS XPVHASH",
+                "DROP TABLE IF EXISTS XPVHASH_VERSION",
+                "CREATE TABLE XPVHASH (HASH INTEGER)",
+        ):
+            self.conexion.execute(sql)
+        cursor = self.conexion.cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT XPV FROM Games")
+        self.conexion.executemany("INSERT INTO XPVHASH (HASH) VALUES (?)", ((xpv_hash(xpv),) for (xpv,) in cursor))
+        self.conexion.execute("CREATE INDEX XPVHASH_INDEX ON XPVHASH (HASH)")
+        self.conexion.execute("CREATE TABLE XPVHASH_VERSION (VERSION INTEGER)")
+        version = DBgamesVersion.read_version(self.conexion, DBgamesVersion.GAMES)
+        self.conexion.execute("INSERT INTO XPVHASH_VERSION (VERSION) VALUES (?)", (version,))
+        self.conexion.commit()
+        self._exists = True
+
+    def load(self, num_new: int = 0):
+        """
+        Bloom filter with the hashes of the database, with room for num_new games more.
+        """
+        self.check()
+        num_hashes = self.conexion.execute("SELECT COUNT(*) FROM XPVHASH").fetchone()[0]
+        self.bloom = BloomFilter(num_hashes + num_new)
+        add = self.bloom.add
+        cursor = self.conexion.cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT HASH FROM XPVHASH")
+        for (xhash,) in cursor:
+            add(xhash)
+
+    def is_duplicate(self, xpv: str) -> bool:
+        if self.bloom is not None and xpv_hash(xpv) not in self.bloom:
+            return False
+        cursor = self.conexion.execute("SELECT 1 FROM Games WHERE XPV = ? LIMIT 1", (xpv,))
+        return cursor.fetchone() is not None
+
+    def start_changes(self):
+        if self.version_start is None:
+            self.version_start = DBgamesVersion.read_version(self.conexion, DBgamesVersion.GAMES)
+
+    def append(self, xpv: str):
+        """
+        Hash of a game to add to Games, to call before the insert, saved with flush().
+        """
+        self.start_changes()
+        xhash = xpv_hash(xpv)
+        if self.bloom is not None:
+            self.bloom.add(xhash)
+        self.li_added.append((xhash,))
+
+    def remove(self, xpv: str):
+        """
+        Hash of a game to remove from Games or to modify, to call before the change, saved with flush().
+        """
+        self.start_changes()
+        self.li_removed.append((xpv_hash(xpv),))
+
+    def flush(self):
+        """
+        The hashes pending are saved, before the commit of the games, if the index was up to date when the changes
+        started, otherwise it will be built again by check().
+        """
+        if self.version_start is not None and self.version_start == self.read_version():
+            if self.li_removed:
+                self.conexion.executemany(
+                    "DELETE FROM XPVHASH WHERE ROWID = (SELECT ROWID FROM XPVHASH WHERE HASH = ? LIMIT 1)",
+                    self.li_removed,
+                )
+            if self.li_added:
+                self.conexion.executemany("INSERT INTO XPVHASH (HASH) VALUES (?)", self.li_added)
+            version = DBgamesVersion.read_version(self.conexion, DBgamesVersion.GAMES)
+            self.conexion.execute("UPDATE XPVHASH_VERSION SET VERSION = ?", (version,))
+        self.cancel()
+
+    def cancel(self):
+        self.li_added = []
+        self.li_removed = []
+        self.version_start = None
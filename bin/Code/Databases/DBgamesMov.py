@@ -1,10 +1,166 @@
+"""
+Index of the positions of a DBgames, file {database}.lcmv, used to filter the games by position.
+
+For every position there is a list of postings (rowid, ply) of the games where it appears, saved as a blob
+of varints: the difference with the previous rowid and the ply + 1. When a position is reached always by a few
+sequences of moves, they are saved instead of the games, and the games are found with XPV LIKE.
+The positions of the standard openings are not saved, they are found by their sequences.
+The key of a position is its fen64 packed in 32 bytes, a nibble per square.
+"""
+import heapq
+import marshal
+import os
 import sqlite3
+import tempfile
 
 from Code.Z import Util
 from Code.Databases import DBgames
 from Code.Openings import OpeningsStd
 from Code.SQL import UtilSQL
 
+FORMAT = 2
+MAX_SEQUENCES = 64
+FEN64_NIBBLES = str.maketrans(" PNBRQKpnbrqk", "0123456789abc")
+
+
+def fen64_key(fen64: str) -> bytes:
+    return bytes.fromhex(fen64.translate(FEN64_NIBBLES))
+
+
+def encode_varint(data: bytearray, num: int):
+    while num > 0x7F:
+        data.append((num & 0x7F) | 0x80)
+        num >>= 7
+    data.append(num)
+
+
+def decode_postings(data: bytes) -> list:
+    """
+    List of (rowid, ply) of a blob of postings.
+    """
+    li = []
+    rowid = 0
+    num = shift = 0
+    is_rowid = True
+    for byte in data:
+        num |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        if is_rowid:
+            rowid += num
+        else:
+            li.append((rowid, num - 1))
+        is_rowid = not is_rowid
+        num = shift = 0
+    return li
+
+
+def rebase_postings(data: bytes, first_rowid: int, prev_rowid: int) -> bytes:
+    """
+    Blob of postings starting with the absolute first_rowid, to be added after other one ending at prev_rowid.
+    """
+    pos = 0
+    while data[pos] & 0x80:
+        pos += 1
+    head = bytearray()
+    encode_varint(head, first_rowid - prev_rowid)
+    return bytes(head) + data[pos + 1 :]
+
+
+class PostingsBuilder:
+    """
+    Postings of the positions accumulated in memory, the games must be added in order of rowid.
+    When there are too many they are saved sorted by key to a temporary file, and at the end all the runs are
+    merged, the blobs of a position are joined in order of rowid.
+    """
+
+    def __init__(self, max_keys=500_000, max_postings=5_000_000):
+        self.max_keys = max_keys
+        self.max_postings = max_postings
+        self.dic = {}  # key of the position -> [blob, first rowid, last rowid, set of sequences or None]
+        self.num_postings = 0
+        self.li_runs = []
+
+    def add(self, key, rowid, ply, pv):
+        entry = self.dic.get(key)
+        if entry is None:
+            entry = self.dic[key] = [bytearray(), rowid, 0, set() if pv else None]
+        data = entry[0]
+        encode_varint(data, rowid - entry[2])
+        encode_varint(data, ply + 1)
+        entry[2] = rowid
+        st_seq = entry[3]
+        if st_seq is not None:
+            if not pv or (len(st_seq) >= MAX_SEQUENCES and pv not in st_seq):
+                entry[3] = None  # games with fen or too many sequences, always by games
+            else:
+                st_seq.add(pv)
+        self.num_postings += 1
+
+    def check_memory(self):
+        if len(self.dic) >= self.max_keys or self.num_postings >= self.max_postings:
+            self.spill()
+
+    def sorted_records(self, num_run):
+        for key, (data, first, last, st_seq) in sorted(self.dic.items()):
+            yield key, num_run, bytes(data), first, last, tuple(st_seq) if st_seq is not None else None
+
+    def spill(self):
+        fd, path = tempfile.mkstemp(prefix="lcmv_", suffix=".run")
+        with os.fdopen(fd, "wb") as f:
+            for record in self.sorted_records(len(self.li_runs)):
+                marshal.dump(record, f)
+        self.li_runs.append(path)
+        self.dic = {}
+        self.num_postings = 0
+
+    @staticmethod
+    def read_run(path):
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield marshal.load(f)
+                except EOFError:
+                    return
+
+    def merged_records(self):
+        """
+        (key, blob, first rowid, last rowid, tuple of sequences or None) sorted by key.
+        """
+        li_iters = [self.read_run(path) for path in self.li_runs]
+        li_iters.append(self.sorted_records(len(self.li_runs)))
+        last = None
+        for key, num_run, data, first, last_rowid, seqs in heapq.merge(*li_iters):
+            if last is not None and last[0] == key:
+                last[1] += rebase_postings(data, first, last[3])
+                last[3] = last_rowid
+                if last[4] is not None:
+                    if seqs is None:
+                        last[4] = None
+                    else:
+                        st = set(last[4])
+                        st.update(seqs)
+                        last[4] = tuple(st) if len(st) <= MAX_SEQUENCES else None
+            else:
+                if last is not None:
+                    yield last
+                last = [key, data, first, last_rowid, seqs]
+        if last is not None:
+            yield last
+
+    def close(self):
+        for path in self.li_runs:
+            Util.remove_file(path)
+        self.li_runs = []
+        self.dic = {}
+
+
+def with_sequences(data, seqs):
+    if seqs is None:
+        return False
+    return sum(len(pv) + 1 for pv in seqs) * 3 < len(data)
+
 
 class DBgamesMov:
     def __init__(self, dbgames: DBgames.DBgames):
@@ -14,7 +170,9 @@ class DBgamesMov:
         self.dic_fen64_sequences = OpeningsStd.ap.dic_fen64()
 
     def need_generate(self):
-        return not (Util.exist_file(self.path) and self.read_lastrowid_saved() > 0)
+        if not (Util.exist_file(self.path) and self.read_lastrowid_saved() > 0):
+            return True
+        return self.read_config("FORMAT") != FORMAT  # previous versions saved the games as text
 
     def pending(self):
         lastrowid = self.read_lastrowid_saved()
@@ -25,138 +183,120 @@ class DBgamesMov:
         conexion.row_factory = sqlite3.Row
         return conexion
 
+    def collect(self, ws, builder, after_rowid=0):
+        """
+        Postings of the games with rowid > after_rowid, returns the last rowid or None if canceled.
+        """
+        rowid_prev = 0
+        pos_reg = 0
+        last_rowid = after_rowid
+        with_fen = False
+        dic_fen64_sequences = self.dic_fen64_sequences
+        fen_fen64 = Util.fen_fen64
+        for rowid, fen, pos, pv in self.dbgames.yield_allfens(after_rowid):
+            if rowid != rowid_prev:
+                if rowid > last_rowid:
+                    last_rowid = rowid
+                pos_reg += 1
+                if pos_reg % 100 == 0:
+                    ws.pon(pos_reg)
+                    if ws.is_canceled():
+                        return None
+                builder.check_memory()
+                rowid_prev = rowid
+                with_fen = pos < 0  # the sequences are only for games from the initial position
+
+            fen64 = fen_fen64(fen)
+            li_seq = dic_fen64_sequences.get(fen64)
+            if li_seq and pv in li_seq:
+                continue
+            builder.add(fen64_key(fen64), rowid, pos, "" if with_fen else pv)
+        ws.pon(pos_reg)
+        return last_rowid
+
     def generate(self, ws) -> bool:
-        with UtilSQL.DictBig() as db:
-            rowid_prev = 0
-            pos_reg = 0
-
-            last_rowid = 0
-
-            for rowid, fen, pos, pv in self.dbgames.yield_allfens():
-                if rowid != rowid_prev:
-                    if rowid > last_rowid:
-                        last_rowid = rowid
-                    pos_reg += 1
-                    if pos_reg % 100 == 0:
-                        ws.pon(pos_reg)
-                    rowid_prev = rowid
-                if ws.is_canceled():
-                    return False
-
-                fen64 = Util.fen_fen64(fen)
-                if fen64 in self.dic_fen64_sequences and pv in self.dic_fen64_sequences[fen64]:
-                    continue
-                li = db.get(fen64, {"G": [], "S": []})
-                li["G"].append(f"{rowid}:{pos}")
-                if pv not in li["S"]:
-                    li["S"].append(pv)
-                db[fen64] = li
+        builder = PostingsBuilder()
+        try:
+            last_rowid = self.collect(ws, builder)
+            if last_rowid is None:
+                return False
 
             Util.remove_file(self.path)
             self.create()
             conexion = self.conexion()
             ws.put_label(_("Saving..."))
-            total = len(db)
-            if total > 1000:
-                limit = 100
-            else:
-                limit = 2
-
-            ws.set_total(len(db))
-            for pos, (fen64, value) in enumerate(db.items()):
-                if pos % limit == 0:
-                    ws.pon(pos)
-                g = value["G"]
-                s = value["S"]
-                t_g = sum(len(x.split(":")[0]) + 2 for x in g)
-                t_s = sum(len(x) + 2 for x in s)
-                if t_s * 3 < t_g:
-                    data = f"S{'|'.join(s)}"
-                else:
-                    data = f"G{'|'.join(g)}"
-                sql = "INSERT INTO POSITIONS( FEN64, DATA ) VALUES( ?, ? );"
-                conexion.execute(sql, (fen64, data))
+            ws.set_total(0)
+
+            def rows():
+                for key, data, first, last, seqs in builder.merged_records():
+                    if with_sequences(data, seqs):
+                        yield key, None, 0, "|".join(seqs)
+                    else:
+                        yield key, data, last, None
+
+            sql = "INSERT INTO POSITIONS( FEN64, GAMES, LAST_ROWID, SEQUENCES ) VALUES( ?, ?, ?, ? );"
+            conexion.executemany(sql, rows())
             conexion.commit()
             conexion.close()
-            self.write_lastrowid_saved(last_rowid)
+        finally:
+            builder.close()
+        self.save_config("FORMAT", FORMAT)
+        self.write_lastrowid_saved(last_rowid)
         return True
 
     def update(self, ws) -> bool:
-        conexion = self.conexion()
-        last_rowid = self.read_lastrowid_saved()
-        rowid_prev = 0
-        pos_reg = 0
-        for rowid, fen, pos, pv in self.dbgames.yield_allfens(last_rowid):
-            if rowid != rowid_prev:
-                if rowid > last_rowid:
-                    last_rowid = rowid
-                rowid_prev = rowid
-                pos_reg += 1
-                ws.pon(pos_reg)
-                if ws.is_canceled():
-                    break
-
-            fen64 = Util.fen_fen64(fen)
-            if fen64 in self.dic_fen64_sequences and pv in self.dic_fen64_sequences[fen64]:
-                continue
-
-            sql = "SELECT DATA FROM POSITIONS WHERE FEN64=?;"
-            cursor = conexion.execute(sql, (fen64,))
-            row = cursor.fetchone()
-            if row:
-                data = row[0]
-                if data.startswith("G"):
-                    row = f"|{rowid}:{pos}"
-                    if row not in data:
-                        data += row
-                    else:
-                        continue
+        """
+        The postings of the new games are added at the end of the blobs, the rowids are always greater.
+        """
+        builder = PostingsBuilder()
+        try:
+            last_rowid = self.collect(ws, builder, self.read_lastrowid_saved())
+            if last_rowid is None:
+                return False
+            conexion = self.conexion()
+            for key, data, first, last, seqs in builder.merged_records():
+                row = conexion.execute(
+                    "SELECT GAMES, LAST_ROWID, SEQUENCES FROM POSITIONS WHERE FEN64=?;", (key,)
+                ).fetchone()
+                if row is None:
+                    sql = "INSERT INTO POSITIONS( FEN64, GAMES, LAST_ROWID, SEQUENCES ) VALUES( ?, ?, ?, ? );"
+                    conexion.execute(sql, (key, data, last, None))
+                elif row[2] is not None and seqs is not None:
+                    li_seq = row[2].split("|")
+                    li_seq.extend(pv for pv in seqs if pv not in li_seq)
+                    conexion.execute("UPDATE POSITIONS SET SEQUENCES=? WHERE FEN64=?;", ("|".join(li_seq), key))
                 else:
-                    if pv not in data:
-                        data += f"|{pv}"
-                    else:
-                        continue
-                sql = "UPDATE POSITIONS SET DATA=? WHERE FEN64=?;"
-                li_datos = [data, fen64]
-            else:
-                data = f"G{rowid}:{pos}"
-                sql = "INSERT INTO POSITIONS( FEN64, DATA ) VALUES( ?, ? );"
-                li_datos = [fen64, data]
-            conexion.execute(sql, li_datos)
-
-        conexion.commit()
-        conexion.close()
+                    # LAST_ROWID is the last one of GAMES, 0 when there are only sequences
+                    data = (row[0] or b"") + rebase_postings(data, first, row[1] or 0)
+                    sql = "UPDATE POSITIONS SET GAMES=?, LAST_ROWID=? WHERE FEN64=?;"
+                    conexion.execute(sql, (data, last, key))
+            conexion.commit()
+            conexion.close()
+        finally:
+            builder.close()
         self.write_lastrowid_saved(last_rowid)
-        return not ws.is_canceled()
+        return True
 
     def filter(self, fen):
         fen64 = Util.fen_fen64(fen)
-        conexion = self.conexion()
-        sql = "SELECT DATA FROM POSITIONS WHERE FEN64=?;"
-        cursor = conexion.execute(sql, (fen64,))
-        row = cursor.fetchone()
-        cursor.close()
-        conexion.close()
-        if row is None:
-            if fen64 in self.dic_fen64_sequences:
-                return self.dic_fen64_sequences[fen64], []
+        li_book = self.dic_fen64_sequences.get(fen64)
+        resp = self.seek_fen(fen)
+        if resp is None:
+            if li_book:
+                return li_book, []
             return None
-        data = row[0]
-        if data.startswith("G"):
-            li_dt = [dt.split(":") for dt in data[1:].split("|")]
-            li = [(int(x[0]), int(x[1])) for x in li_dt]
-            return self.dic_fen64_sequences.get(fen64), li
-
-        li = data[1:].split("|")
-        if self.dic_fen64_sequences.get(fen64):
-            li.extend(self.dic_fen64_sequences.get(fen64))
-        st = set(li)
-        return list(st), []
+        li_games, li_seq = resp
+        if li_seq:
+            if li_book:
+                li_seq.extend(li_book)
+            return list(set(li_seq)), li_games
+        return li_book, li_games
 
     def create(self):
         conexion = self.conexion()
         for sql in (
-            "CREATE TABLE POSITIONS(FEN64 VARCHAR PRIMARY KEY,DATA VARCHAR);",
+            "CREATE TABLE POSITIONS(FEN64 BLOB PRIMARY KEY, GAMES BLOB, LAST_ROWID INTEGER, SEQUENCES VARCHAR)"
+            " WITHOUT ROWID;",
             "PRAGMA page_size = 4096;",
             "PRAGMA synchronous = OFF;",
             "PRAGMA cache_size = 10000;",
@@ -167,29 +307,18 @@ class DBgamesMov:
         conexion.close()
 
     def seek_fen(self, fen):
+        """
+        (list of (rowid, ply), list of sequences) of a position, None if it is not in the index.
+        """
         fen64 = Util.fen_fen64(fen)
-
-        li_rowids = []
-        if fen64 in self.dic_fen64_sequences:
-            li_sequences = self.dic_fen64_sequences[fen64]
-        else:
-            li_sequences = []
-
-        sql = "SELECT GAMES, SEQUENCES FROM POSITIONS WHERE FEN64 = ?"
-
         conexion = sqlite3.connect(self.path)
-        conexion.row_factory = sqlite3.Row
-        cursor = conexion.execute(sql, (fen64,))
-        li = cursor.fetchall()
-        if li:
-            for games, sequences in li:
-                if games:
-                    li_rowids.extend([int(rowid) for rowid in games.split(",")])
-                if sequences:
-                    li_sequences.extend([xpv for xpv in sequences.split(",")])
-
+        cursor = conexion.execute("SELECT GAMES, SEQUENCES FROM POSITIONS WHERE FEN64 = ?", (fen64_key(fen64),))
+        row = cursor.fetchone()
         conexion.close()
-        return li_rowids, li_sequences
+        if row is None:
+            return None
+        games, sequences = row
+        return decode_postings(games) if games else [], sequences.split("|") if sequences else []
 
     def save_config(self, key, valor):
         with UtilSQL.DictRawSQL(self.path, "Config") as dbconf:
@@ -0,0 +1,211 @@
+"""
+Opening explorer of a DBgames by positions.
+
+The statistics of every move are saved with the polyglot hash of the position where it is played, so the games
+that reach a position by different move orders are added together. The file is {database}.st2, all the moves
+of a position are read with one query of the primary key.
+The file saves the version of the games it has been made with (see DBgamesVersion), DBgames adds to it the games
+inserted, modified and removed while it is up to date, otherwise it has to be rebuilt.
+"""
+import sqlite3
+
+import FasterCode
+
+from Code.Databases import DBgamesST
+from Code.Z import Util
+
+
+def position_key(fen) -> int:
+    key = FasterCode.hash_polyglot8(fen)
+    return key - (1 << 64) if key >= (1 << 63) else key  # INTEGER of sqlite
+
+
+def year_date(date):
+    if date and len(date) >= 4 and date[:4].isdigit():
+        return int(date[:4])
+    return 0
+
+
+def elo_value(elo):
+    try:
+        return int(elo)
+    except (TypeError, ValueError):
+        return 0
+
+
+def add_game(dic_moves, fen, pv, result, white_elo, black_elo, date, depth, r=+1):
+    """
+    Counters of the moves of a game added to dic_moves {(hashkey, move): [W, B, D, O, ELO_SUM, ELO_NUM, YEAR]},
+    r=-1 to remove the game, the year is only a maximum and it is kept.
+    """
+    if not pv:
+        return
+    col = DBgamesST.result_column(result)
+    elo_white, elo_black = elo_value(white_elo), elo_value(black_elo)
+    year = year_date(date) if r > 0 else 0
+    board = FasterCode.Board(fen or None)
+    st_seen = set()  # a repeated position counts once
+    for a1h8 in pv.split(" ")[:depth]:
+        fen_move = board.get_fen()
+        key = (position_key(fen_move), a1h8)
+        if not board.play(a1h8):
+            break
+        if key in st_seen:
+            continue
+        st_seen.add(key)
+        values = dic_moves.get(key)
+        if values is None:
+            values = dic_moves[key] = [0, 0, 0, 0, 0, 0, 0]
+        values[col] += r
+        elo = elo_white if " w " in fen_move else elo_black
+        if elo:
+            values[4] += elo * r
+            values[5] += r
+        if year > values[6]:
+            values[6] = year
+
+
+class PositionSTAT:
+    def __init__(self, path_file, max_keys=1_000_000):
+        self.path_file = path_file
+        self.max_keys = max_keys
+        self._conexion = sqlite3.connect(self.path_file)
+        self._check_table()
+        self.dic_pending = {}
+        self.version_start = None  # version of the games before the changes pending
+        self.following = False  # the file was up to date when the changes started
+        self.depth = 0
+
+    def _check_table(self):
+        cursor = self._conexion.execute("pragma table_info(MOVES)")
+        if not cursor.fetchall():
+            self._conexion.execute(
+                "CREATE TABLE MOVES(HASHKEY INTEGER, MOVE TEXT, W INT, B INT, D INT, O INT, "
+                "ELO_SUM INT, ELO_NUM INT, YEAR INT, PRIMARY KEY(HASHKEY, MOVE)) WITHOUT ROWID;"
+            )
+            self._conexion.execute("CREATE TABLE CONFIG(KEY TEXT PRIMARY KEY, VALUE TEXT);")
+            self._conexion.commit()
+
+    def close(self):
+        if self._conexion:
+            self._conexion.close()
+            self._conexion = None
+
+    def reset(self):
+        self.close()
+        Util.remove_file(self.path_file)
+        self._conexion = sqlite3.connect(self.path_file)
+        self._check_table()
+
+    def read_config(self, key, default=None):
+        cursor = self._conexion.execute("SELECT VALUE FROM CONFIG WHERE KEY = ?", (key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+
+    def save_config(self, key, value):
+        self._conexion.execute("INSERT OR REPLACE INTO CONFIG(KEY, VALUE) VALUES(?, ?)", (key, str(value)))
+        self._conexion.commit()
+
+    def is_updated(self, version):
+        return version is not None and self.read_config("VERSION") == str(version)
+
+    def write(self, dic_moves):
+        sql = (
+            "INSERT INTO MOVES(HASHKEY, MOVE, W, B, D, O, ELO_SUM, ELO_NUM, YEAR) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(HASHKEY, MOVE) DO UPDATE SET W=W+excluded.W, B=B+excluded.B, D=D+excluded.D,"
+            " O=O+excluded.O, ELO_SUM=ELO_SUM+excluded.ELO_SUM, ELO_NUM=ELO_NUM+excluded.ELO_NUM,"
+            " YEAR=MAX(YEAR, excluded.YEAR)"
+        )
+        self._conexion.executemany(sql, (key + tuple(values) for key, values in sorted(dic_moves.items())))
+
+    def start_changes(self, version):
+        """
+        Version of the games before the changes, to call before appending the first game changed.
+        """
+        self.version_start = version
+        self.following = self.is_updated(version)
+        self.depth = int(self.read_config("DEPTH", 0))
+
+    def append(self, fen, pv, result, white_elo, black_elo, date, r=+1):
+        """
+        A game inserted (r=+1) or removed (r=-1) from Games, saved with flush(). Nothing is done when the file is not
+        up to date, it has to be rebuilt anyway.
+        """
+        if not self.following:
+            return
+        add_game(self.dic_pending, fen, pv, result, white_elo, black_elo, date, self.depth, r)
+        if len(self.dic_pending) >= self.max_keys:
+            self.save_pending()
+
+    def save_pending(self):
+        if self.following:
+            self.write(self.dic_pending)
+            self._conexion.executemany(
+                "DELETE FROM MOVES WHERE HASHKEY = ? AND MOVE = ? AND W + B + D + O <= 0",
+                [key for key, values in self.dic_pending.items() if values[0] + values[1] + values[2] + values[3] < 0],
+            )
+        self.dic_pending = {}
+
+    def flush(self, version):
+        """
+        After the commit of the games, with their version now, the changes are saved if the file was up to date when
+        they started.
+        """
+        if self.version_start is None:
+            return
+        if self.following:
+            self.save_pending()
+            self.save_config("VERSION", version)
+        self.cancel()
+
+    def cancel(self):
+        self._conexion.rollback()
+        self.dic_pending = {}
+        self.version_start = None
+        self.following = False
+
+    def rebuild(self, games, version, reccount, depth, dispatch):
+        """
+        games: iterator of (fen, pv, result, white_elo, black_elo, date)
+        The counters are kept in memory and added to the table every max_keys positions and moves.
+        version: of the games read.
+        """
+        self.reset()
+        dic_moves = {}
+        for recno, (fen, pv, result, white_elo, black_elo, date) in enumerate(games, 1):
+            if recno % 1000 == 0 and not dispatch(recno, reccount):
+                return
+            add_game(dic_moves, fen, pv, result, white_elo, black_elo, date, depth)
+            if len(dic_moves) >= self.max_keys:
+                self.write(dic_moves)
+                dic_moves = {}
+        self.write(dic_moves)
+        self._conexion.commit()
+        self.save_config("DEPTH", depth)
+        self.save_config("VERSION", version)
+
+    def children(self, pv_base, allmoves=True):
+        board = FasterCode.Board()
+        board.play_pv(pv_base)
+        cursor = self._conexion.execute(
+            "SELECT MOVE, W, B, D, O, ELO_SUM, ELO_NUM, YEAR FROM MOVES WHERE HASHKEY = ?",
+            (position_key(board.get_fen()),),
+        )
+        dic_rows = {row[0]: row for row in cursor.fetchall()}
+        li_resp = []
+        for infomove in board.get_exmoves():
+            move = infomove.move()
+            rec = DBgamesST.RecordSTAT()
+            rec.move = move
+            row = dic_rows.get(move)
+            if row:
+                rec.W, rec.B, rec.D, rec.OTHER = row[1:5]
+                rec.ELO = row[5] // row[6] if row[6] else 0
+                rec.YEAR = row[7]
+            elif not allmoves:
+                continue
+            li_resp.append(rec)
+        return li_resp
+
+    def get_summary(self, pv_base, dic_analysis, with_figurines, allmoves=True):
+        return DBgamesST.get_summary(self.children(pv_base, allmoves), pv_base, dic_analysis, with_figurines, allmoves)
@@ -1,4 +1,9 @@
+import array
+import hashlib
+import heapq
+import os
 import sqlite3
+import tempfile
 
 import FasterCode
 
@@ -23,6 +28,9 @@ class RecordSTAT:
         self.D = 0
         self.OTHER = 0
 
+        self.ELO = 0  # average of the players of the move, only by positions (DBgamesPOS)
+        self.YEAR = 0
+
         self.cached = False
         self.move = None
         self.ROWID = None
@@ -31,6 +39,114 @@ class RecordSTAT:
         return self.W + self.B + self.D + self.OTHER
 
 
+MASK_KEY = 0xFFFFFFFFFFFFFFF  # Util.md5_lc
+
+
+def result_column(result):
+    if result == "1-0":
+        return 0
+    elif result == "0-1":
+        return 1
+    elif result == "1/2-1/2":
+        return 2
+    return 3
+
+
+class BulkSTAT:
+    """
+    Counters W, B, D, O of many games accumulated in memory, with the keys of TreeSTAT, the md5 of the moves of
+    each prefix, computed incrementally move by move.
+    When there are more than max_keys keys they are saved sorted to a temporary file, and at the end all
+    the runs are merged and added to the STATS table in one sorted bulk insert.
+    """
+
+    def __init__(self, depth, max_keys=2_000_000):
+        self.depth = depth
+        self.max_keys = max_keys
+        self.dic_pos = {}  # key -> position in counters
+        self.counters = array.array("q")
+        self.li_runs = []
+
+    def add(self, key, col, r):
+        pos = self.dic_pos.get(key)
+        if pos is None:
+            pos = self.dic_pos[key] = len(self.counters)
+            self.counters.extend((0, 0, 0, 0))
+        self.counters[pos + col] += r
+
+    def append(self, hinikey, pv, result, r=+1):
+        col = result_column(result)
+        self.add(hinikey, col, r)
+        if pv:
+            md5 = hashlib.md5()
+            for move in pv.split(" ")[: self.depth]:
+                md5.update(move.encode())
+                self.add(int.from_bytes(md5.copy().digest(), "big") & MASK_KEY, col, r)
+        if len(self.dic_pos) >= self.max_keys:
+            self.spill()
+
+    def sorted_records(self):
+        counters = self.counters
+        for key, pos in sorted(self.dic_pos.items()):
+            yield key, counters[pos], counters[pos + 1], counters[pos + 2], counters[pos + 3]
+
+    def spill(self):
+        fd, path = tempfile.mkstemp(prefix="lcst_", suffix=".run")
+        with os.fdopen(fd, "wb") as f:
+            block = array.array("q")
+            for record in self.sorted_records():
+                block.extend(record)
+                if len(block) >= 50000:
+                    block.tofile(f)
+                    block = array.array("q")
+            block.tofile(f)
+        self.li_runs.append(path)
+        self.dic_pos = {}
+        self.counters = array.array("q")
+
+    @staticmethod
+    def read_run(path):
+        with open(path, "rb") as f:
+            while True:
+                block = array.array("q")
+                block.frombytes(f.read(8 * 5 * 10000))
+                if not block:
+                    break
+                for pos in range(0, len(block), 5):
+                    yield tuple(block[pos : pos + 5])
+
+    def merged_records(self):
+        li_iters = [self.read_run(path) for path in self.li_runs]
+        li_iters.append(self.sorted_records())
+        last = None
+        for key, w, b, d, o in heapq.merge(*li_iters):
+            if last is not None and last[0] == key:
+                last[1] += w
+                last[2] += b
+                last[3] += d
+                last[4] += o
+            else:
+                if last is not None:
+                    yield last
+                last = [key, w, b, d, o]
+        if last is not None:
+            yield last
+
+    def write(self, conexion):
+        sql = (
+            "INSERT INTO STATS( HASHKEY, W, B, D, O ) VALUES( ?, ?, ?, ?, ? ) ON CONFLICT(HASHKEY) DO UPDATE"
+            " SET W=W+excluded.W, B=B+excluded.B, D=D+excluded.D, O=O+excluded.O"
+        )
+        try:
+            conexion.executemany(sql, self.merged_records())
+        finally:
+            for path in self.li_runs:
+                Util.remove_file(path)
+            self.li_runs = []
+            self.dic_pos = {}
+            self.counters = array.array("q")
+
+
 class TreeSTAT:
     def __init__(self, path_file, depth=None):
         self.path_file = path_file
@@ -42,8 +158,7 @@ class TreeSTAT:
         self.depth = self.defaultDepth if depth is None else depth
         self._check_table()
 
-        self.cache = None
-        self.cache_active = False
+        self.bulk = None
 
     def conexion(self):
         return self._conexion
@@ -83,9 +198,6 @@ class TreeSTAT:
         self._check_table()
 
     def read_rec(self, hkey):
-        if self.cache_active:
-            if hkey in self.cache:
-                return self.cache[hkey]
         sql = "SELECT ROWID, W, B, D, O FROM STATS WHERE HASHKEY = ?"
         cursor = self._conexion.execute(sql, (hkey,))
         row = cursor.fetchone()
@@ -99,10 +211,6 @@ class TreeSTAT:
         return rec
 
     def write_rec(self, hkey, rec):
-        if self.cache_active:
-            if rec.total() > 10:
-                self.cache[hkey] = rec
-                return None
         rowid = rec.ROWID
         if rowid is None:
             sql = "INSERT INTO STATS( HASHKEY, W, B, D, O ) VALUES( ?, ?, ?, ?, ? )"
@@ -129,6 +237,10 @@ class TreeSTAT:
         return self.write_rec(hkey, rec)
 
     def append(self, pv, result, r=+1):
+        if self.bulk:
+            self.bulk.append(self.hinikey, pv, result, r)
+            return
+
         w = b = d = o = 0
         if result == "1-0":
             w += r
@@ -140,22 +252,23 @@ class TreeSTAT:
             o += r
 
         self.add(self.hinikey, w, b, d, o)
-        li_pv = pv.split(" ")
-        for depth, move in enumerate(li_pv):
-            if depth >= self.depth:
-                break
-            hkey = Util.md5_lc("".join(li_pv[: depth + 1]))
-            self.add(hkey, w, b, d, o)
+        if pv:
+            li_pv = pv.split(" ")
+            for depth, move in enumerate(li_pv):
+                if depth >= self.depth:
+                    break
+                hkey = Util.md5_lc("".join(li_pv[: depth + 1]))
+                self.add(hkey, w, b, d, o)
 
     def massive_append_set(self, start):
+        """
+        Between start=True and start=False the games appended are counted in memory by a BulkSTAT.
+        """
         if start:
-            self.cache = {}
-            self.cache_active = True
-        else:
-            self.cache_active = False
-            for hkey, rec in self.cache.items():
-                self.write_rec(hkey, rec)
-            self.cache = None
+            self.bulk = BulkSTAT(self.depth)
+        elif self.bulk:
+            bulk, self.bulk = self.bulk, None
+            bulk.write(self._conexion)
 
     def root(self):
         return self.read_rec(self.hinikey)
@@ -179,125 +292,133 @@ class TreeSTAT:
         return li_resp
 
     def get_summary(self, pv_base, dic_analysis, with_figurines, allmoves=True):
+        return get_summary(self.children(pv_base, allmoves), pv_base, dic_analysis, with_figurines, allmoves)
 
-        li_moves = []
-        is_white = pv_base.count(" ") % 2 == 1 if pv_base else True
-
-        li_children = self.children(pv_base, allmoves)
-
-        tt = 0
-
-        lipvmove = []
-        for rec in li_children:
-            win, draw, b, o = rec.W, rec.D, rec.B, rec.OTHER
-            t = rec.total()
-
-            pvmove = rec.move
-            pv = f"{pv_base} {pvmove}"
-            pv = pv.strip()
-            lipvmove.append(pvmove)
-            tt += t
-
-            dic = {
-                "number": "",
-                "pvmove": pvmove,
-                "pv": pv,
-                "analysis": dic_analysis.get(pvmove, None),
-                "games": t,
-                "white": win,
-                "draw": draw,
-                "black": b,
-                "other": o,
-                "pwhite": win * 100.0 / t if t else 0.0,
-                "pdraw": draw * 100.0 / t if t else 0.0,
-                "pblack": b * 100.0 / t if t else 0.0,
-                "pother": o * 100.0 / t if t else 0.0,
-                "rec": rec,
-            }
-
-            li_moves.append(dic)
-
-        if allmoves:
-            for pvmove in dic_analysis:
-                if pvmove not in lipvmove:
-                    pv = f"{pv_base} {pvmove}"
-                    pv = pv.strip()
-
-                    dic = {
-                        "pvmove": pvmove,
-                        "pv": pv,
-                        "analysis": dic_analysis[pvmove],
-                        "games": 0,
-                        "white": 0,
-                        "draw": 0,
-                        "black": 0,
-                        "other": 0,
-                        "pwhite": 0.00,
-                        "pdraw": 0.00,
-                        "pblack": 0.00,
-                        "pother": 0.00,
-                        "rec": None,
-                    }
-
-                    li_moves.append(dic)
-
-        li_moves = sorted(li_moves, key=lambda xdic: -xdic["games"])
-
-        tg = win = draw = lost = 0
-        for dic in li_moves:
-            dic["pgames"] = dic["games"] * 100.0 / tt if tt else 0.0
-            dic["pdrawwhite"] = dic["pwhite"] + dic["pdraw"]
-            dic["pdrawblack"] = dic["pblack"] + dic["pdraw"]
-            if is_white:
-                dic["win"] = dic["white"]
-                dic["lost"] = dic["black"]
-                dic["pwin"] = dic["pwhite"]
-                dic["plost"] = dic["pblack"]
-                dic["pdrawwin"] = dic["pdrawwhite"]
-                dic["pdrawlost"] = dic["pdrawblack"]
-            else:
-                dic["lost"] = dic["white"]
-                dic["win"] = dic["black"]
-                dic["pdrawlost"] = dic["pdrawwhite"]
-                dic["pdrawwin"] = dic["pdrawblack"]
-                dic["plost"] = dic["pwhite"]
-                dic["pwin"] = dic["pblack"]
-
-            g = dic["games"]
-            tg += g
-            win += dic["win"]
-            lost += dic["lost"]
-            draw += dic["draw"]
-
-            pvmove = dic["pvmove"]
-            if pvmove:
-                pv = dic["pv"]
-                p = Game.Game()
-                p.read_pv(pv)
-                if p.num_moves():
-                    move = p.last_jg()
-                    num_moves = move.num_move()
-                    pgn = move.pgn_figurines() if with_figurines else move.pgn_translated()
-                    dic["move"] = pgn
-                    dic["number"] = "%d." % num_moves
-                    if not move.is_white():
-                        # dic["move"] = pgn_translated.lower()
-                        dic["number"] += ".."
-                else:
-                    dic["move"] = pvmove
-                dic["game"] = p
+
+def get_summary(li_children, pv_base, dic_analysis, with_figurines, allmoves=True):
+    """
+    Rows of the opening explorer from the children records of pv_base, the last one with the totals.
+    """
+    li_moves = []
+    is_white = pv_base.count(" ") % 2 == 1 if pv_base else True
+
+    tt = 0
+
+    lipvmove = []
+    for rec in li_children:
+        win, draw, b, o = rec.W, rec.D, rec.B, rec.OTHER
+        t = rec.total()
+
+        pvmove = rec.move
+        pv = f"{pv_base} {pvmove}"
+        pv = pv.strip()
+        lipvmove.append(pvmove)
+        tt += t
 
         dic = {
-            "games": tg,
-            "win": win,
+            "number": "",
+            "pvmove": pvmove,
+            "pv": pv,
+            "analysis": dic_analysis.get(pvmove, None),
+            "games": t,
+            "white": win,
             "draw": draw,
-            "lost": lost,
-            "pwin": win * 100.0 / tg if tg else 0.0,
-            "pdraw": draw * 100.0 / tg if tg else 0.0,
-            "plost": lost * 100.0 / tg if tg else 0.0,
-            "pdrawwin": (win + draw) * 100.0 / tg if tg else 0.0,
-            "pdrawlost": (lost + draw) * 100.0 / tg if tg else 0.0,
+            "black": b,
+            "other": o,
+            "pwhite": win * 100.0 / t if t else 0.0,
+            "pdraw": draw * 100.0 / t if t else 0.0,
+            "pblack": b * 100.0 / t if t else 0.0,
+            "pother": o * 100.0 / t if t else 0.0,
+            "elo": rec.ELO,
+            "year": rec.YEAR,
+            "rec": rec,
         }
+
         li_moves.append(dic)
 
-        return li_moves
+    if allmoves:
+        for pvmove in dic_analysis:
+            if pvmove not in lipvmove:
+                pv = f"{pv_base} {pvmove}"
+                pv = pv.strip()
+
+                dic = {
+                    "pvmove": pvmove,
+                    "pv": pv,
+                    "analysis": dic_analysis[pvmove],
+                    "games": 0,
+                    "white": 0,
+                    "draw": 0,
+                    "black": 0,
+                    "other": 0,
+                    "pwhite": 0.00,
+                    "pdraw": 0.00,
+                    "pblack": 0.00,
+                    "pother": 0.00,
+                    "elo": 0,
+                    "year": 0,
+                    "rec": None,
+                }
+
+                li_moves.append(dic)
+
+    li_moves = sorted(li_moves, key=lambda xdic: -xdic["games"])
+
+    tg = win = draw = lost = 0
+    for dic in li_moves:
+        dic["pgames"] = dic["games"] * 100.0 / tt if tt else 0.0
+        dic["pdrawwhite"] = dic["pwhite"] + dic["pdraw"]
+        dic["pdrawblack"] = dic["pblack"] + dic["pdraw"]
+        if is_white:
+            dic["win"] = dic["white"]
+            dic["lost"] = dic["black"]
+            dic["pwin"] = dic["pwhite"]
+            dic["plost"] = dic["pblack"]
+            dic["pdrawwin"] = dic["pdrawwhite"]
+            dic["pdrawlost"] = dic["pdrawblack"]
+        else:
+            dic["lost"] = dic["white"]
+            dic["win"] = dic["black"]
+            dic["pdrawlost"] = dic["pdrawwhite"]
+            dic["pdrawwin"] = dic["pdrawblack"]
+            dic["plost"] = dic["pwhite"]
+            dic["pwin"] = dic["pblack"]
+
+        g = dic["games"]
+        tg += g
+        win += dic["win"]
+        lost += dic["lost"]
+        draw += dic["draw"]
+
+        pvmove = dic["pvmove"]
+        if pvmove:
+            pv = dic["pv"]
+            p = Game.Game()
+            p.read_pv(pv)
+            if p.num_moves():
+                move = p.last_jg()
+                num_moves = move.num_move()
+                pgn = move.pgn_figurines() if with_figurines else move.pgn_translated()
+                dic["move"] = pgn
+                dic["number"] = "%d." % num_moves
+                if not move.is_white():
+                    # dic["move"] = pgn_translated.lower()
+                    dic["number"] += ".."
+            else:
+                dic["move"] = pvmove
+            dic["game"] = p
+
+    dic = {
+        "games": tg,
+        "win": win,
+        "draw": draw,
+        "lost": lost,
+        "pwin": win * 100.0 / tg if tg else 0.0,
+        "pdraw": draw * 100.0 / tg if tg else 0.0,
+        "plost": lost * 100.0 / tg if tg else 0.0,
+        "pdrawwin": (win + draw) * 100.0 / tg if tg else 0.0,
+        "pdrawlost": (lost + draw) * 100.0 / tg if tg else 0.0,
+    }
+    li_moves.append(dic)
+
+    return li_moves
@@ -0,0 +1,44 @@
+"""
+Version of the games of a DBgames, to know if the indexes saved apart from the games are up to date.
+
+The table GamesVersion has a counter for every kind of index, increased by triggers of the table Games, so the changes
+made by previous versions or other programs are counted too:
+    GAMES: games inserted or removed, and changes of XPV, for the hashes of the duplicates (XPVHASH).
+    STATS: the same and changes of the fields of the statistics by position (.st2).
+Every index saves the version it has been made with, it is up to date while it is the same.
+"""
+import sqlite3
+
+GAMES = "GAMES"
+STATS = "STATS"
+
+FIELDS_STATS = ("RESULT", "WHITEELO", "BLACKELO", "DATE")
+
+
+def check_triggers(conexion):
+    """
+    To call when the database is opened and after Games is created again, the triggers are removed with the table.
+    """
+    increase = "UPDATE GamesVersion SET VERSION = VERSION + 1"
+    try:
+        for sql in (
+                "CREATE TABLE IF NOT EXISTS GamesVersion (NAME TEXT PRIMARY KEY, VERSION INTEGER);",
+                f"INSERT OR IGNORE INTO GamesVersion (NAME, VERSION) VALUES ('{GAMES}', 0), ('{STATS}', 0);",
+                f"CREATE TRIGGER IF NOT EXISTS GamesVersionInsert AFTER INSERT ON Games BEGIN {increase}; END;",
+                f"CREATE TRIGGER IF NOT EXISTS GamesVersionDelete AFTER DELETE ON Games BEGIN {increase}; END;",
+                f"CREATE TRIGGER IF NOT EXISTS GamesVersionXPV AFTER UPDATE OF XPV ON Games BEGIN {increase}; END;",
+                f"CREATE TRIGGER IF NOT EXISTS GamesVersionStats AFTER UPDATE OF {', '.join(FIELDS_STATS)} ON Games "
+                f"BEGIN {increase} WHERE NAME = '{STATS}'; END;",
+        ):
+            conexion.execute(sql)
+        conexion.commit()
+    except sqlite3.Error:  # read only
+        pass
+
+
+def read_version(conexion, name):
+    try:
+        row = conexion.execute("SELECT VERSION FROM GamesVersion WHERE NAME = ?", (name,)).fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
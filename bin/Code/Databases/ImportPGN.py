@@ -0,0 +1,134 @@
+"""
+Reading of the games of a PGN file for DBgames.import_pgns.
+
+Big files are split on game boundaries and the chunks are parsed in a pool of processes, each one with its own
+FasterCode state, the games are returned in the order of the file so the database keeps it.
+"""
+import collections
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import FasterCode
+
+from Code.Z import Util
+
+MIN_SIZE_PARALLEL = 32 * 1024 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def num_workers() -> int:
+    return max(1, min(os.cpu_count() or 1, 8) - 1)
+
+
+def game_boundaries(path_file: str, chunk_size: int = CHUNK_SIZE) -> list:
+    """
+    List of (start, end) ranges of about chunk_size bytes with complete games.
+    """
+    li_ranges = []
+    start = end = None
+    with FasterCode.PGNreader(path_file, 0) as fpgn:
+        for offset, length in fpgn.games_raw():
+            if start is None:
+                start = offset
+            end = offset + length
+            if end - start >= chunk_size:
+                li_ranges.append((start, end))
+                start = None
+    if start is not None:
+        li_ranges.append((start, end))
+    return li_ranges
+
+
+def iter_games(fpgn, codec: str):
+    """
+    Games of a FasterCode.PGNreader as tuples (body, is_raw, pv, xpv, d_cab, d_cablwr, pos_ini, pos_end).
+    """
+    decode = Util.Decode(codec).decode
+    pv_xpv = FasterCode.pv_xpv
+    for body, is_raw, pv, fens, bd_cab, bd_cablwr, btell in fpgn:
+        d_cab = {decode(k).replace(" ", ""): decode(v).strip() for k, v in bd_cab.items()}
+        d_cablwr = {decode(k).replace(" ", ""): decode(v) for k, v in bd_cablwr.items()}
+        yield body, is_raw, pv, pv_xpv(pv), d_cab, d_cablwr, fpgn.inicio, btell
+
+
+def read_games(path_file: str, depth: int, codec: str, start: int, end: int) -> list:
+    """
+    Run in the workers, the games of a range of the file.
+    """
+    with FasterCode.PGNreader(path_file, depth, start, end) as fpgn:
+        return list(iter_games(fpgn, codec))
+
+
+class PGNgames:
+    """
+    Iterator of the games of a PGN file, in the format of read_games.
+    parallel: None = automatic, by the size of the file.
+    """
+
+    def __init__(self, path_file: str, depth: int, parallel=None):
+        self.path_file = path_file
+        self.depth = depth
+        self.size = os.path.getsize(path_file)
+        self.codec = Util.file_encoding(path_file)
+        if parallel is None:
+            parallel = self.size >= MIN_SIZE_PARALLEL and num_workers() > 1
+        self.parallel = parallel
+        self.fpgn = None
+        self.fread = None
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self.fread:
+            self.fread.close()
+            self.fread = None
+        return False
+
+    def __iter__(self):
+        if self.parallel:
+            yield from self.iter_parallel()
+        else:
+            yield from self.iter_sequential()
+
+    def iter_sequential(self):
+        with FasterCode.PGNreader(self.path_file, self.depth) as fpgn:
+            self.fpgn = fpgn
+            yield from iter_games(fpgn, self.codec)
+            self.fpgn = None
+
+    def iter_parallel(self):
+        workers = num_workers()
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        pending = collections.deque()
+        li_ranges = game_boundaries(self.path_file)
+        li_ranges.reverse()
+
+        def submit():
+            start, end = li_ranges.pop()
+            pending.append(self.executor.submit(read_games, self.path_file, self.depth, self.codec, start, end))
+
+        # a limited number of chunks in memory, waiting for the writer
+        while li_ranges and len(pending) < workers * 2:
+            submit()
+        while pending:
+            li_games = pending.popleft().result()
+            if li_ranges:
+                submit()
+            yield from li_games
+
+    def bpgn(self, pos_ini: int, pos_end: int) -> bytes:
+        """
+        Text of a game, for the logs of errors and duplicates.
+        """
+        if self.fpgn:
+            return self.fpgn.bpgn()
+        if self.fread is None:
+            self.fread = open(self.path_file, "rb")
+        self.fread.seek(pos_ini)
+        return self.fread.read(pos_end - pos_ini)
@@ -1552,13 +1552,7 @@ class WGames(QtWidgets.QWidget):
             calc_weight,
             save_score,
         ) = resp
-        db = UtilSQL.DictBig()
-
-        def fadd(keymove, count, pts_add):
-            num, pts = db.get(keymove, (0, 0))
-            num += count
-            pts += pts_add
-            db[keymove] = num, pts
+        counter = PolyglotImportExports.BookCounter()
 
         dltmp = PolyglotImportExports.ImportarPGNDB(self, titulo)
         dltmp.show()
@@ -1572,21 +1566,22 @@ class WGames(QtWidgets.QWidget):
             li_players,
             ru,
             dltmp.dispatch,
-            fadd,
+            counter,
         )
         dltmp.close()
 
         if ok:
-            PolyglotImportExports.create_bin_from_dbbig(
+            PolyglotImportExports.create_bin_from_counter(
                 self,
                 path_bin,
-                db,
+                counter,
                 min_games,
                 min_score,
                 calc_weight,
                 save_score,
                 uniform,
             )
+        counter.close()
 
     def tw_exportar_db(self, lista):
         dbpath = QTDialogs.select_db(self, self.configuration, False, True)
@@ -1972,6 +1967,7 @@ class WGames(QtWidgets.QWidget):
                         row.append("ECO")
                     li_tags = [tag.upper() for tag in row]
                     sql = self.db_games.create_sql_insert(li_tags)
+                    li_pos_stat = self.db_games.stat_positions_indexes(li_tags)
                     self.db_games.check_columns(row)
                     continue
                 fen = row[pos_fen]
@@ -1990,7 +1986,7 @@ class WGames(QtWidgets.QWidget):
                 del row[pos_moves]
 
                 with_commit = pos % 100000 == 0
-                self.db_games.add_reg_lichess(sql, fen, pv, row, with_commit)
+                self.db_games.add_reg_lichess(sql, fen, pv, row, with_commit, li_pos_stat)
 
                 if pos % 10 == 0:
                     pb.pon(pos_ftell)
@@ -12,6 +12,7 @@ from Code.QT import Colocacion, Columnas, Controles, Delegados, FormLayout, Grid
 class WSummary(QtWidgets.QWidget):
     reccount: int
     allmoves: bool
+    transpositions: bool
 
     def __init__(self, procesador, wb_database, db_games, with_moves=True):
         QtWidgets.QWidget.__init__(self)
@@ -65,6 +66,8 @@ class WSummary(QtWidgets.QWidget):
         o_columns.nueva("plost", f"% {_('Loss')}", 60, align_right=True)
         o_columns.nueva("pdrawwin", f"% {_('W+D')}", 60, align_right=True)
         o_columns.nueva("pdrawlost", f"% {_('L+D')}", 60, align_right=True)
+        o_columns.nueva("elo", _("Elo"), 60, align_right=True)
+        o_columns.nueva("year", _("Year"), 60, align_right=True)
 
         self.grid = Grid.Grid(self, o_columns, xid="summary", complete_row_select=True)
         self.grid.set_height_row(self.configuration.x_pgn_rowheight)
@@ -164,7 +167,7 @@ class WSummary(QtWidgets.QWidget):
 
         # Last=Totals
         if self.is_row_with_totals(nfila):
-            if key in ("number", "analysis", "pgames"):
+            if key in ("number", "analysis", "pgames", "elo", "year"):
                 return ""
             elif key == "move":
                 return _("Total")
@@ -176,7 +179,9 @@ class WSummary(QtWidgets.QWidget):
         ):
             return ""
         v = self.liMoves[nfila][key]
-        if key.startswith("p"):
+        if key in ("elo", "year"):
+            return str(v) if v else ""
+        elif key.startswith("p"):
             return f"{v:.01f} %"
         elif key == "analysis":
             return v.abbrev_text_base() if v else ""
@@ -312,11 +317,34 @@ class WSummary(QtWidgets.QWidget):
             return not bp_tmp.is_canceled()
 
         self.db_games.rebuild_stat(dispatch, depth)
+        if self.transpositions and not bp_tmp.is_canceled():
+            self.db_games.rebuild_stat_positions(dispatch, depth)
         bp_tmp.cerrar()
         self.start()
 
         return None
 
+    def rebuild_positions(self):
+        if not self.db_games.has_result_field():
+            QTMessages.message_error(self, _("This database does not have a RESULT field"))
+            return False
+
+        self.reccount = 0
+        bp_tmp = QTMessages.ProgressBarWithTime(self, _("Rebuilding"))
+        bp_tmp.mostrar()
+
+        def dispatch(recno, reccount):
+            if reccount != self.reccount:
+                self.reccount = reccount
+                bp_tmp.set_total(reccount)
+            bp_tmp.pon(recno)
+            return not bp_tmp.is_canceled()
+
+        self.db_games.rebuild_stat_positions(dispatch, self.db_games.depth_stat() or 30)
+        ok = not bp_tmp.is_canceled()
+        bp_tmp.cerrar()
+        return ok
+
     def active_move(self):
         recno = self.grid.recno()
         if recno >= 0:
@@ -362,7 +390,15 @@ class WSummary(QtWidgets.QWidget):
         if analysis_mrm:
             for rm in analysis_mrm.li_rm:
                 dic_analisis[rm.movimiento()] = rm
-        self.liMoves = self.db_games.get_summary(pv_mirar, dic_analisis, self.with_figurines, self.allmoves)
+        if self.transpositions and not self.db_games.is_updated_stat_positions():
+            # games changed without following them in the .st2: fields edited in the grid, other programs or versions
+            if not self.rebuild_positions():
+                self.transpositions = False
+        if self.transpositions:
+            get_summary = self.db_games.get_summary_positions
+        else:
+            get_summary = self.db_games.get_summary
+        self.liMoves = get_summary(pv_mirar, dic_analisis, self.with_figurines, self.allmoves)
 
         self.grid.refresh()
         self.grid.gotop()
@@ -397,6 +433,7 @@ class WSummary(QtWidgets.QWidget):
         if not dic_config:
             dic_config = {"allmoves": False}
         self.allmoves = dic_config["allmoves"]
+        self.transpositions = dic_config.get("transpositions", False)
         return dic_config
 
     # def grabaConfig(self):
@@ -407,10 +444,17 @@ class WSummary(QtWidgets.QWidget):
     def config(self):
         menu = QTDialogs.LCMenu(self)
         menu.opcion("allmoves", _("Show all moves"), is_checked=self.allmoves)
+        menu.opcion("transpositions", _("Merge transpositions"), is_checked=self.transpositions)
         resp = menu.lanza()
         if resp is None:
             return
-        self.allmoves = not self.allmoves
+        if resp == "allmoves":
+            self.allmoves = not self.allmoves
+        elif resp == "transpositions":
+            if not self.transpositions and not self.db_games.is_updated_stat_positions():
+                if not self.rebuild_positions():
+                    return
+            self.transpositions = not self.transpositions
 
         self.update_pv(self.pv_base)
 
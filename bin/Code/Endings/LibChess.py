@@ -41,17 +41,17 @@ class T4:
         fen = game.last_position.fen()
         lifens.append(fen.split(" ")[0])
 
-        FasterCode.set_fen(fen)
+        board = FasterCode.Board(fen)
 
-        li_moves = FasterCode.get_moves()
+        li_moves = board.get_moves()
         lista_win = []
         lista_draw = []
         lista_lost = []
         for xpv in li_moves:
             pv = xpv[1:]
-            FasterCode.set_fen(fen)
-            FasterCode.move_pv(pv[:2], pv[2:4], pv[4:])
-            xfen = FasterCode.get_fen()
+            board.make_move(pv)
+            xfen = board.get_fen()
+            board.unmake_move()
             dtm = -self.dtm(xfen)
             if dtm is not None:
                 fen_base = xfen.split(" ")[0]
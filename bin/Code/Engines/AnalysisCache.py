@@ -0,0 +1,172 @@
+"""
+Analysis cache shared by all the sessions and processes (GUI, analysis workers, kibitzers).
+
+One analysis per (fenm2, engine, multipv), the deepest one. An analysis can be used for a search with limits
+lower or equal: depth reached, time used or nodes searched, any of them, as the engine stops with the first one.
+Searches without limits (infinite) are not cached.
+When the file is bigger than max_size, the positions used less recently are removed.
+"""
+import hashlib
+import sqlite3
+import time
+from typing import Optional
+
+import Code
+from Code.Engines import EngineResponse, EngineRun
+from Code.Z import Util
+
+MAX_SIZE = 128 * 1024 * 1024
+CHECK_SIZE_EVERY = 256
+
+UCI_OPTIONS_IGNORED = {"multipv", "threads", "hash", "ponder", "uci_analysemode"}
+
+
+def engine_id(name: str, path_exe: str, li_uci: list) -> str:
+    """
+    The name and a hash of the executable and the uci options that can change the analysis.
+    """
+    md5 = hashlib.md5(str(path_exe).encode("utf-8", errors="replace"))
+    for option, value in sorted((str(option), str(value)) for option, value in li_uci or []):
+        if option.lower() not in UCI_OPTIONS_IGNORED:
+            md5.update(f"|{option}={value}".encode("utf-8", errors="replace"))
+    return f"{name}|{md5.hexdigest()[:16]}"
+
+
+class AnalysisCache:
+    def __init__(self, path_file: str, max_size: int = MAX_SIZE):
+        self.path_file = path_file
+        self.max_size = max_size
+        self.num_puts = 0
+        self.conexion = sqlite3.connect(self.path_file, timeout=2.0)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS ANALYSIS(FENM2 TEXT, ENGINE TEXT, MULTIPV INT, DEPTH INT, MS INT, NODES INT,"
+            " LAST_USE INT, DATA BLOB, PRIMARY KEY(FENM2, ENGINE, MULTIPV))"
+        )
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS LAST_USE_INDEX ON ANALYSIS(LAST_USE)")
+        self.conexion.commit()
+
+    def close(self):
+        if self.conexion:
+            self.conexion.close()
+            self.conexion = None
+
+    @staticmethod
+    def limits(
+        mrm: EngineResponse.MultiEngineResponse, run_engine_params: EngineRun.RunEngineParams, finished: bool
+    ) -> tuple:
+        """
+        (depth, ms, nodes) of an analysis, the ones reached, or in a finished analysis the one requested when it was
+        the only limit, the engines report a time a little lower than the movetime.
+        """
+        rm = mrm.best_rm_ordered() if mrm.li_rm else None
+        depth = max(mrm.depth, rm.depth if rm else 0)
+        ms = rm.time if rm else 0
+        nodes = rm.nodes if rm else 0
+        if finished and not run_engine_params.fixed_depth:
+            if not run_engine_params.fixed_nodes:
+                ms = max(ms, run_engine_params.fixed_ms)
+            elif not run_engine_params.fixed_ms:
+                nodes = max(nodes, run_engine_params.fixed_nodes)
+        return depth, ms, nodes
+
+    def get(
+        self, fenm2: str, engine: str, run_engine_params: EngineRun.RunEngineParams
+    ) -> Optional[EngineResponse.MultiEngineResponse]:
+        if not run_engine_params.is_fixed() or self.conexion is None:
+            return None
+        sql = (
+            "SELECT MULTIPV, DEPTH, MS, NODES, DATA FROM ANALYSIS"
+            " WHERE FENM2=? AND ENGINE=? AND MULTIPV>=? ORDER BY MULTIPV"
+        )
+        try:
+            li_rows = self.conexion.execute(sql, (fenm2, engine, max(run_engine_params.multipv, 1))).fetchall()
+            for multipv, depth, ms, nodes, data in li_rows:
+                if (
+                    (0 < run_engine_params.fixed_depth <= depth)
+                    or (0 < run_engine_params.fixed_ms <= ms)
+                    or (0 < run_engine_params.fixed_nodes <= nodes)
+                ):
+                    dic = Util.zip2var(data)
+                    if not dic:
+                        continue
+                    self.conexion.execute(
+                        "UPDATE ANALYSIS SET LAST_USE=? WHERE FENM2=? AND ENGINE=? AND MULTIPV=?",
+                        (int(time.time() * 1000), fenm2, engine, multipv),
+                    )
+                    self.conexion.commit()
+                    mrm = EngineResponse.MultiEngineResponse(dic["name"], dic["is_white"])
+                    mrm.restore(dic)
+                    return mrm
+        except sqlite3.Error:  # locked by other process for too long, the cache is not essential
+            pass
+        return None
+
+    def put(
+        self,
+        fenm2: str,
+        engine: str,
+        run_engine_params: EngineRun.RunEngineParams,
+        mrm: EngineResponse.MultiEngineResponse,
+        finished: bool = True,
+    ):
+        """
+        finished: the engine stopped by the limits, not by the user.
+        """
+        if not run_engine_params.is_fixed() or self.conexion is None or mrm is None or not mrm.li_rm:
+            return
+        data = Util.var2zip(mrm.save())  # save() sorts li_rm
+        depth, ms, nodes = self.limits(mrm, run_engine_params, finished)
+        sql = (
+            "INSERT INTO ANALYSIS(FENM2, ENGINE, MULTIPV, DEPTH, MS, NODES, LAST_USE, DATA)"
+            " VALUES(?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(FENM2, ENGINE, MULTIPV) DO UPDATE"
+            " SET DEPTH=excluded.DEPTH, MS=excluded.MS, NODES=excluded.NODES, LAST_USE=excluded.LAST_USE,"
+            " DATA=excluded.DATA WHERE excluded.DEPTH >= ANALYSIS.DEPTH"
+        )
+        multipv = max(run_engine_params.multipv, 1)
+        try:
+            self.conexion.execute(sql, (fenm2, engine, multipv, depth, ms, nodes, int(time.time() * 1000), data))
+            self.conexion.commit()
+            self.num_puts += 1
+            if self.num_puts % CHECK_SIZE_EVERY == 0:
+                self.check_size()
+        except sqlite3.Error:
+            pass
+
+    def size(self) -> int:
+        page_count = self.conexion.execute("PRAGMA page_count").fetchone()[0]
+        freelist_count = self.conexion.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = self.conexion.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist_count) * page_size
+
+    def check_size(self):
+        """
+        Removes the least recently used quarter when the file is too big, the free pages are reused.
+        """
+        if self.size() <= self.max_size:
+            return
+        num = self.conexion.execute("SELECT COUNT(*) FROM ANALYSIS").fetchone()[0]
+        self.conexion.execute(
+            "DELETE FROM ANALYSIS WHERE ROWID IN (SELECT ROWID FROM ANALYSIS ORDER BY LAST_USE LIMIT ?)",
+            (max(num // 4, 1),),
+        )
+        self.conexion.commit()
+
+
+_analysis_cache: Optional[AnalysisCache] = None
+
+
+def analysis_cache(configuration=None) -> Optional[AnalysisCache]:
+    """
+    One connection per process, None if the file can't be opened.
+    configuration: in the processes where Code.configuration is not set, as the kibitzers.
+    """
+    global _analysis_cache
+    if _analysis_cache is None:
+        configuration = configuration or Code.configuration
+        try:
+            _analysis_cache = AnalysisCache(configuration.paths.file_analysis_cache())
+        except sqlite3.Error:
+            return None
+    return _analysis_cache
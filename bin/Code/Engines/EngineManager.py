@@ -7,7 +7,7 @@ import Code
 from Code.Z import Util
 if __debug__:
     from Code import Debug
-from Code.Engines import EngineResponse, EngineRun, Engines, Priorities
+from Code.Engines import AnalysisCache, EngineResponse, EngineRun, Engines, Priorities
 from Code.SQL import UtilSQL
 
 
@@ -38,6 +38,9 @@ class EngineManager:
         self.allways_faster_mode = False
 
         self.cache_analysis = UtilSQL.DictBig() if with_cache else None
+        self.cache_shared: Optional[AnalysisCache.AnalysisCache] = (
+            AnalysisCache.analysis_cache() if with_cache else None
+        )  # shared by all sessions, only for searches with limits
 
         self.enabled_emit_depth_changed = False
         self.enabled_emit_bestmove_found = False
@@ -139,13 +142,14 @@ class EngineManager:
         config_enginerun.args = self.engine.argumentos()
         config_enginerun.li_options_uci = self.engine.liUCI
         config_enginerun.faster_mode_always = self.allways_faster_mode
+        config_enginerun.full_history = self.engine.with_history()
         config_enginerun.priority = self.priority
         if self.engine.emulate_movetime:
             config_enginerun.emulate_movetime = True
         if Code.list_engine_managers.with_logs:
             config_enginerun.path_log = self.set_path_log()
 
-        self.engine_run = EngineRun.EngineRun(config_enginerun)
+        self.engine_run = Code.list_engine_managers.pool.lease(config_enginerun)
         if self.engine_run.state == EngineRun.EngineState.INVALID_ENGINE:
             self.starting_the_engine = False
             self.close()
@@ -183,7 +187,7 @@ class EngineManager:
 
         if self.engine_run:
             try:
-                self.engine_run.close()
+                Code.list_engine_managers.pool.release(self.engine_run)  # it is closed if it can't be used again
             except:
                 pass
             self.engine_run = None
@@ -194,6 +198,7 @@ class EngineManager:
             except:
                 pass
             self.cache_analysis = None
+        self.cache_shared = None
 
         if Code.list_engine_managers:
             Code.list_engine_managers.cleanup_closed()
@@ -252,3 +257,6 @@ class EngineManager:
     @property
     def name(self):
         return self.engine.name
+
+    def engine_cache_id(self) -> str:
+        return AnalysisCache.engine_id(self.engine.name, self.engine.path_exe, self.engine.liUCI)
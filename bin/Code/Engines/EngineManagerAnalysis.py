@@ -76,15 +76,23 @@ class EngineManagerAnalysis(EngineManager.EngineManager):
                     pass
             timer.stop()
 
-    def get_cache(self, fenm2):
+    def get_cache(self, fenm2) -> EngineResponse.MultiEngineResponse | None:
+        """
+        Analysis of this session, or of the shared cache when it was done with limits at least as big.
+        """
         if fenm2 in self.cache_analysis:
-            mrm = self.cache_analysis[fenm2]
-            self.engine_run.set_mrm_cached(mrm)
-            return mrm
+            return self.cache_analysis[fenm2]
+        if self.cache_shared is not None:
+            mrm = self.cache_shared.get(fenm2, self.engine_cache_id(), self.run_engine_params)
+            if mrm is not None:
+                self.cache_analysis[fenm2] = mrm
+                return mrm
         return None
 
-    def set_cache(self, fenm2, mrm):
+    def set_cache(self, fenm2, mrm, finished=True):
         self.cache_analysis[fenm2] = mrm
+        if self.cache_shared is not None:
+            self.cache_shared.put(fenm2, self.engine_cache_id(), self.run_engine_params, mrm, finished)
 
     def analyze_move(self, game, movement: int, dispatcher: Optional[Callable]) -> tuple:
         if not self.check_engine():
@@ -99,8 +107,8 @@ class EngineManagerAnalysis(EngineManager.EngineManager):
         if self.cache_analysis is not None:
             position = move.position_before if len(game) > 0 and movement >= 0 else game.first_position
             fenm2 = position.fenm2()
-            if fenm2 in self.cache_analysis:
-                mrm: EngineResponse.MultiEngineResponse = self.cache_analysis[fenm2]
+            mrm = self.get_cache(fenm2)
+            if mrm is not None:
                 rm, pos = mrm.search_rm(move.movimiento())
                 if pos >= 0:
                     self.engine_run.set_mrm_cached(mrm)
@@ -122,27 +130,37 @@ class EngineManagerAnalysis(EngineManager.EngineManager):
         movimiento = move.movimiento()
         rm, pos = self.mrm.search_rm(movimiento)
         if rm is None:
-            mrm = self.mrm.clone()
-
-            if mrm.depth > 1 and self.run_engine_params.fixed_nodes == 0 and self.run_engine_params.fixed_depth == 0:
-                tmp_play_params = self.run_engine_params.clone()
-                tmp_play_params.fixed_depth = mrm.depth - 1
-            else:
-                tmp_play_params = self.run_engine_params
-            rm = self.analyze_post_move(game, movement, tmp_play_params, dispatcher)
-            if self._is_canceled or rm is None:
-                return mrm, -1
-            rm.change_side(mv_insert=movimiento)
-            mrm.add_rm(rm)
-            self.engine_run.set_mrm_cached(mrm)
+            mrm = self.add_move_analysis(self.mrm, game, movement, dispatcher)
+            if mrm is None:
+                return self.mrm.clone(), -1
             self.mrm = mrm
 
         self.mrm.ordena()
         rm, pos = self.mrm.search_rm(movimiento)
         if self.cache_analysis is not None:
-            self.cache_analysis[fenm2] = self.mrm
+            self.set_cache(fenm2, self.mrm)
         return self.mrm, pos
 
+    def add_move_analysis(self, mrm, game, movement: int, dispatcher: Optional[Callable]):
+        """
+        A copy of mrm with the analysis of the move played, when it is not in the multipv, None if cancelled.
+        """
+        if not self.check_engine():
+            return None
+        mrm = mrm.clone()
+        if mrm.depth > 1 and self.run_engine_params.fixed_nodes == 0 and self.run_engine_params.fixed_depth == 0:
+            tmp_play_params = self.run_engine_params.clone()
+            tmp_play_params.fixed_depth = mrm.depth - 1
+        else:
+            tmp_play_params = self.run_engine_params
+        rm = self.analyze_post_move(game, movement, tmp_play_params, dispatcher)
+        if self._is_canceled or rm is None:
+            return None
+        rm.change_side(mv_insert=game.move(movement).movimiento())
+        mrm.add_rm(rm)
+        self.engine_run.set_mrm_cached(mrm)
+        return mrm
+
     def analyze_post_move(self, game, movement: int, tmp_play_params: EngineRun.RunEngineParams, dispatcher: Callable):
         try:
             self.engine_run.set_multipv(1)
@@ -180,9 +198,8 @@ class EngineManagerAnalysis(EngineManager.EngineManager):
                 self.connect_depthchanged(dispatcher_changedepth)
 
             if self.cache_analysis is not None:
-                fenm2 = game.last_position.fenm2()
-                if fenm2 in self.cache_analysis:
-                    mrm: EngineResponse.MultiEngineResponse = self.cache_analysis[fenm2]
+                mrm = self.get_cache(game.last_position.fenm2())
+                if mrm is not None:
                     self.engine_run.set_mrm_cached(mrm)
                     if dispatcher_bestmove is not None:
                         if mrm.li_rm:
@@ -199,7 +216,7 @@ class EngineManagerAnalysis(EngineManager.EngineManager):
 
     def add_cache_position(self, position: Position.Position, mrm: EngineResponse.MultiEngineResponse):
         if self.cache_analysis is not None:
-            self.cache_analysis[position.fenm2()] = mrm
+            self.set_cache(position.fenm2(), mrm, False)  # it can be stopped when the player moves
 
     def analyze_tutor_move(self, game: Game.Game, a1h8: str):
         mrm = self.engine_run.mrm
@@ -1,3 +1,4 @@
+import contextlib
 import os
 import random
 import time
@@ -71,6 +72,11 @@ class EngineManagerPlay(EngineManager.EngineManager):
         # Once this is done, it switches to None.
         self.wicker_ctrl: EnginesWicker.WickerCtrl | None = EnginesWicker.check_is_wicker(engine, self.engine_run)
 
+        self.engine_run_nomodal: Optional[EngineRun.EngineRun] = None
+        self.dispatcher_nomodal: Optional[Callable] = None
+        self.pending_nomodal: Optional[tuple] = None  # (game, dispatcher_go) waiting for the readyok
+        self.num_nomodal = 0
+
     def check_previous(
         self, game: Optional[Game.Game] = None, fen: Optional[str] = None, dispatcher: Optional[Callable] = None
     ):
@@ -264,12 +270,96 @@ class EngineManagerPlay(EngineManager.EngineManager):
             min(movetime_seconds * factor_humanize, 45), porc * random.randint(1000, 3000) / 100000
         )
 
-    # def play_nomodal(self, game: Optional[Game.Game]) -> bool:
-    #     if not self.check_engine():
-    #         return False
-    #     self.engine_run.set_game_position(game, None, False)
-    #     self.engine_run.play(self.run_engine_params)
-    #     return True
+    def play_nomodal(
+        self,
+        game: Game.Game,
+        dispatcher_end: Callable,
+        with_isready: bool = True,
+        dispatcher_go: Optional[Callable] = None,
+    ) -> bool:
+        """
+        Returns at once, without any event loop, so many games can be played at the same time.
+        dispatcher_end(rm) is called with the move of the book or the engine, with None if the engine has finished.
+        dispatcher_go() is called when the engine starts to think, or before the move of the book, to start the clock.
+        with_isready=False when the engine is waiting, after a bestmove, the previous search has not to be stopped,
+        otherwise the position is sent when the engine answers readyok.
+        """
+        rm = self.check_previous(game)
+        if rm:
+
+            def book_move():
+                if dispatcher_go:
+                    dispatcher_go()
+                dispatcher_end(rm)
+
+            QtCore.QTimer.singleShot(0, book_move)
+            return True
+        if self.engine_run is None:
+            return False
+
+        if self.engine_run_nomodal is not self.engine_run:  # connected once, not in every move
+            self.engine_run_nomodal = self.engine_run
+            self.engine_run.bestmove_found.connect(self._bestmove_nomodal)
+            self.engine_run.engine_terminated.connect(self._terminated_nomodal)
+            self.engine_run.readyok_found.connect(self._readyok_nomodal)
+        self.dispatcher_nomodal = dispatcher_end
+        self.pending_nomodal = game, dispatcher_go
+        self.num_nomodal += 1
+        if with_isready:
+            self.engine_run.isready_nomodal()
+            # as isready, it goes on if the engine doesn't answer
+            num_nomodal = self.num_nomodal
+            QtCore.QTimer.singleShot(3000, lambda: self._readyok_nomodal(num_nomodal))
+        else:
+            self._go_nomodal()
+        return True
+
+    def _readyok_nomodal(self, num_nomodal: Optional[int] = None):
+        if self.pending_nomodal is not None and num_nomodal in (None, self.num_nomodal):
+            self._go_nomodal()
+
+    def _go_nomodal(self):
+        game, dispatcher_go = self.pending_nomodal
+        self.pending_nomodal = None
+        if self.is_closed or self.dispatcher_nomodal is None:  # the match has been ended while waiting
+            return
+        if self.engine_run is None:
+            self._end_nomodal(None)
+            return
+        self.engine_run.set_game_position(game, None, False, False)
+        self.engine_run.play(self.run_engine_params)
+        if dispatcher_go:
+            dispatcher_go()
+
+    def _end_nomodal(self, rm: Optional[EngineResponse.EngineResponse]):
+        self.pending_nomodal = None
+        dispatcher_end, self.dispatcher_nomodal = self.dispatcher_nomodal, None
+        if dispatcher_end is not None:
+            dispatcher_end(rm)
+
+    def _bestmove_nomodal(self, _bestmove: str):
+        if self.dispatcher_nomodal is None:
+            return
+        if self.engine_run is None or self.engine_run.mrm is None:
+            self._end_nomodal(None)
+            return
+        self.mrm = self.engine_run.mrm.clone()
+        self.mrm.ordena()
+        self._end_nomodal(self.mrm.best_rm_ordered())
+
+    def _terminated_nomodal(self):
+        self._end_nomodal(None)
+
+    def close(self):
+        self.dispatcher_nomodal = None
+        self.pending_nomodal = None
+        if self.engine_run_nomodal is not None:  # the engine can be given to other manager by the pool
+            with contextlib.suppress(RuntimeError, TypeError):
+                self.engine_run_nomodal.bestmove_found.disconnect(self._bestmove_nomodal)
+                self.engine_run_nomodal.engine_terminated.disconnect(self._terminated_nomodal)
+                self.engine_run_nomodal.readyok_found.disconnect(self._readyok_nomodal)
+            self.engine_run_nomodal = None
+        super().close()
 
     def set_book(self, path: str, resp_type, max_tries: int, max_depth):
         self.playbook = PlayBook(path, resp_type, max_tries, max_depth)
@@ -0,0 +1,143 @@
+"""
+Engines of the process that are not being used, to use them again without starting the process, the uci handshake
+and the load of the nets.
+
+An engine released is stopped and kept, with the same executable, arguments and uci options it is given to the
+next EngineManager that needs it, with a ucinewgame. The engines with options changed that can't be restored,
+ponder or log, are closed. The engines not used in IDLE_SECONDS are closed.
+"""
+import contextlib
+import time
+import warnings
+from typing import Optional
+
+from PySide6 import QtCore
+
+from Code.Engines import EngineRun
+
+MAX_IDLE_KEY = 2
+MAX_IDLE = 4
+IDLE_SECONDS = 120
+
+
+def engine_key(config: EngineRun.StartEngineParams) -> Optional[tuple]:
+    """
+    None if the engine can't be shared.
+    """
+    if config.path_log:
+        return None
+    li_options = tuple((str(option), str(value)) for option, value in config.li_options_uci or [])
+    return (
+        config.path_exe,
+        tuple(config.args or []),
+        li_options,
+        config.priority,
+        config.emulate_movetime,
+        config.faster_mode_always,
+    )
+
+
+class EnginePool:
+    def __init__(self):
+        self.li_idle = []  # [key, engine_run, time released], the last released at the end
+        self.timer: Optional[QtCore.QTimer] = None
+
+    def lease(self, config: EngineRun.StartEngineParams) -> EngineRun.EngineRun:
+        key = engine_key(config)
+        if key is not None:
+            for pos in range(len(self.li_idle) - 1, -1, -1):
+                if self.li_idle[pos][0] == key:
+                    engine_run = self.li_idle.pop(pos)[1]
+                    if self.is_alive(engine_run):
+                        self.reset(engine_run, config)
+                        return engine_run
+                    engine_run.close()
+        return EngineRun.EngineRun(config)
+
+    @staticmethod
+    def is_alive(engine_run: EngineRun.EngineRun) -> bool:
+        if engine_run.process is None:
+            return False
+        return engine_run.process.state() == QtCore.QProcess.ProcessState.Running
+
+    @staticmethod
+    def reset(engine_run: EngineRun.EngineRun, config: EngineRun.StartEngineParams):
+        engine_run.config = config
+        engine_run.emit_enabled = True
+        li_restore = [
+            (option, value)
+            for option, value in config.li_options_uci or []
+            if option.lower() in engine_run.st_options_changed
+        ]
+        if "multipv" in engine_run.st_options_changed:
+            engine_run.set_multipv(config.num_multipv or 1)
+        engine_run._set_options_uci(li_restore)
+        engine_run.st_options_changed = set()
+        engine_run._ucinewgame()
+
+    @staticmethod
+    def reusable(engine_run: EngineRun.EngineRun) -> bool:
+        if engine_run.log is not None or engine_run.control_ponder is not None:
+            return False
+        if engine_run.state not in (EngineRun.EngineState.OK, EngineRun.EngineState.THINKING):
+            return False
+        st_baseline = {str(option).lower() for option, value in engine_run.config.li_options_uci or []}
+        return not (engine_run.st_options_changed - st_baseline - {"multipv"})
+
+    def release(self, engine_run: EngineRun.EngineRun):
+        key = engine_key(engine_run.config)
+        if key is None or not self.is_alive(engine_run) or not self.reusable(engine_run):
+            engine_run.close()
+            return
+
+        with warnings.catch_warnings():  # disconnect() warns when there is nothing connected
+            warnings.simplefilter("ignore")
+            for signal in (
+                engine_run.depth_changed,
+                engine_run.bestmove_found,
+                engine_run.eval_stockfish_found,
+                engine_run.engine_terminated,
+            ):
+                with contextlib.suppress(RuntimeError, TypeError):
+                    signal.disconnect()
+
+        # the output until the next isready (all the positions are sent with it) is not used
+        engine_run.stop()
+        engine_run.emit_enabled = False
+        engine_run.state = EngineRun.EngineState.OK
+        engine_run.mrm = None
+
+        self.li_idle.append([key, engine_run, time.time()])
+        if sum(1 for xkey, xengine_run, xtime in self.li_idle if xkey == key) > MAX_IDLE_KEY:
+            self.close_pos(next(pos for pos, idle in enumerate(self.li_idle) if idle[0] == key))
+        while len(self.li_idle) > MAX_IDLE:
+            self.close_pos(0)
+        self.check_timer()
+
+    def close_pos(self, pos: int):
+        engine_run = self.li_idle.pop(pos)[1]
+        engine_run.close()
+
+    def check_timer(self):
+        if self.li_idle:
+            if self.timer is None:
+                self.timer = QtCore.QTimer()
+                self.timer.setInterval(IDLE_SECONDS * 1000 // 4)
+                self.timer.timeout.connect(self.close_unused)
+            if not self.timer.isActive():
+                self.timer.start()
+        elif self.timer is not None:
+            self.timer.stop()
+
+    def close_unused(self):
+        limit = time.time() - IDLE_SECONDS
+        while self.li_idle and self.li_idle[0][2] < limit:
+            self.close_pos(0)
+        self.check_timer()
+
+    def close_all(self):
+        while self.li_idle:
+            self.close_pos(0)
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
@@ -1,4 +1,6 @@
+import collections
 import random
+import re
 import time
 from typing import Any, List, Optional, TYPE_CHECKING
 
@@ -52,6 +54,24 @@ class EngineResponse:
 
         self.sinInicializar: bool = True
 
+    def clone(self) -> "EngineResponse":
+        """
+        Same as a restore of save(), without the list.
+        """
+        other = EngineResponse(self.name, self.is_white)
+        other.mate = self.mate
+        other.puntos = self.puntos
+        other.pv = self.pv
+        other.from_sq = self.from_sq
+        other.to_sq = self.to_sq
+        other.promotion = self.promotion
+        other.depth = self.depth
+        other.nodes = self.nodes
+        other.nps = self.nps
+        other.seldepth = self.seldepth
+        other.sinInicializar = False
+        return other
+
     def save(self) -> List[Any]:
         li = [
             self.mate,
@@ -282,6 +302,60 @@ st_uci_claves = {
 }
 
 
+UCI_INT_CLAVES = {"depth", "seldepth", "time", "nodes", "hashfull", "tbhits", "nps", "currmovenumber", "cpuload"}
+
+
+RE_NOT_MOVES = re.compile(r"[^a-h1-8qrbnQRBN ]")
+
+MAX_DEPTHS = 64  # scores by move of the last depths, is_stable uses more than 40
+MAX_LINES = 4096  # with save_lines, the last ones
+
+
+def parse_info(info: str) -> dict:
+    """
+    Fields of an uci info line, without "info": the numbers as int, score as (cp|mate, value), the rest as str,
+    multipv too, as it is the key of dicMultiPV. The fields with values that can't be read are None.
+    When the pv is at the end, as usual, its words are not checked one by one.
+    """
+    pv = None
+    x = info.find(" pv ")
+    if x >= 0:
+        tail = info[x + 4 :]
+        if not RE_NOT_MOVES.search(tail):
+            pv = tail.strip()
+            info = info[:x]
+
+    d_claves = {}
+    key = None
+    ini = 0
+    words = info.split(" ")
+    for pos, word in enumerate(words):
+        if word in st_uci_claves:
+            if key is not None:
+                d_claves[key] = words[ini:pos]
+            key = word
+            ini = pos + 1
+    if key is not None:
+        d_claves[key] = words[ini:]
+
+    for key, li in d_claves.items():
+        if key in UCI_INT_CLAVES:
+            try:
+                d_claves[key] = int(li[0])
+            except (ValueError, IndexError):
+                d_claves[key] = None
+        elif key == "score":
+            try:
+                d_claves[key] = (li[0], int(li[1])) if li[0] in ("cp", "mate") else None
+            except (ValueError, IndexError):
+                d_claves[key] = None
+        else:
+            d_claves[key] = " ".join(li).strip()
+    if pv is not None:
+        d_claves["pv"] = pv
+    return d_claves
+
+
 class MultiEngineResponse:
     name: str
     is_white: bool
@@ -292,10 +366,11 @@ class MultiEngineResponse:
     max_depth: int
     nodes: int
     dicDepth: dict
+    current_depth: int
     dicMultiPV: dict
     li_rm: list
     saveLines: bool
-    lines: list
+    lines: collections.deque
     _init_time_working: float
     cache_bound: dict
     game: "Game.Game"
@@ -317,12 +392,13 @@ class MultiEngineResponse:
         self.max_depth = 0
         self.nodes = 0
 
-        self.dicDepth = {}
+        self.dicDepth = {}  # the last MAX_DEPTHS depths
+        self.current_depth = 0
         self.dicMultiPV = {}
         self.li_rm = []
 
         self.saveLines = False
-        self.lines = []
+        self.lines = collections.deque(maxlen=MAX_LINES)
         self._init_time_working = time.time()
 
         self.cache_bound = {}
@@ -359,16 +435,28 @@ class MultiEngineResponse:
             self.li_rm.append(rm)
 
     def clone(self):
+        """
+        Same as a restore of save(): the multipv ordered, without the history of depths and lines.
+        """
+        self.ordena()
         other_mrm = MultiEngineResponse(self.name, self.is_white)
-        other_mrm.restore(self.save())
+        other_mrm.vtime = self.vtime
+        other_mrm.depth = self.depth
+        other_mrm.max_time = self.max_time
+        other_mrm.max_depth = self.max_depth
+        other_mrm.nodes = self.nodes
+        for num, rm in enumerate(self.li_rm, 1):
+            other_rm = rm.clone()
+            other_mrm.dicMultiPV[str(num)] = other_rm
+            other_mrm.li_rm.append(other_rm)
         return other_mrm
 
     def get_current_depth(self):
-        return max(self.dicDepth.keys()) if self.dicDepth else 0
+        return self.current_depth
 
     def save_lines(self):
         self.saveLines = True
-        self.lines = []
+        self.lines = collections.deque(maxlen=MAX_LINES)
 
     def set_time_depth(self, max_time, max_depth):
         self.max_time = max_time
@@ -421,24 +509,7 @@ class MultiEngineResponse:
             return self.li_rm[0].time
         return 0
 
-    def check_pv(self, pv_base, is_bound):
-        d_claves = self.check_claves(pv_base, st_uci_claves)
-
-        if "pv" in d_claves:
-            pv = d_claves["pv"].strip()
-            if not pv:
-                return
-        else:
-            return
-
-        if "nodes" in d_claves:  # Toga en multipv, envia 0 si no tiene nada que contar
-            if (d_claves["nodes"] == "0") and "mate" not in pv_base:
-                return
-
-        if "score" in d_claves:
-            if "mate 0 " in pv_base or "mate -0 " in pv_base or "mate +0 " in pv_base:
-                return
-
+    def multipv_rm(self, d_claves) -> "EngineResponse":
         if "multipv" in d_claves:
             k_multi = d_claves["multipv"]
             if k_multi not in self.dicMultiPV:
@@ -448,69 +519,55 @@ class MultiEngineResponse:
                 k_multi = "1"
                 self.dicMultiPV[k_multi] = EngineResponse(self.name, self.is_white)
             else:
-                k_multi = list(self.dicMultiPV.keys())[0]
+                k_multi = next(iter(self.dicMultiPV))
 
         rm = self.dicMultiPV[k_multi]
         rm.sinInicializar = False
+        return rm
 
-        if "depth" in d_claves:
-            try:
-                depth = int(d_claves["depth"].strip())
-                if self.max_depth:
-                    if rm.from_sq:  # Es decir que ya tenemos datos (rm.pv al principio = a1a1
-                        if (depth > self.max_depth) and (depth > rm.depth):
-                            return
-                rm.depth = depth
-                if depth > self.depth:
-                    self.depth = depth
-            except (ValueError, AttributeError):
-                depth = 0
+    def check_pv(self, pv_base, is_bound):
+        d_claves = parse_info(pv_base)
+
+        pv = d_claves.get("pv")
+        if not pv:
+            return
+
+        if d_claves.get("nodes") == 0 and "mate" not in pv_base:  # Toga en multipv, envia 0 si no tiene nada que contar
+            return
+
+        score = d_claves.get("score")
+        if score == ("mate", 0):
+            return
+
+        rm = self.multipv_rm(d_claves)
+
+        depth = d_claves.get("depth")
+        if depth is not None:
+            if self.max_depth:
+                if rm.from_sq:  # Es decir que ya tenemos datos (rm.pv al principio = a1a1
+                    if (depth > self.max_depth) and (depth > rm.depth):
+                        return
+            rm.depth = depth
+            if depth > self.depth:
+                self.depth = depth
         else:
             depth = 0
 
-        if "time" in d_claves:
-            try:
-                rm.time = int(d_claves["time"].strip())
-            except (ValueError, AttributeError):
-                pass  # Keep previous time value
+        for key in ("time", "nodes", "nps", "seldepth"):
+            value = d_claves.get(key)
+            if value is not None:
+                setattr(rm, key, value)
 
-        if "nodes" in d_claves:
-            try:
-                rm.nodes = int(d_claves["nodes"].strip())
-            except (ValueError, AttributeError):
-                pass  # Keep previous nodes value
-
-        if "nps" in d_claves:
-            try:
-                nps = d_claves["nps"].strip()
-                if " " in nps:
-                    nps = nps.split(" ")[0]
-                if nps.isdigit():
-                    rm.nps = int(nps)
-            except (ValueError, AttributeError):
-                pass  # Keep previous nps value
-
-        if "seldepth" in d_claves:
-            try:
-                rm.seldepth = int(d_claves["seldepth"].strip())
-            except (ValueError, AttributeError):
-                pass  # Keep previous seldepth value
+        if score is not None:
+            kind, value = score
+            if kind == "cp":
+                rm.puntos = value
+                rm.mate = 0
+            else:
+                rm.puntos = 0
+                rm.mate = value
+            rm.without_movements = False
 
-        if "score" in d_claves:
-            try:
-                score = d_claves["score"].strip()
-                if score.startswith("cp "):
-                    rm.puntos = int(score.split(" ")[1])
-                    rm.mate = 0
-                    rm.without_movements = False
-                elif score.startswith("mate "):
-                    rm.puntos = 0
-                    rm.mate = int(score.split(" ")[1])
-                    rm.without_movements = False
-            except (ValueError, IndexError, AttributeError):
-                pass  # Keep previous score values
-
-        pv = d_claves["pv"].strip()
         x = pv.find(" ")
         pv1 = pv[:x] if x >= 0 else pv
         rm.pv = pv
@@ -527,59 +584,42 @@ class MultiEngineResponse:
             self.cache_bound[pv1] = pv
 
         if depth:
-            if depth not in self.dicDepth:
-                self.dicDepth[depth] = {}
-            self.dicDepth[depth][rm.movimiento()] = rm.score_abs5()
+            dic_moves = self.dicDepth.get(depth)
+            if dic_moves is None:
+                dic_moves = self.dicDepth[depth] = {}
+                if len(self.dicDepth) > MAX_DEPTHS:
+                    del self.dicDepth[min(self.dicDepth)]
+                if depth > self.current_depth:
+                    self.current_depth = depth
+            dic_moves[rm.movimiento()] = rm.score_abs5()
 
     def check_score(self, pv_base):
-        d_claves = self.check_claves(pv_base, st_uci_claves)
-
-        if "multipv" in d_claves:
-            k_multi = d_claves["multipv"]
-            if k_multi not in self.dicMultiPV:
-                self.dicMultiPV[k_multi] = EngineResponse(self.name, self.is_white)
-        else:
-            if len(self.dicMultiPV) == 0:
-                k_multi = "1"
-                self.dicMultiPV[k_multi] = EngineResponse(self.name, self.is_white)
+        d_claves = parse_info(pv_base)
+
+        rm = self.multipv_rm(d_claves)
+
+        depth = d_claves.get("depth")
+        if depth is not None and depth >= 0:
+            if self.max_depth:
+                if rm.from_sq:  # Es decir que ya tenemos datos (rm.pv al principio = a1a1
+                    if (depth > self.max_depth) and (depth > rm.depth):
+                        return
+            rm.depth = depth
+
+        tm = d_claves.get("time")
+        if tm is not None and tm >= 0:
+            rm.time = tm
+
+        score = d_claves.get("score")
+        if score is not None:
+            kind, value = score
+            if kind == "cp":
+                rm.puntos = value
+                rm.mate = 0
+                rm.without_movements = False
             else:
-                k_multi = list(self.dicMultiPV.keys())[0]
-
-        rm = self.dicMultiPV[k_multi]
-        rm.sinInicializar = False
-
-        if "depth" in d_claves:
-            depth = d_claves["depth"].strip()
-            if depth.isdigit():
-                depth = int(depth)
-                if self.max_depth:
-                    if rm.from_sq:  # Es decir que ya tenemos datos (rm.pv al principio = a1a1
-                        if (depth > self.max_depth) and (depth > rm.depth):
-                            return
-                rm.depth = depth
-
-        if "time" in d_claves:
-            try:
-                tm = d_claves["time"].strip()
-                if tm.isdigit():
-                    rm.time = int(tm)
-            except (ValueError, AttributeError):
-                pass  # Keep previous time value
-
-        if "score" in d_claves:
-            try:
-                score = d_claves["score"].strip()
-                if score.startswith("cp "):
-                    rm.puntos = int(score.split(" ")[1])
-                    rm.mate = 0
-                    rm.without_movements = False
-                elif score.startswith("mate "):
-                    rm.puntos = 0
-                    rm.mate = int(score.split(" ")[1])
-                    if not rm.mate:  # stockfish mate 0
-                        rm.mate = -1
-            except (ValueError, IndexError, AttributeError):
-                pass  # Keep previous score values
+                rm.puntos = 0
+                rm.mate = value or -1  # stockfish mate 0
 
     def add_rm(self, rm):
         # Para los analysis MultiPV donde no han considerado una move
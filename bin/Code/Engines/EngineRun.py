@@ -32,6 +32,7 @@ class StartEngineParams:
     path_log: Optional[str] = None
     emulate_movetime: bool = False
     faster_mode_always: bool = False
+    full_history: bool = False  # all the moves of the game, and not from the last capture or pawn move
 
 
 @dataclass
@@ -108,11 +109,47 @@ class StreamLineProcessor:
         return lineas
 
 
+def _word_after(line: str, token: str, end: int) -> Optional[str]:
+    x = line.find(token, 0, end)
+    if x < 0:
+        return None
+    x += len(token)
+    y = line.find(" ", x)
+    return line[x:] if y < 0 else line[x:y]
+
+
+def superseded_lines(lines: List[str]) -> set:
+    """
+    Positions of the info lines followed in the same read by another one of the same multipv, depth and first move,
+    the later one replaces all the data of the previous one in the MultiEngineResponse.
+    Any other line (bounds, bestmove, mate 0, nodes 0...) ends the replacement, so it is parsed with the same data.
+    """
+    st_superseded = set()
+    st_seen = set()
+    for pos in range(len(lines) - 1, -1, -1):
+        line = lines[pos]
+        key = None
+        x = line.find(" pv ")
+        if x > 0 and line.startswith("info ") and "bound" not in line:
+            if " nodes 0 " not in line and " mate 0 " not in line and " mate -0 " not in line:
+                depth = _word_after(line, " depth ", x)
+                if depth is not None:
+                    key = (depth, _word_after(line, " multipv ", x), _word_after(line, " pv ", len(line)))
+        if key is None:
+            st_seen = set()
+        elif key in st_seen:
+            st_superseded.add(pos)
+        else:
+            st_seen.add(key)
+    return st_superseded
+
+
 class EngineRun(QtCore.QObject):
     depth_changed = QtCore.Signal()
     bestmove_found = QtCore.Signal(str)
     eval_stockfish_found = QtCore.Signal(str)
     engine_terminated = QtCore.Signal()
+    readyok_found = QtCore.Signal()
 
     def __init__(self, config: StartEngineParams):
         super().__init__()
@@ -129,6 +166,7 @@ class EngineRun(QtCore.QObject):
             self._log_open(config.path_log)
 
         self.control_ponder: None | Ponder = None
+        self.st_options_changed: Optional[set] = None  # after the start, to restore them when it is used again
 
         if __debug__:
             if Debug.DEBUG_ENGINES or Debug.DEBUG_ENGINES_SEND:
@@ -138,21 +176,18 @@ class EngineRun(QtCore.QObject):
         self._wait_loop: Optional[QtCore.QEventLoop] = None
         self.stream_line_processor = StreamLineProcessor()
 
-        self.mode_timer_poll = Code.configuration.x_msrefresh_poll_engines > 0 and not config.faster_mode_always
-
-        if self.mode_timer_poll:
-            # Configuración del Timer de Polling (Queue virtual)
-            # Se inicia solo cuando es necesario leer.
-            self._timer_poll = QtCore.QTimer()
-            mstimer_poll = Util.clamp(Code.configuration.x_msrefresh_poll_engines, 20, 500)
-            self._timer_poll.setInterval(mstimer_poll)  # Revisar cada x ms
-            self._timer_poll.timeout.connect(self._poll_output)
+        # the output is read when the engine writes, while thinking the lines that arrive in ms_coalesce are read
+        # together, so the info lines replaced by a later one are not parsed
+        if Code.configuration.x_msrefresh_poll_engines > 0 and not config.faster_mode_always:
+            self.ms_coalesce = Util.clamp(Code.configuration.x_msrefresh_poll_engines, 20, 500)
+        else:
+            self.ms_coalesce = 0
+        self._timer_read: Optional[QtCore.QTimer] = None
 
         self.process: Optional[QtCore.QProcess] = QtCore.QProcess(self)
 
-        if not self.mode_timer_poll:
-            # noinspection PyUnresolvedReferences
-            self.process.readyReadStandardOutput.connect(self._read_output)
+        # noinspection PyUnresolvedReferences
+        self.process.readyReadStandardOutput.connect(self._ready_read)
 
         # noinspection PyUnresolvedReferences
         self.process.finished.connect(self._engine_terminated)
@@ -227,28 +262,21 @@ class EngineRun(QtCore.QObject):
         self._ucinewgame()
         self.play_time_begin = None
         self.emit_enabled = True
-
-    def _start_polling(self):
-        """Activa la lectura periódica si no está activada."""
-        timer = getattr(self, "_timer_poll", None)
-        if timer is not None and not timer.isActive():
-            timer.start()
-
-    def _stop_polling(self):
-        """Detiene la lectura periódica."""
-        timer = getattr(self, "_timer_poll", None)
-        if timer is not None and timer.isActive():
-            timer.stop()
+        self.st_options_changed = set()
 
     @QtCore.Slot()
-    def _poll_output(self):
-        """Llamado por el timer. Si hay datos, procesa."""
-        if self.process is not None:
-            try:
-                if self.process.bytesAvailable() > 0:
-                    self._read_output()
-            except Exception:
-                self._log_exception("Poll output error")
+    def _ready_read(self):
+        if self.ms_coalesce == 0 or self.state != EngineState.THINKING:
+            self._read_output()
+            return
+        if self._timer_read is None:
+            self._timer_read = QtCore.QTimer(self)
+            self._timer_read.setSingleShot(True)
+            self._timer_read.setInterval(self.ms_coalesce)
+            # noinspection PyUnresolvedReferences
+            self._timer_read.timeout.connect(self._read_output)
+        if not self._timer_read.isActive():
+            self._timer_read.start()
 
     # --- logging ---
     def _log_open(self, file: str):
@@ -428,7 +456,11 @@ class EngineRun(QtCore.QObject):
                 return
 
             lines = self.stream_line_processor.convert(output)
-            for line in lines:
+            st_superseded = set()
+            if len(lines) > 1 and self.state == EngineState.THINKING and self.mrm is not None:
+                if not self.mrm.saveLines:
+                    st_superseded = superseded_lines(lines)
+            for pos, line in enumerate(lines):
                 try:
                     if __debug__ and Debug.DEBUG_ENGINES:
                         Debug.prln(f"{self.config.name}: {line}")
@@ -443,9 +475,6 @@ class EngineRun(QtCore.QObject):
                     if st == EngineState.READING_UCI:
                         if line == "uciok":
                             self.state = EngineState.OK
-                            if self.mode_timer_poll:
-                                # APAGAMOS POLLING
-                                self._stop_polling()
                             if self._wait_loop:
                                 self._wait_loop.quit()
                         else:
@@ -455,21 +484,18 @@ class EngineRun(QtCore.QObject):
                     elif st == EngineState.PENDING_READYOK:
                         if line == "readyok":
                             self.state = EngineState.OK
-                            if self.mode_timer_poll:
-                                # APAGAMOS POLLING
-                                self._stop_polling()
-
                             if self._wait_loop:
                                 self._wait_loop.quit()
+                            elif self.emit_enabled:
+                                try:
+                                    self.readyok_found.emit()
+                                except Exception:
+                                    self._log_exception("readyok_found emit failed")
 
                     elif st == EngineState.READING_EVAL_STOCKFISH:
                         self.li_cache.append(line)
                         if line.startswith("Final "):
                             self.state = EngineState.OK
-                            if self.mode_timer_poll:
-                                # APAGAMOS POLLING
-                                self._stop_polling()
-
                             if self.emit_enabled:
                                 try:
                                     self.eval_stockfish_found.emit("\n".join(self.li_cache))
@@ -481,7 +507,7 @@ class EngineRun(QtCore.QObject):
                         emited_depth = False
                         new_depth = 0
                         current_time = int(time.time() * 1000)
-                        if self.mrm is not None:
+                        if self.mrm is not None and pos not in st_superseded:
                             try:
                                 self.mrm.dispatch(line)
                             except Exception:
@@ -501,10 +527,6 @@ class EngineRun(QtCore.QObject):
 
                         if line.startswith("bestmove"):
                             self.state = EngineState.OK
-                            if self.mode_timer_poll:
-                                # APAGAMOS POLLING
-                                self._stop_polling()
-
                             li = line.split(" ")
                             self.bestmove = li[1] if len(li) > 1 else ""
                             if self.emit_enabled:
@@ -530,10 +552,6 @@ class EngineRun(QtCore.QObject):
     def _engine_terminated(self, exit_code: int, exit_status: QtCore.QProcess.ExitStatus):
         try:
             self.state = EngineState.OFF
-            if self.mode_timer_poll:
-                # APAGAMOS POLLING
-                self._stop_polling()
-
             if self._wait_loop:
                 try:
                     self._wait_loop.quit()
@@ -558,10 +576,6 @@ class EngineRun(QtCore.QObject):
 
         self._wait_loop = QtCore.QEventLoop()
 
-        if self.mode_timer_poll:
-            # ACTIVAR POLLING para esperar la respuesta
-            self._start_polling()
-
         timer = QtCore.QTimer()
         timer.setSingleShot(True)
         timer.timeout.connect(self._wait_loop.quit)
@@ -573,10 +587,6 @@ class EngineRun(QtCore.QObject):
         timer.stop()
 
         ok = self.state == EngineState.OK
-        if self.mode_timer_poll:
-            # Si salimos por timeout, apagar polling manualmente
-            if not ok:
-                self._stop_polling()
 
         self._wait_loop = None
         return ok
@@ -595,6 +605,17 @@ class EngineRun(QtCore.QObject):
     def isready(self):
         return self._wait_for("isready", EngineState.PENDING_READYOK)
 
+    def isready_nomodal(self):
+        """
+        Stops the engine and sends isready without waiting, readyok_found is emitted with the answer.
+        """
+        self.stop()
+        self.state = EngineState.PENDING_READYOK
+        self._send_command("isready")
+
+    def ucinewgame(self):
+        self._ucinewgame()
+
     def log_open(self, file):
         self._log_open(file)
 
@@ -620,12 +641,12 @@ class EngineRun(QtCore.QObject):
         self._set_option(option, value)
 
     def _set_option(self, option, value):
+        if self.st_options_changed is not None:
+            self.st_options_changed.add(option.lower())
         if value:
             self._send_command(f"setoption name {option} value {value}")
             if option == "Ponder" and value == "true":
-                self.control_ponder = Ponder(
-                    self, self._send_command, self._start_polling if self.mode_timer_poll else None
-                )
+                self.control_ponder = Ponder(self, self._send_command)
         else:
             self._send_command(f"setoption name {option}")
 
@@ -682,21 +703,14 @@ class EngineRun(QtCore.QObject):
             return
         self.emit_enabled = False
 
-        if self.mode_timer_poll:
-            # --- CRUCIAL: Parar polling antes de tocar el proceso ---
+        # --- CRUCIAL: Parar la lectura pendiente antes de tocar el proceso ---
+        if self._timer_read is not None:
             try:
-                self._stop_polling()
-                if self._timer_poll:
-                    self._timer_poll.stop()
-                    try:
-                        self._timer_poll.timeout.disconnect(self._poll_output)
-                    except Exception:
-                        self._log_exception("timer_poll disconnect failed")
-                    self._timer_poll.setParent(None)
-                    self._timer_poll.deleteLater()
+                self._timer_read.stop()
+                self._safe_disconnect(self._timer_read.timeout, self._read_output)
             except Exception:
-                self._log_exception("polling cleanup failed")
-            self._timer_poll = None
+                self._log_exception("timer_read cleanup failed")
+            self._timer_read = None
 
         # Terminar bucles de eventos pendientes
         if self._wait_loop:
@@ -719,11 +733,8 @@ class EngineRun(QtCore.QObject):
         # Desconectar señales Qt
         if self.process is not None:
             try:
-                if self.mode_timer_poll:
-                    self._safe_disconnect(self.process.finished, self._engine_terminated)
-                else:
-                    self._safe_disconnect(self.process.readyReadStandardOutput, self._read_output)
-                    self._safe_disconnect(self.process.finished, self._engine_terminated)
+                self._safe_disconnect(self.process.readyReadStandardOutput, self._ready_read)
+                self._safe_disconnect(self.process.finished, self._engine_terminated)
             except Exception:
                 self._log_exception("signal disconnect failed")
 
@@ -777,26 +788,31 @@ class EngineRun(QtCore.QObject):
         self.state = EngineState.CLOSED
 
     # --- positions / play ---
-    def set_game_position(self, game: Game.Game, movement: Optional[int], pre_move: bool):
-        self.stop()
-        self.isready()
-        order = "startpos" if game.is_fen_initial() else f"fen {game.first_position.fen()}"
-
+    def set_game_position(self, game: Game.Game, movement: Optional[int], pre_move: bool, with_isready: bool = True):
+        if with_isready:
+            self.stop()
+            self.isready()
         if movement is None:
-            pv = game.pv()
-            if pv:
-                order += f" moves {pv}"
+            njug = len(game) - 1
             self.is_white = game.is_white()
         else:
             move = game.move(movement)
             if pre_move:
                 self.is_white = move.is_white()
-                if movement > 0:
-                    order += f" moves {game.pv_hasta(movement - 1)}"
+                njug = movement - 1
             else:
                 self.is_white = not move.is_white()
-                order += f" moves {game.pv_hasta(movement)}"
-        order = f"position {order}"
+                njug = movement
+
+        # the ponderhit is checked with the moves of the game, and some engines read the previous positions
+        if self.control_ponder or self.config.full_history:
+            fen = None if game.is_fen_initial() else game.first_position.fen()
+            pv = game.pv_hasta(njug)
+        else:
+            fen, pv = game.fen_pv_hasta(njug)
+        order = f"position fen {fen}" if fen else "position startpos"
+        if pv:
+            order += f" moves {pv}"
 
         if self.control_ponder:
             self.control_ponder.send_command(order)
@@ -823,10 +839,6 @@ class EngineRun(QtCore.QObject):
             self.play_time_begin = time.time()
             self.state = EngineState.THINKING
 
-            if self.mode_timer_poll:
-                # ACTIVAMOS POLLING
-                self._start_polling()
-
             xorder = f"go {args}"
 
             if self.control_ponder:
@@ -880,18 +892,13 @@ class EngineRun(QtCore.QObject):
         self.li_cache = []
         self.state = EngineState.READING_EVAL_STOCKFISH
 
-        if self.mode_timer_poll:
-            # ACTIVAMOS POLLING
-            self._start_polling()
-
         self._send_command("eval")
 
 
 class Ponder:
-    def __init__(self, engine_run: EngineRun, send_command_engine: Callable, start_polling: Callable | None):
+    def __init__(self, engine_run: EngineRun, send_command_engine: Callable):
         self.engine_run: EngineRun = engine_run
         self._send_command_engine: Callable = send_command_engine
-        self._start_polling: Callable | None = start_polling  # si es none es porque el mode no es polling
         self.last_position_sent = ""
         self.last_go_sent = ""
         self.last_time = 0
@@ -935,8 +942,6 @@ class Ponder:
         if li and li[-1] == self.ponder:
             self.send_command_lock("ponderhit")
             self.post_ponderhit = True  # El motor continuará pensando, no enviar próximo go
-            if self._start_polling:
-                self._start_polling()
         else:
             self.reset()
             self.send_command_lock("stop")
@@ -986,5 +991,3 @@ class Ponder:
             self.last_position_sent = command_position
             self.send_command_lock(command_go)
 
-            if self._start_polling:
-                self._start_polling()
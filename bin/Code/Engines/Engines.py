@@ -213,6 +213,12 @@ class Engine:
     def is_maia(self):
         return self.key.startswith("maia-")
 
+    def with_history(self):
+        """
+        The engine reads the previous positions, as the networks of lc0 and maia, it has to receive all the moves.
+        """
+        return self.is_maia() or "lc0" in os.path.basename(self.path_exe).lower()
+
     def level_maia(self):
         try:
             level = int(self.key[5:])
@@ -1,10 +1,12 @@
 import Code
+from Code.Engines import EnginePool
 
 
 class ListEngineManagers:
     def __init__(self):
         self.lista = []
         self.with_logs = False
+        self.pool = EnginePool.EnginePool()
 
     def append(self, engine_manager):
         if __debug__:
@@ -20,6 +22,7 @@ class ListEngineManagers:
         for engine_manager in self.lista[:]:  # Iterar sobre copia
             engine_manager.close()
         self.lista = []
+        self.pool.close_all()
 
     def is_logs_active(self):
         return self.with_logs
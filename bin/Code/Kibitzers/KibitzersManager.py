@@ -1,5 +1,5 @@
 import Code
-from Code.Z import XRun
+from Code.Z import UtilIPC, XRun
 from Code.Base.Constantes import (
     KIBRUN_CLOSE,
     KIBRUN_CONFIGURATION,
@@ -7,7 +7,6 @@ from Code.Base.Constantes import (
     KIBRUN_STOP,
 )
 from Code.Kibitzers import WindowKibitzers
-from Code.SQL import UtilSQL
 
 
 class Manager:
@@ -75,9 +74,9 @@ class IPCKibitzer:
     def __init__(self, huella_kibitzer):
         configuration = Code.configuration
 
-        fdb = configuration.temporary_file("db")
+        fdb = configuration.temporary_file("ipc")
 
-        self.ipc = UtilSQL.IPC(fdb, True)
+        self.ipc = UtilIPC.IPC(fdb, True)
 
         orden = Orden()
         orden.key = KIBRUN_CONFIGURATION
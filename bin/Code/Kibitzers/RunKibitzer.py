@@ -4,7 +4,7 @@ import time
 from PySide6 import QtWidgets
 
 import Code
-from Code.Z import Util
+from Code.Z import Util, UtilIPC
 from Code.Base import Game
 from Code.Base.Constantes import (
     KIB_BEFORE_MOVE,
@@ -37,7 +37,6 @@ from Code.Kibitzers import (
 from Code.Main import InitApp
 from Code.Openings import OpeningsStd
 from Code.QT import GarbageCollector, QTUtils
-from Code.SQL import UtilSQL
 
 
 class Orden:
@@ -55,7 +54,7 @@ class CPU:
 
     def __init__(self, fdb):
 
-        self.ipc = UtilSQL.IPC(fdb, False)
+        self.ipc = UtilIPC.IPC(fdb, False)
 
         self.configuration = None
         self.titulo = None
@@ -89,12 +88,8 @@ class CPU:
             orden.key = dv["__CLAVE__"]
             orden.dv = dv
 
-            if orden.key == KIBRUN_GAME:
-                if self.ipc.has_more_data():
-                    continue
-                time.sleep(0.1)
-                if self.ipc.has_more_data():
-                    continue
+            if orden.key == KIBRUN_GAME and self.ipc.has_more_data():  # only the last position
+                continue
 
             return orden
 
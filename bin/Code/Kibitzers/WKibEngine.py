@@ -5,7 +5,7 @@ from PySide6 import QtCore
 
 from Code.Base import Game, Move, Position
 from Code.Base.Constantes import KIB_BEFORE_MOVE
-from Code.Engines import EngineRun
+from Code.Engines import AnalysisCache, EngineRun
 from Code.Kibitzers import Kibitzers, WindowKibitzers, WKibCommon
 from Code.QT import Colocacion, Columnas, Controles, Delegados, Grid, Iconos, QTMessages, QTUtils, ScreenUtils
 from Code.Z import Util
@@ -112,6 +112,7 @@ class WKibEngine(WKibCommon.WKibCommon):
         self.pause()
         w = WindowKibitzers.WKibitzerLive(self, self.cpu.configuration, self.cpu.num_kibitzer)
         if w.exec():
+            self.save_cache()
             self.kibitzer = self.cpu.reset_kibitzer()
             self.engine_run.close()
             self.launch_engine()
@@ -120,6 +121,7 @@ class WKibEngine(WKibCommon.WKibCommon):
         self.grid.refresh()
 
     def stop(self):
+        self.save_cache()
         self.engine_run.stop()
 
     def grid_num_datos(self, _grid):
@@ -196,6 +198,7 @@ class WKibEngine(WKibCommon.WKibCommon):
     def bestmove_from_engine(self, _bestmove):
         if not self.engine_run:
             return
+        self.analysis_finished = not self.stopped
         if self.valid_to_play() and not self.stopped:
             self.need_refresh_data = True
 
@@ -269,9 +272,15 @@ class WKibEngine(WKibCommon.WKibCommon):
         run_param.path_exe = exe
         run_param.li_options_uci = self.kibitzer.liUCI
         run_param.args = self.kibitzer.args
+        run_param.full_history = self.kibitzer.with_history()
         run_param.num_multipv = num_multipv
         run_param.emulate_movetime = True
 
+        self.cache_shared = AnalysisCache.analysis_cache(self.cpu.configuration)
+        self.cache_engine_id = AnalysisCache.engine_id(self.kibitzer.name, exe, self.kibitzer.liUCI)
+        self.analysis_finished = False
+        self.fenm2_analysis = None
+
         self.engine_run = EngineRun.EngineRun(run_param)
         self.engine_run.bestmove_found.connect(self.bestmove_from_engine)
         self.engine_run.depth_changed.connect(self.changed_depth_from_engine)
@@ -287,6 +296,7 @@ class WKibEngine(WKibCommon.WKibCommon):
     def finalizar(self):
         self.save_video()
         if self.engine_run:
+            self.save_cache()
             self.engine_run.close()
             self.engine_run = None
             self.siPlay = False
@@ -317,17 +327,42 @@ class WKibEngine(WKibCommon.WKibCommon):
         self.board.set_position(posicion)
         self.board.activate_side(is_white)
 
+        self.save_cache()
         self.game = game
         self.li_moves = []
 
         if self.valid_to_play():
             self.engine_run.set_game_position(game, None, False)
-            self.engine_run.play(self.run_engine_params)
+            self.analysis_finished = False  # after the bestmove of the previous position
+            fenm2 = posicion.fenm2()
+            mrm = None
+            if self.cache_shared:
+                mrm = self.cache_shared.get(fenm2, self.cache_engine_id, self.run_engine_params)
+            if mrm is not None:
+                self.engine_run.set_mrm_cached(mrm)
+                self.need_refresh_data = True
+            else:
+                self.engine_run.play(self.run_engine_params)
+                self.fenm2_analysis = fenm2
             self.stopped = False
         self.grid.refresh()
 
         self.test_tb_home()
 
+    def save_cache(self):
+        """
+        The analysis of the current position, when the engine has finished, before changing it.
+        """
+        if self.cache_shared and self.fenm2_analysis and self.engine_run and self.engine_run.mrm:
+            self.cache_shared.put(
+                self.fenm2_analysis,
+                self.cache_engine_id,
+                self.run_engine_params,
+                self.engine_run.mrm,
+                self.analysis_finished,
+            )
+        self.fenm2_analysis = None
+
     def bad_threats_position(self, position: Position.Position):
         self.stop()
 
@@ -249,6 +249,7 @@ class WKibIndex(QtWidgets.QDialog):
         run_param.path_exe = self.kibitzer.path_exe
         run_param.li_options_uci = self.kibitzer.liUCI
         run_param.args = self.kibitzer.args
+        run_param.full_history = self.kibitzer.with_history()
         run_param.num_multipv = 1
         run_param.emulate_movetime = True
 
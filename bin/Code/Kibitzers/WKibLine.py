@@ -273,6 +273,7 @@ class WKibLine(QtWidgets.QMainWindow):
         run_param.path_exe = exe
         run_param.li_options_uci = self.kibitzer.liUCI
         run_param.args = self.kibitzer.args
+        run_param.full_history = self.kibitzer.with_history()
         run_param.num_multipv = 1
         run_param.emulate_movetime = True
 
@@ -82,6 +82,7 @@ class WStockfishEval(WKibCommon.WKibCommon):
         run_param.path_exe = self.kibitzer.path_exe
         run_param.li_options_uci = self.kibitzer.liUCI
         run_param.args = self.kibitzer.args
+        run_param.full_history = self.kibitzer.with_history()
         run_param.num_multipv = 1
         self.engine_run = EngineRun.EngineRun(run_param)
         self.engine_run.eval_stockfish_found.connect(self.from_engine)
@@ -1567,12 +1567,13 @@ class Opening:
             p = Position.Position()
             dir_post = collections.defaultdict(set)
             dir_prev = collections.defaultdict(set)
+            board = FasterCode.Board()
             for lipv in lilipv:
-                FasterCode.set_init_fen()
+                board.set_init_fen()
                 s0 = set()
                 for pos, a1h8 in enumerate(lipv):
-                    FasterCode.make_move(a1h8)
-                    fen = FasterCode.get_fen()
+                    board.play(a1h8)
+                    fen = board.get_fen()
                     fenm2 = FasterCode.fen_fenm2(fen)
                     if not fenm2.endswith("-"):  # enpassant imposibles
                         p.read_fen(fen)
@@ -1,10 +1,14 @@
 import collections
+import os
+import pickle
+import sys
+import tempfile
 
 import FasterCode
 
 import Code
 from Code.Base import Position
-from Code.Base.Constantes import FENM2_INITIAL
+from Code.Base.Constantes import FEN_INITIAL, FENM2_INITIAL
 from Code.Translations import TrListas
 from Code.Z import Util
 
@@ -14,6 +18,9 @@ from Code.Z import Util
 _PIECE_LETTERS = frozenset("KQRBNPkqrbnp")
 fen_fenm2 = FasterCode.fen_fenm2
 
+# Format of the cache of the openings loaded, a new value discards the caches saved
+CACHE_VERSION = 1
+
 
 class Opening:
     __slots__ = ("name", "parent_fm2", "children_fm2", "a1h8", "pgn", "eco", "is_basic", "fm2")
@@ -50,11 +57,101 @@ class Opening:
         return f"Opening({self.name!r}, eco={self.eco!r})"
 
 
+class OpeningNode:
+    """Position of the trie of the lines of the openings, the children by the xpv of the move."""
+
+    __slots__ = ("opening", "children")
+
+    def __init__(self):
+        self.opening: Opening | None = None
+        self.children: dict = {}
+
+
+def reach_targets(li_fenm2) -> list:
+    """
+    [(pawns_out, men)...] summaries of the positions for FasterCode.xpv_polyglot_keys: the pawns out of their initial
+    squares (bits 0-7 white a2-h2, 8-15 black a7-h7) and the number of men.
+    """
+    dic = {}
+    for fenm2 in li_fenm2:
+        fen64 = Util.fen_fen64(fenm2)
+        pawns_out = 0
+        for col in range(8):
+            if fen64[48 + col] != "P":
+                pawns_out |= 1 << col
+            if fen64[8 + col] != "p":
+                pawns_out |= 1 << (8 + col)
+        men = 64 - fen64.count(" ")
+        if men < dic.get(pawns_out, 33):
+            dic[pawns_out] = men
+
+    # a target with the pawns out of another one and fewer men is enough for both: what reaches one reaches the other
+    li_targets = []
+    for pawns_out, men in sorted(dic.items(), key=lambda x: (x[1], -x[0].bit_count())):
+        if not any(xout & pawns_out == pawns_out and xmen <= men for xout, xmen in li_targets):
+            li_targets.append((pawns_out, men))
+    return li_targets
+
+
+class OpeningsIndex:
+    """
+    The lines of the openings as a trie over their xpv, and the polyglot keys of their positions as a transposition
+    table, to classify the games walking their xpv without the fen of every position.
+    """
+
+    def __init__(self, li_openings, dic_fenm2_op: dict):
+        self.root = OpeningNode()
+        self.dic_key_op: dict = {}
+        self.li_targets = reach_targets(dic_fenm2_op)
+
+        li_lines = []
+        for op in li_openings:
+            li_xmoves = [FasterCode.pv_xpv(pv) for pv in op.a1h8.split(" ")]
+            keys = FasterCode.xpv_polyglot_keys(FEN_INITIAL, "".join(li_xmoves))
+            if len(keys) != len(li_xmoves):
+                continue
+            li_lines.append((li_xmoves, keys))
+            if dic_fenm2_op.get(op.fm2) is op:
+                self.dic_key_op[keys[-1]] = op
+
+        for li_xmoves, keys in li_lines:
+            node = self.root
+            for xmove, key in zip(li_xmoves, keys):
+                child = node.children.get(xmove)
+                if child is None:
+                    child = node.children[xmove] = OpeningNode()
+                    child.opening = self.dic_key_op.get(key)
+                node = child
+
+    def last_opening(self, xpv: str):
+        """The deepest opening of the positions of the xpv, from the initial position, or None."""
+        node = self.root
+        last_opening = None
+        pos = 0
+        for pos in range(0, len(xpv), 2):
+            node = node.children.get(xpv[pos : pos + 2])
+            if node is None:
+                break
+            if node.opening is not None:
+                last_opening = node.opening
+        else:
+            return last_opening
+
+        # Out of the lines of the trie, the positions can be transpositions of the openings
+        dic = self.dic_key_op
+        for key in FasterCode.xpv_polyglot_keys(FEN_INITIAL, xpv, self.li_targets)[pos // 2 :]:
+            if key in dic:
+                last_opening = dic[key]
+        return last_opening
+
+
 class ListaOpeningsStd:
     def __init__(self):
         self.st_fenm2_test: set = set()
         self.dic_fenm2_op: dict = {}
         self.dic_fenm2_op_all: dict = {}
+        self._index: OpeningsIndex | None = None
+        self._dic_fen64: dict | None = None
 
     # ------------------------------------------------------------------
     # Internal helpers
@@ -90,6 +187,8 @@ class ListaOpeningsStd:
             for linea in fh:
                 fields = linea.rstrip("\n").split("|")
                 name, a1h8, pgn, eco, basic, fenm2, _hijos, parent, lfenm2 = fields
+                fenm2 = sys.intern(fenm2)
+                parent = sys.intern(parent)
 
                 op = Opening(name)
                 op.a1h8 = a1h8
@@ -106,7 +205,7 @@ class ListaOpeningsStd:
                     st_fenm2_test.add(parent)
 
                 li_pv = a1h8.split(" ")
-                li_fenm2 = lfenm2.split(",")
+                li_fenm2 = [sys.intern(fm2) for fm2 in lfenm2.split(",")]
                 for x, _ in enumerate(li_pv):
                     fm2_x = FENM2_INITIAL if x == 0 else li_fenm2[x - 1]
                     dic_fenm2_op_all[fm2_x].add(op)
@@ -115,7 +214,7 @@ class ListaOpeningsStd:
         return dic_fenm2_op, dic_fenm2_op_all, st_fenm2_test
 
     @staticmethod
-    def dic_fen64() -> dict:
+    def read_dic_fen64() -> dict:
         """Return {fen64: [pv, ...]} for every intermediate position in openings.lkop."""
         path = Code.path_resource("Openings", "openings.lkop")
         dd: collections.defaultdict = collections.defaultdict(list)
@@ -142,9 +241,66 @@ class ListaOpeningsStd:
     # ------------------------------------------------------------------
 
     def reset(self):
-        """(Re)load all opening data from disk."""
+        """(Re)load all opening data, from the cache while openings.lkop and the personal openings do not change."""
+        if self.read_cache():
+            return
         self.dic_fenm2_op, self.dic_fenm2_op_all, self.st_fenm2_test = self.read_fenm2_op()
         self.read_personal()
+        self._dic_fen64 = None
+        self.write_cache()
+
+    @staticmethod
+    def cache_signature() -> tuple:
+        """Version of the cache, and modification time and size of the files the openings are read from."""
+        li = [CACHE_VERSION]
+        li_paths = (Code.path_resource("Openings", "openings.lkop"), Code.configuration.paths.file_pers_openings())
+        for path in li_paths:
+            try:
+                st = os.stat(path)
+                li.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                li.append(None)
+        return tuple(li)
+
+    def read_cache(self) -> bool:
+        """Load all the data of the openings from the cache in one read, False if it is missing or not up to date."""
+        dic = Util.restore_pickle(Code.configuration.paths.file_openings_cache())
+        if not isinstance(dic, dict) or dic.get("SIGNATURE") != self.cache_signature():
+            return False
+        try:
+            data = (dic["DIC_FENM2_OP"], dic["DIC_FENM2_OP_ALL"], dic["ST_FENM2_TEST"], dic["DIC_FEN64"], dic["INDEX"])
+        except KeyError:
+            return False
+        self.dic_fenm2_op, self.dic_fenm2_op_all, self.st_fenm2_test, self._dic_fen64, self._index = data
+        return True
+
+    def write_cache(self):
+        """Save the data loaded, with the index and the positions for DBgamesMov, in one pickle: the openings and
+        the fenm2 strings are stored once, and shared again when it is read."""
+        dic = {
+            "SIGNATURE": self.cache_signature(),
+            "DIC_FENM2_OP": self.dic_fenm2_op,
+            "DIC_FENM2_OP_ALL": self.dic_fenm2_op_all,
+            "ST_FENM2_TEST": self.st_fenm2_test,
+            "DIC_FEN64": self.dic_fen64(),
+            "INDEX": self.index(),
+        }
+        path_cache = Code.configuration.paths.file_openings_cache()
+        # Written to a temporary file and then renamed, so another process starting at the same time, or a crash,
+        # never leaves a truncated cache; if it can't be written the openings are built again the next time.
+        path_tmp = None
+        try:
+            os.makedirs(os.path.dirname(path_cache), exist_ok=True)
+            fd, path_tmp = tempfile.mkstemp(prefix="OpeningsCache_", suffix=".tmp", dir=os.path.dirname(path_cache))
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(dic, f, protocol=4)
+            os.replace(path_tmp, path_cache)
+            path_tmp = None
+        except (OSError, pickle.PickleError):
+            pass
+        finally:
+            if path_tmp:
+                Util.remove_file(path_tmp)
 
     def read_personal(self):
         """Merge user-defined personal openings into the loaded data."""
@@ -166,6 +322,23 @@ class ListaOpeningsStd:
                 if x == num - 1:
                     self.dic_fenm2_op[fm2] = op
                     op.fm2 = fm2
+        self._index = None
+
+    def dic_fen64(self) -> dict:
+        """{fen64: [pv, ...]} of openings.lkop, read the first time it is needed."""
+        if self._dic_fen64 is None:
+            self._dic_fen64 = self.read_dic_fen64()
+        return self._dic_fen64
+
+    def index(self) -> OpeningsIndex:
+        """The trie and the transposition table of the openings loaded, built the first time they are needed."""
+        if self._index is None:
+            st_openings = set(self.dic_fenm2_op.values())
+            for st in self.dic_fenm2_op_all.values():
+                st_openings.update(st)
+            li_openings = sorted(st_openings, key=lambda op: op.a1h8)
+            self._index = OpeningsIndex(li_openings, self.dic_fenm2_op)
+        return self._index
 
     # ------------------------------------------------------------------
     # Opening assignment
@@ -190,7 +363,7 @@ class ListaOpeningsStd:
         last_opening = None
 
         for nj, move in enumerate(game.li_moves):
-            fm2 = move.position.fenm2()
+            fm2 = move.fenm2()
             if fm2 in st:
                 if fm2 in dic:
                     opening = dic[fm2]
@@ -241,19 +414,8 @@ class ListaOpeningsStd:
     # xpv / pv helpers (shared implementation)
     # ------------------------------------------------------------------
 
-    def _lookup_last_opening(self, pv_str: str):
-        """Walk *pv_str* move by move and return the deepest matching Opening."""
-        last_ap = None
-        FasterCode.set_init_fen()
-        for pv in pv_str.split(" "):
-            FasterCode.make_move(pv)
-            fenm2 = Position.legal_fenm2(FasterCode.get_fen())
-            if fenm2 in self.dic_fenm2_op:
-                last_ap = self.dic_fenm2_op[fenm2]
-        return last_ap
-
     def base_xpv(self, xpv):
-        return self._lookup_last_opening(FasterCode.xpv_pv(xpv))
+        return self.index().last_opening(xpv)
 
     def xpv(self, xpv) -> str:
         last_ap = self.base_xpv(xpv)
@@ -265,7 +427,7 @@ class ListaOpeningsStd:
 
     def assign_pv(self, pv: str):
         """Return the deepest Opening matching the UCI pv string, or None."""
-        return self._lookup_last_opening(pv)
+        return self.index().last_opening(FasterCode.pv_xpv(pv))
 
     # ------------------------------------------------------------------
     # Utility
@@ -0,0 +1,260 @@
+"""
+STS from the command line, the positions pending of a work shared among several instances of the engine, to compare
+builds and settings of the engines.
+    LucasR.py -sts name_sts num_work [user] [num_engines] [threads] [hash_mb]
+
+num_work is the number of the work in the list of the STS, starting with 1. Every instance is started with the same
+Threads and Hash (by default 1 thread, and the hash of the engine), and plays its shard of positions in order, with a
+ucinewgame before each one: with a limit of depth or nodes the results are the same run after run.
+
+The results are saved in the work as with the window of the STS, a work cancelled with ctrl-c continues from the
+pending positions. At the end the report is written to folder_sts/name_sts-ref.json:
+points by group, time, nodes and nps of the positions played in this run.
+"""
+import json
+import os
+import signal
+import sys
+import time
+from typing import List, Optional
+
+from PySide6 import QtCore
+
+import Code
+from Code.Base import Game
+from Code.Config import Configuration
+from Code.Engines import EngineManagerPlay, EngineResponse, EngineRun, ListEngineManagers
+from Code.STS import STS
+from Code.Z import Util
+
+MS_CHECK_SIGNALS = 200
+
+
+def set_fixed_option(engine, name: str, value):
+    engine.liUCI = [(option, valor) for option, valor in engine.liUCI if option.lower() != name.lower()]
+    engine.liUCI.append((name, str(value)))
+
+
+class STSEngine:
+    """
+    One instance of the engine with its shard of positions (ngroup, nfen).
+    """
+
+    def __init__(self, runner: "STSRunner", li_positions: list):
+        self.runner = runner
+        self.li_positions = li_positions
+        self.pos = 0
+        self.is_closed = False
+        self.time_ini = 0.0
+
+        work = runner.work
+        engine = work.config_engine().clone()
+        if runner.threads:
+            set_fixed_option(engine, "Threads", runner.threads)
+        if runner.hash_mb:
+            set_fixed_option(engine, "Hash", runner.hash_mb)
+        run_engine_params = EngineRun.RunEngineParams()
+        multipv = engine.multiPV if engine.multiPV > 1 else 1
+        run_engine_params.update(engine, int(work.seconds * 1000), work.depth, work.nodes, multipv)
+        self.engine_manager = EngineManagerPlay.EngineManagerPlay(engine, run_engine_params)
+        self.engine_manager.set_faster_mode()
+
+    def play_next(self):
+        if self.is_closed:
+            return
+        if self.pos >= len(self.li_positions):
+            self.close()
+            return
+        ngroup, nfen = self.li_positions[self.pos]
+        elem = self.runner.sts.groups.fen(ngroup, nfen)
+        game = Game.Game(fen=elem.fen)
+        if self.pos and self.engine_manager.engine_run:
+            self.engine_manager.engine_run.ucinewgame()  # the hash of the previous position is not used
+        self.time_ini = time.perf_counter()
+        if not self.engine_manager.play_nomodal(game, self.found, self.pos == 0):
+            self.found(None)
+
+    def found(self, rm: Optional[EngineResponse.EngineResponse]):
+        if self.is_closed:
+            return
+        seconds = time.perf_counter() - self.time_ini
+        ngroup, nfen = self.li_positions[self.pos]
+        mov = rm.movimiento() if rm is not None else ""
+        if not mov:
+            print(f"{self.engine_manager.engine.name}: the engine has stopped", flush=True)
+            self.close()
+            return
+        self.pos += 1
+        self.runner.set_result(ngroup, nfen, mov, seconds, rm.nodes)
+        QtCore.QTimer.singleShot(0, self.play_next)
+
+    def close(self):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        self.engine_manager.close()
+        self.runner.check_end()
+
+
+class STSRunner:
+    def __init__(self, sts: STS.STS, work: STS.Work, num_engines: int, threads: int, hash_mb: int):
+        self.sts = sts
+        self.work = work
+        self.num_engines = num_engines
+        self.threads = threads
+        self.hash_mb = hash_mb
+        self.li_engines: List[STSEngine] = []
+        self.is_finished = False
+        self.time_start = time.time()
+        self.timer: Optional[QtCore.QTimer] = None
+
+        ngroups = len(sts.groups)
+        self.li_positions = []
+        for ngroup in range(ngroups):
+            if work.is_group_active(ngroup):
+                result_group = work.results.resoult_group(ngroup)
+                for nfen in range(work.ini, work.end + 1):
+                    if result_group.elem(nfen) is None:
+                        self.li_positions.append((ngroup, nfen))
+
+        self.pending_group = [0] * ngroups
+        for ngroup, nfen in self.li_positions:
+            self.pending_group[ngroup] += 1
+        self.seconds_group = [0.0] * ngroups
+        self.nodes_group = [0] * ngroups
+
+    def start(self):
+        self.time_start = time.time()
+        print(
+            f"{self.sts.name} - {self.work.ref}: {len(self.li_positions)} positions, {self.num_engines} engines",
+            flush=True,
+        )
+        for num in range(self.num_engines):
+            li_shard = self.li_positions[num :: self.num_engines]
+            if li_shard:
+                self.li_engines.append(STSEngine(self, li_shard))
+        for sts_engine in self.li_engines:
+            sts_engine.play_next()
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(lambda: None)  # the python signal handlers are run between events
+        self.timer.start(MS_CHECK_SIGNALS)
+        self.check_end()
+
+    def set_result(self, ngroup: int, nfen: int, mov: str, seconds: float, nodes: int):
+        self.sts.set_result(self.work, ngroup, nfen, mov, seconds)
+        self.seconds_group[ngroup] += seconds
+        self.nodes_group[ngroup] += nodes
+        self.pending_group[ngroup] -= 1
+        if self.pending_group[ngroup] == 0:
+            self.sts.save()
+            group = self.sts.groups.group(ngroup)
+            print(f"{group.name:<40s} {self.sts.done_points(self.work, ngroup)}", flush=True)
+
+    def report(self) -> dict:
+        li_groups = []
+        tot_seconds = 0.0
+        tot_nodes = 0
+        for ngroup in range(len(self.sts.groups)):
+            if not self.work.is_group_active(ngroup):
+                continue
+            group = self.sts.groups.group(ngroup)
+            max_points, points = self.work.num_points_group(group, ngroup)
+            seconds = self.seconds_group[ngroup]
+            nodes = self.nodes_group[ngroup]
+            tot_seconds += seconds
+            tot_nodes += nodes
+            li_groups.append(
+                {
+                    "group": group.name,
+                    "positions": self.work.done_positions_group(ngroup),
+                    "points": points,
+                    "max_points": max_points,
+                    "seconds": round(seconds, 3),
+                    "nodes": nodes,
+                    "nps": int(nodes / seconds) if seconds else 0,
+                }
+            )
+        wall_seconds = time.time() - self.time_start
+        engine = self.work.config_engine()
+        return {
+            "sts": self.sts.name,
+            "work": self.work.ref,
+            "engine": engine.name,
+            "path_exe": engine.path_exe,
+            "seconds_position": self.work.seconds,
+            "depth": self.work.depth,
+            "nodes_position": self.work.nodes,
+            "engines": len(self.li_engines),
+            "threads": self.threads,
+            "hash": self.hash_mb,
+            "groups": li_groups,
+            "points": sum(group["points"] for group in li_groups),
+            "max_points": sum(group["max_points"] for group in li_groups),
+            "elo": int(self.sts.elo(self.work) or 0),
+            "seconds": round(tot_seconds, 3),
+            "wall_seconds": round(wall_seconds, 3),
+            "nodes": tot_nodes,
+            "nps": int(tot_nodes / tot_seconds) if tot_seconds else 0,
+            "nps_all_engines": int(tot_nodes / wall_seconds) if wall_seconds else 0,
+        }
+
+    def check_end(self):
+        if self.is_finished or any(not sts_engine.is_closed for sts_engine in self.li_engines):
+            return
+        self.is_finished = True
+        if self.timer is not None:
+            self.timer.stop()
+        self.sts.save()
+        Code.list_engine_managers.close_all()
+
+        dic = self.report()
+        folder = Code.configuration.paths.folder_sts()
+        path_report = Util.opj(folder, Util.valid_filename(f"{self.sts.name}-{self.work.ref}.json"))
+        with open(path_report, "wt", encoding="utf-8") as f:
+            json.dump(dic, f, indent=2, ensure_ascii=False)
+        print(
+            f"{dic['points']}/{dic['max_points']} in {dic['wall_seconds']:.1f} seconds,"
+            f" {dic['nps_all_engines']} nps, report: {path_report}",
+            flush=True,
+        )
+        QtCore.QCoreApplication.quit()
+
+    def cancel(self, *args):
+        for sts_engine in self.li_engines:
+            sts_engine.is_closed = True
+            sts_engine.engine_manager.close()
+        self.check_end()
+
+
+def run(user: str, name_sts: str, num_work: int, num_engines: int, threads: int, hash_mb: int):
+    if not __debug__:
+        sys.stderr = Util.Log("./bug.sts")
+
+    app = QtCore.QCoreApplication([])
+
+    configuration = Configuration.Configuration(user)
+    configuration.start()
+    configuration.load_translation()
+
+    Code.list_engine_managers = ListEngineManagers.ListEngineManagers()
+    Code.list_engine_managers.check_active_logs()
+
+    sts = STS.STS(name_sts)
+    if not os.path.isfile(sts.path()):
+        print(f"STS not found: {sts.path()}")
+        return
+    if not 1 <= num_work <= len(sts.works):
+        print(f"{name_sts}: there are {len(sts.works)} works")
+        return
+    work = sts.get_work(num_work - 1)
+
+    threads = threads or 1
+    if num_engines <= 0:
+        num_engines = max(1, (Util.cpu_count() or 2) // threads)
+    runner = STSRunner(sts, work, num_engines, threads, hash_mb)
+    signal.signal(signal.SIGINT, runner.cancel)
+    signal.signal(signal.SIGTERM, runner.cancel)
+
+    QtCore.QTimer.singleShot(0, runner.start)
+    app.exec()
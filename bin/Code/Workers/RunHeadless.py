@@ -0,0 +1,250 @@
+"""
+Engine-engine games of a tournament, league or swiss without windows, to use all the cores of a server.
+    LucasR.py -tournament-headless file_tournament [user] [num_games]
+    LucasR.py -league-headless name_league [user] [num_games]
+    LucasR.py -swiss-headless name_swiss [user] [num_games]
+
+Every game in play is a worker of the same type than the ones launched by the GUI, with the same adjudication,
+books and clocks, and its results are saved in the same way. The games are driven by the answers of the engines in
+one event loop, num_games at the same time (by default half the cores, an engine thinks while the other waits).
+"""
+import os
+import signal
+import sqlite3
+import sys
+import time
+from typing import Callable, List, Optional
+
+from PySide6 import QtCore, QtWidgets
+
+import Code
+from Code.Base import Game
+from Code.Base.Constantes import ST_PLAYING, ST_WAITING
+from Code.Config import Configuration
+from Code.Engines import EngineResponse, ListEngineManagers
+from Code.Openings import OpeningsStd
+from Code.Workers import RunWorker, WorkerGame
+from Code.Z import Util
+
+MS_CHECK_CLOCKS = 200  # and the signals of the user (ctrl-c) are attended
+
+
+class HeadlessGame(WorkerGame.WorkerGame):
+    def __init__(self, runner: "HeadlessRunner", run_worker: RunWorker.RunWorker):
+        self.runner = runner
+        self.run_worker = run_worker
+        self.is_closed = False
+        self.state = ST_WAITING
+        self.xmatch = None
+        self.dic_engine_managers = {}
+        self.side_thinking: Optional[bool] = None  # side of the engine thinking, None when there is no one
+        self.st_sides_ready = set()  # sides whose engine has answered isready in this game
+
+    def next_match(self) -> bool:
+        try:
+            self.xmatch = self.run_worker.get_other_match()
+        except sqlite3.IntegrityError:
+            self.xmatch = None
+        if self.xmatch is None:
+            return False
+
+        self.start_match()
+        self.st_sides_ready = set()
+        self.state = ST_PLAYING
+        QtCore.QTimer.singleShot(0, self.play_next_move)
+        return True
+
+    def play_next_move(self):
+        if self.is_closed or self.state != ST_PLAYING:
+            return
+        finished, result_adjudication = self.check_is_finished_nomodal()
+        if finished:
+            self.end_match()
+            return
+        if result_adjudication is not None:
+            # the adjudicator answers in the event loop too, as the engines of the game
+            game = self.game
+            if not self.manager_adjudicator.play_nomodal(
+                game, lambda rm: self.adjudicator_found(game, result_adjudication, rm)
+            ):
+                self.adjudicator_found(game, result_adjudication, None)
+            return
+        self.play_engine_move()
+
+    def adjudicator_found(self, game: Game.Game, result: str, rm: Optional[EngineResponse.EngineResponse]):
+        if game is not self.game or self.is_closed or self.state != ST_PLAYING:
+            return
+        if self.adjudicator_decides(result, rm):
+            self.end_match()
+        else:
+            self.play_engine_move()
+
+    def play_engine_move(self):
+        is_white = self.game.is_white()
+        engine_manager = self.dic_engine_managers[is_white]
+        engine_manager.run_engine_params.update_var_time(
+            self.tc_white.pending_time, self.tc_black.pending_time, self.seconds_per_move
+        )
+
+        self.side_thinking = is_white
+        with_isready = is_white not in self.st_sides_ready
+        self.st_sides_ready.add(is_white)
+        game = self.game
+        # the clock starts when the engine has the position, not while waiting for the readyok
+        if not engine_manager.play_nomodal(
+            game, lambda rm: self.move_found(game, rm), with_isready, lambda: self.go_found(game, is_white)
+        ):
+            self.move_found(game, None)
+
+    def go_found(self, game: Game.Game, is_white: bool):
+        if game is self.game and self.side_thinking == is_white and not self.is_closed:
+            self.start_clock(is_white)
+
+    def move_found(self, game: Game.Game, rm: Optional[EngineResponse.EngineResponse]):
+        if game is not self.game or self.side_thinking is None or self.is_closed:  # lost on time or cancelled
+            return
+        is_white = self.side_thinking
+        self.side_thinking = None
+
+        time_seconds = self.stop_clock(is_white)
+        move = self.engine_move(self.dic_engine_managers[is_white], rm, is_white, time_seconds)
+        if move is not None:
+            self.game.add_move(move)
+        QtCore.QTimer.singleShot(0, self.play_next_move)
+
+    def check_clock(self):
+        if self.side_thinking is None:
+            return
+        is_white = self.side_thinking
+        tc = self.tc_white if is_white else self.tc_black
+        if tc.time_is_consumed():
+            self.side_thinking = None
+            self.dic_engine_managers[is_white].stop()
+            self.stop_clock(is_white)
+            self.game.set_termination_time(is_white)
+            self.end_match()
+
+    def end_match(self):
+        self.state = ST_WAITING
+        self.close_engines()
+        if self.is_closed:
+            return
+        if self.game_finished():
+            self.save_game_done()
+            self.runner.game_done(self.game)
+        if not self.next_match():
+            self.is_closed = True
+            self.runner.check_end()
+
+    def cancel(self):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        self.side_thinking = None
+        self.close_engines()
+        if self.state == ST_PLAYING:
+            self.run_worker.cancel_match()
+
+
+class HeadlessRunner:
+    def __init__(self, name: str, create_run_worker: Callable, num_games: int):
+        self.name = name
+        self.create_run_worker = create_run_worker
+        self.num_games = num_games
+        self.li_games: List[HeadlessGame] = []
+        self.num_done = 0
+        self.time_start = time.time()
+        self.timer: Optional[QtCore.QTimer] = None
+        self.is_finished = False
+
+    def start(self):
+        self.time_start = time.time()
+        print(f"{self.name}: {self.num_games} games at the same time", flush=True)
+        for num in range(self.num_games):
+            game = HeadlessGame(self, self.create_run_worker())
+            self.li_games.append(game)
+            if not game.next_match():
+                game.is_closed = True
+                break  # no more matches pending
+
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.check_clocks)
+        self.timer.start(MS_CHECK_CLOCKS)
+        self.check_end()
+
+    def check_clocks(self):
+        for game in self.li_games:
+            if not game.is_closed:
+                game.check_clock()
+
+    def games_hour(self) -> float:
+        seconds = time.time() - self.time_start
+        return self.num_done * 3600.0 / seconds if seconds else 0.0
+
+    def game_done(self, game: Game.Game):
+        self.num_done += 1
+        print(
+            f"{self.num_done:5d} {game.get_tag('White')} - {game.get_tag('Black')} {game.result}"
+            f"  ({self.games_hour():.1f} games/hour)",
+            flush=True,
+        )
+
+    def check_end(self):
+        if self.is_finished or any(not game.is_closed for game in self.li_games):
+            return
+        self.is_finished = True
+        if self.timer is not None:
+            self.timer.stop()
+        Code.list_engine_managers.close_all()
+        seconds = time.time() - self.time_start
+        print(
+            f"{self.name}: {self.num_done} games in {seconds / 60.0:.1f} minutes, {self.games_hour():.1f} games/hour",
+            flush=True,
+        )
+        QtCore.QCoreApplication.quit()
+
+    def cancel(self, *args):
+        for game in self.li_games:
+            game.cancel()
+        self.check_end()
+
+
+def run_worker_creator(kind: str, file_work: str) -> Callable:
+    if kind == "tournament":
+        from Code.Tournaments import RunTournament
+
+        return lambda: RunTournament.TournamentWorker(file_work)
+
+    if kind == "league":
+        from Code.Leagues import RunLeague
+
+        return lambda: RunLeague.LeagueWorker(file_work)
+
+    from Code.Swiss import RunSwiss
+
+    return lambda: RunSwiss.SwissWorker(file_work)
+
+
+def run(kind: str, user: str, file_work: str, num_games: int):
+    if not __debug__:
+        sys.stderr = Util.Log(f"./bug.{kind}")
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # servers without display, the icons need a QApplication
+    app = QtWidgets.QApplication([])
+
+    configuration = Configuration.Configuration(user)
+    configuration.start()
+    configuration.load_translation()
+    OpeningsStd.ap.reset()
+
+    Code.list_engine_managers = ListEngineManagers.ListEngineManagers()
+    Code.list_engine_managers.check_active_logs()
+
+    if num_games <= 0:
+        num_games = max(1, (os.cpu_count() or 2) // 2)
+    runner = HeadlessRunner(os.path.basename(file_work), run_worker_creator(kind, file_work), num_games)
+    signal.signal(signal.SIGINT, runner.cancel)
+    signal.signal(signal.SIGTERM, runner.cancel)
+
+    QtCore.QTimer.singleShot(0, runner.start)
+    app.exec()
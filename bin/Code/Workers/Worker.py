@@ -4,10 +4,9 @@ import time
 from PySide6 import QtCore, QtWidgets
 
 import Code
-from Code.Base import Game, Move
+from Code.Base import Game
 from Code.Base.Constantes import (
     BLACK,
-    INFINITE,
     RESULT_DRAW,
     RESULT_WIN_BLACK,
     RESULT_WIN_WHITE,
@@ -15,38 +14,27 @@ from Code.Base.Constantes import (
     ST_PLAYING,
     ST_WAITING,
     TERMINATION_ADJUDICATION,
-    TERMINATION_ENGINE_MALFUNCTION,
-    TERMINATION_UNKNOWN,
-    TERMINATION_WIN_ON_TIME,
     WHITE,
 )
 from Code.Board import Board
 from Code.Engines import (
     EngineManagerPlay,
-    EngineRun,
     ListEngineManagers,
 )
 from Code.Main import WAnalysisBar
 from Code.QT import Colocacion, Columnas, Controles, Delegados, Grid, Iconos, QTDialogs, QTUtils, ScreenUtils
 from Code.Sound import Sound
-from Code.Z import ControlPGN, CPU, TimeControl, Util
+from Code.Workers import WorkerGame
+from Code.Z import ControlPGN, CPU
 
 
-class Worker(QtWidgets.QWidget):
-    tc_white: TimeControl.TimeControl
-    tc_black: TimeControl.TimeControl
+class Worker(QtWidgets.QWidget, WorkerGame.WorkerGame):
     grid_pgn: Grid.Grid
     lb_player: dict
     lb_clock: dict
     lb_rotulo2: Controles.LB
     lb_rotulo3: Controles.LB
-    seconds_per_move: int
-    max_seconds: int
     xmatch = None
-    manager_adjudicator = None
-    next_control: int
-    dic_engine_managers: dict
-    rejections_adjudicator: int
 
     def __init__(self, run_worker):
         QtWidgets.QWidget.__init__(self)
@@ -221,15 +209,6 @@ class Worker(QtWidgets.QWidget):
     def grid_right_button(self, _grid, _row, _obj_column, _modif):
         self.configurar()
 
-    def crea_adjudicator(self):
-        engine = Code.configuration.engines.search(self.run_worker.move_evaluator)
-
-        run_engine_params = EngineRun.RunEngineParams()
-        run_engine_params.update(engine, int(self.run_worker.adjudicator_time * 1000), 0, 0, 1)
-
-        engine_manager = EngineManagerPlay.EngineManagerPlay(engine, run_engine_params)
-        return engine_manager
-
     def looking_for_work(self):
         while not self.is_closed:
             try:
@@ -247,61 +226,14 @@ class Worker(QtWidgets.QWidget):
         # Cerramos los motores anteriores si los hay
         Code.list_engine_managers.close_all()
 
-        if self.run_worker.adjudicator_active:
-            self.manager_adjudicator = self.crea_adjudicator()
-            self.rejections_adjudicator = 0
-        else:
-            self.manager_adjudicator = None
-
-        if self.run_worker.draw_range == 0 and self.run_worker.resign == 0:
-            self.next_control = INFINITE
-        else:
-            self.next_control = 21
-
-        max_minute, self.seconds_per_move = self.run_worker.time_engine_engine
-        self.max_seconds = max_minute * 60
+        self.start_match()
 
-        # abrimos motores
-        rival = {
-            WHITE: self.run_worker.engine_white,
-            BLACK: self.run_worker.engine_black,
-        }
         for side in (WHITE, BLACK):
-            self.lb_player[side].set_text(rival[side].name)
+            self.lb_player[side].set_text(self.dic_engine_managers[side].engine.name)
             self.lb_player[side].show()
 
-        self.dic_engine_managers = {}
-
-        for side in (WHITE, BLACK):
-            engine = rival[side]
-            run_engine_params = EngineRun.RunEngineParams()
-            run_engine_params.update_from_engine(engine)
-            engine_manager = EngineManagerPlay.EngineManagerPlay(engine, run_engine_params)
-
-            if self.run_worker.book_path:
-                engine_manager.set_book(
-                    self.run_worker.book_path, self.run_worker.book_rr, 5, self.run_worker.book_depth
-                )
-            else:
-                bk = engine.book
-                if bk and bk in "*-":
-                    bk = None
-                if bk:
-                    engine_manager.set_book(bk, engine.book_rr, 5, engine.book_max_plies)
-            self.dic_engine_managers[side] = engine_manager
-
-        if self.run_worker.initial_fen:
-            self.game = Game.Game(fen=self.run_worker.initial_fen)
-        else:
-            self.game = Game.Game()
-
         self.pgn.game = self.game
-
-        self.tc_white = TimeControl.TimeControl(self, self.game, WHITE)
-        self.tc_white.config_clock(self.max_seconds, self.seconds_per_move, 0, 0)
         self.tc_white.set_labels()
-        self.tc_black = TimeControl.TimeControl(self, self.game, BLACK)
-        self.tc_black.config_clock(self.max_seconds, self.seconds_per_move, 0, 0)
         self.tc_black.set_labels()
 
         h_max = 0
@@ -327,35 +259,12 @@ class Worker(QtWidgets.QWidget):
                 time.sleep(0.1)
             if self.is_closed:
                 break
-        for side in (WHITE, BLACK):
-            self.dic_engine_managers[side].close()
+        self.close_engines()
 
         if not self.is_closed:
             if self.game_finished():
                 self.save_game_done()
 
-    def save_game_done(self):
-        self.game.set_tag("Site", f"{Code.lucas_chess} {Code.VERSION}")
-        self.game.set_tag("Event", self.run_worker.name)
-        self.run_worker.add_tags_game(self.game)
-
-        hoy = Util.today()
-        self.game.set_tag("Date", "%d.%02d.%02d" % (hoy.year, hoy.month, hoy.day))
-
-        engine_white = self.dic_engine_managers[WHITE].engine
-        engine_black = self.dic_engine_managers[BLACK].engine
-        self.game.set_tag("White", engine_white.name)
-        self.game.set_tag("Black", engine_black.name)
-        if engine_white.elo:
-            self.game.set_tag("WhiteElo", engine_white.elo)
-        if engine_black.elo:
-            self.game.set_tag("BlackElo", engine_black.elo)
-
-        self.game.set_extend_tags()
-        self.game.sort_tags()
-
-        self.run_worker.put_match_done(self.game)
-
     def finalize(self):
         self.is_closed = True
         self.analysis_bar.activate(False)
@@ -407,16 +316,6 @@ class Worker(QtWidgets.QWidget):
         QTUtils.refresh_gui()
         return True
 
-    def start_clock(self, is_white):
-        tc = self.tc_white if is_white else self.tc_black
-        tc.start()
-
-    def stop_clock(self, is_white):
-        tc = self.tc_white if is_white else self.tc_black
-        secs = tc.stop()
-        tc.set_labels()
-        return secs
-
     def pause_clock(self, is_white):
         tc = self.tc_white if is_white else self.tc_black
         tc.pause()
@@ -465,9 +364,6 @@ class Worker(QtWidgets.QWidget):
         self.update()
         QTUtils.refresh_gui()
 
-    def game_finished(self):
-        return self.game.termination != TERMINATION_UNKNOWN
-
     def show_pv(self, pv, n_arrows):
         if not pv:
             return True
@@ -514,28 +410,10 @@ class Worker(QtWidgets.QWidget):
             self.board.remove_movables()
             return True
         time_seconds = self.stop_clock(is_white)
-        clock_seconds = self.tc_white.pending_time if is_white else self.tc_black.pending_time
-        if rm is None:
-            self.sudden_end(is_white)
-            return True
-
-        from_sq = rm.from_sq
-        to_sq = rm.to_sq
-        promotion = rm.promotion
-
-        ok, mens, move = Move.get_game_move(self.game, self.game.last_position, from_sq, to_sq, promotion)
-        if not move:
-            self.sudden_end(is_white)
+        move = self.engine_move(engine_manager, rm, is_white, time_seconds)
+        if move is None:
             return True
 
-        if engine_manager.mrm:
-            move.analysis = engine_manager.mrm.clone(), 0
-            move.del_nags()
-
-        if time_seconds:
-            move.set_time_ms(time_seconds * 1000.0)
-        if clock_seconds:
-            move.set_clock_ms(clock_seconds * 1000.0)
         self.add_move(move)
         self.move_the_pieces(move.list_piece_moves)
         self.sound(move)
@@ -553,10 +431,6 @@ class Worker(QtWidgets.QWidget):
             if self.configuration.x_sound_beep:
                 run_sound.play_beep()
 
-    def sudden_end(self, is_white):
-        result = RESULT_WIN_BLACK if is_white else RESULT_WIN_WHITE
-        self.game.set_termination(TERMINATION_ENGINE_MALFUNCTION, result)
-
     def grid_dato(self, _grid, row, obj_column):
         control_pgn = self.pgn
 
@@ -616,89 +490,6 @@ class Worker(QtWidgets.QWidget):
             self.show_pv(rm.pv, 1)
         return self.set_clock()
 
-    def clocks_finished(self):
-        if self.tc_white.time_is_consumed():
-            self.game.set_termination(TERMINATION_WIN_ON_TIME, RESULT_WIN_BLACK)
-            return True
-        if self.tc_black.time_is_consumed():
-            self.game.set_termination(TERMINATION_WIN_ON_TIME, RESULT_WIN_WHITE)
-            return True
-        return False
-
-    def check_is_finished(self):
-        if self.clocks_finished():
-            return True
-
-        if self.state != ST_PLAYING or self.is_closed or self.game_finished() or self.game.is_finished():
-            self.game.set_result()
-            return True
-
-        self.next_control -= 1
-        if self.next_control > 0:
-            return False
-
-        self.next_control = 1  # que siga mirando jugada a jugada
-
-        num_moves = len(self.game)
-
-        last_move: Move.Move = self.game.last_jg()
-        if not last_move.analysis:
-            return False
-        mrm, pos = last_move.analysis
-        rm_ult = mrm.li_rm[pos]
-        ant_move = self.game.move(-2)
-        if not ant_move.analysis:
-            return False
-        mrm, pos = ant_move.analysis
-        rm_ant = mrm.li_rm[pos]
-
-        p_ult = rm_ult.centipawns_abs()
-        p_ant = -rm_ant.centipawns_abs()
-
-        def adjudicator_score():
-            rm = self.manager_adjudicator.play_game(self.game)
-            self.rejections_adjudicator += 1
-            self.next_control = 9 + self.rejections_adjudicator * 2
-            # Tras hacer un control de calidad si falla mirar dentro de 9 movimientos + rechazos
-            # el problema tipico es cuando los motores siempre envian score = 0
-            # next_control es impar para que la próxima vez pregunte al contrario
-            # el análisis es desde el punto de vista del rival, que es el que le toca mover
-            # como el escore se calcula en base al motor que acaba de mover, la evaluación es la contraria
-            return -rm.centipawns_abs()
-
-        # Draw
-        dr = self.run_worker.draw_range
-        dmp = self.run_worker.draw_min_ply
-        if dmp and dr > 0 and num_moves >= dmp and abs(p_ult) <= dr and abs(p_ant) <= dr:
-            p_tut = adjudicator_score() if self.manager_adjudicator else 0
-            if abs(p_tut) <= dr:
-                self.game.set_termination(TERMINATION_ADJUDICATION, RESULT_DRAW)
-                return True
-            return False
-
-        # Resign
-        rs = self.run_worker.resign
-        if rs > p_ult:
-            # si el motor piensa que no hemos llegado al límite nos vamos
-            return False
-        if rs > p_ant and not self.manager_adjudicator:
-            # si el motor rival piensa que no se ha llegado al límite y no hay arbitro nos vamos
-            return False
-
-        result = RESULT_WIN_WHITE if last_move.is_white() else RESULT_WIN_BLACK
-
-        if self.manager_adjudicator:
-            # si hay arbitro el árbitro decide
-            p_tut = adjudicator_score()
-            if p_tut >= rs:
-                self.game.set_termination(TERMINATION_ADJUDICATION, result)
-                return True
-            return False
-
-        # si no hay arbitro y los dos piensan que el escore es superior al rs se adjudica
-        self.game.set_termination(TERMINATION_ADJUDICATION, result)
-        return True
-
     def move_the_pieces(self, li_movs):
         if self.run_worker.slow_pieces:
             rapidez = self.configuration.pieces_speed_porc()
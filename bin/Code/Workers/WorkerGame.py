@@ -0,0 +1,286 @@
+"""
+Rules of the engine-engine games of the workers of tournaments, leagues and swiss, shared by the window of a worker
+and the headless runner: engines, clocks, adjudication and the save of the game finished.
+"""
+from typing import Optional
+
+import Code
+from Code.Base import Game, Move
+from Code.Base.Constantes import (
+    BLACK,
+    INFINITE,
+    RESULT_DRAW,
+    RESULT_WIN_BLACK,
+    RESULT_WIN_WHITE,
+    ST_PLAYING,
+    TERMINATION_ADJUDICATION,
+    TERMINATION_ENGINE_MALFUNCTION,
+    TERMINATION_UNKNOWN,
+    TERMINATION_WIN_ON_TIME,
+    WHITE,
+)
+from Code.Engines import EngineManagerPlay, EngineResponse, EngineRun
+from Code.Z import TimeControl, Util
+
+
+class WorkerGame:
+    run_worker = None
+    game: Game.Game
+    state = None
+    is_closed: bool
+    tc_white: TimeControl.TimeControl
+    tc_black: TimeControl.TimeControl
+    seconds_per_move: int
+    max_seconds: int
+    manager_adjudicator = None
+    next_control: int
+    dic_engine_managers: dict
+    rejections_adjudicator: int
+
+    def set_clock_white(self, tm, tm2):
+        pass
+
+    def set_clock_black(self, tm, tm2):
+        pass
+
+    def crea_adjudicator(self):
+        engine = Code.configuration.engines.search(self.run_worker.move_evaluator)
+
+        run_engine_params = EngineRun.RunEngineParams()
+        run_engine_params.update(engine, int(self.run_worker.adjudicator_time * 1000), 0, 0, 1)
+
+        engine_manager = EngineManagerPlay.EngineManagerPlay(engine, run_engine_params)
+        return engine_manager
+
+    def start_match(self):
+        """
+        Adjudicator, engines, game and clocks of the match got from run_worker.
+        """
+        if self.run_worker.adjudicator_active:
+            self.manager_adjudicator = self.crea_adjudicator()
+            self.rejections_adjudicator = 0
+        else:
+            self.manager_adjudicator = None
+
+        if self.run_worker.draw_range == 0 and self.run_worker.resign == 0:
+            self.next_control = INFINITE
+        else:
+            self.next_control = 21
+
+        max_minute, self.seconds_per_move = self.run_worker.time_engine_engine
+        self.max_seconds = max_minute * 60
+
+        rival = {
+            WHITE: self.run_worker.engine_white,
+            BLACK: self.run_worker.engine_black,
+        }
+        self.dic_engine_managers = {}
+
+        for side in (WHITE, BLACK):
+            engine = rival[side]
+            run_engine_params = EngineRun.RunEngineParams()
+            run_engine_params.update_from_engine(engine)
+            engine_manager = EngineManagerPlay.EngineManagerPlay(engine, run_engine_params)
+
+            if self.run_worker.book_path:
+                engine_manager.set_book(
+                    self.run_worker.book_path, self.run_worker.book_rr, 5, self.run_worker.book_depth
+                )
+            else:
+                bk = engine.book
+                if bk and bk in "*-":
+                    bk = None
+                if bk:
+                    engine_manager.set_book(bk, engine.book_rr, 5, engine.book_max_plies)
+            self.dic_engine_managers[side] = engine_manager
+
+        if self.run_worker.initial_fen:
+            self.game = Game.Game(fen=self.run_worker.initial_fen)
+        else:
+            self.game = Game.Game()
+
+        self.tc_white = TimeControl.TimeControl(self, self.game, WHITE)
+        self.tc_white.config_clock(self.max_seconds, self.seconds_per_move, 0, 0)
+        self.tc_black = TimeControl.TimeControl(self, self.game, BLACK)
+        self.tc_black.config_clock(self.max_seconds, self.seconds_per_move, 0, 0)
+
+        time_control = f"{int(self.max_seconds)}"
+        if self.seconds_per_move:
+            time_control += "+%d" % self.seconds_per_move
+        self.game.set_tag("TimeControl", time_control)
+
+    def close_engines(self):
+        for engine_manager in self.dic_engine_managers.values():
+            engine_manager.close()
+        if self.manager_adjudicator is not None:
+            self.manager_adjudicator.close()
+
+    def save_game_done(self):
+        self.game.set_tag("Site", f"{Code.lucas_chess} {Code.VERSION}")
+        self.game.set_tag("Event", self.run_worker.name)
+        self.run_worker.add_tags_game(self.game)
+
+        hoy = Util.today()
+        self.game.set_tag("Date", "%d.%02d.%02d" % (hoy.year, hoy.month, hoy.day))
+
+        engine_white = self.dic_engine_managers[WHITE].engine
+        engine_black = self.dic_engine_managers[BLACK].engine
+        self.game.set_tag("White", engine_white.name)
+        self.game.set_tag("Black", engine_black.name)
+        if engine_white.elo:
+            self.game.set_tag("WhiteElo", engine_white.elo)
+        if engine_black.elo:
+            self.game.set_tag("BlackElo", engine_black.elo)
+
+        self.game.set_extend_tags()
+        self.game.sort_tags()
+
+        self.run_worker.put_match_done(self.game)
+
+    def start_clock(self, is_white):
+        tc = self.tc_white if is_white else self.tc_black
+        tc.start()
+
+    def stop_clock(self, is_white):
+        tc = self.tc_white if is_white else self.tc_black
+        secs = tc.stop()
+        tc.set_labels()
+        return secs
+
+    def game_finished(self):
+        return self.game.termination != TERMINATION_UNKNOWN
+
+    def sudden_end(self, is_white):
+        result = RESULT_WIN_BLACK if is_white else RESULT_WIN_WHITE
+        self.game.set_termination(TERMINATION_ENGINE_MALFUNCTION, result)
+
+    def engine_move(
+        self,
+        engine_manager: EngineManagerPlay.EngineManagerPlay,
+        rm: Optional[EngineResponse.EngineResponse],
+        is_white: bool,
+        time_seconds: float,
+    ) -> Optional[Move.Move]:
+        """
+        The move of the answer of the engine, with its analysis and times, None if the engine has failed.
+        """
+        clock_seconds = self.tc_white.pending_time if is_white else self.tc_black.pending_time
+        if rm is None:
+            self.sudden_end(is_white)
+            return None
+
+        ok, mens, move = Move.get_game_move(self.game, self.game.last_position, rm.from_sq, rm.to_sq, rm.promotion)
+        if not move:
+            self.sudden_end(is_white)
+            return None
+
+        if engine_manager.mrm:
+            move.analysis = engine_manager.mrm.clone(), 0
+            move.del_nags()
+
+        if time_seconds:
+            move.set_time_ms(time_seconds * 1000.0)
+        if clock_seconds:
+            move.set_clock_ms(clock_seconds * 1000.0)
+        return move
+
+    def clocks_finished(self):
+        if self.tc_white.time_is_consumed():
+            self.game.set_termination(TERMINATION_WIN_ON_TIME, RESULT_WIN_BLACK)
+            return True
+        if self.tc_black.time_is_consumed():
+            self.game.set_termination(TERMINATION_WIN_ON_TIME, RESULT_WIN_WHITE)
+            return True
+        return False
+
+    def check_is_finished(self):
+        finished, result_adjudication = self.check_is_finished_nomodal()
+        if result_adjudication is not None:
+            rm = self.manager_adjudicator.play_game(self.game)
+            return self.adjudicator_decides(result_adjudication, rm)
+        return finished
+
+    def check_is_finished_nomodal(self):
+        """
+        Returns (finished, result_adjudication) without waiting for any engine.
+        result_adjudication is the result the adjudicator has to confirm with adjudicator_decides, None if it is not
+        needed.
+        """
+        if self.clocks_finished():
+            return True, None
+
+        if self.state != ST_PLAYING or self.is_closed or self.game_finished() or self.game.is_finished():
+            self.game.set_result()
+            return True, None
+
+        self.next_control -= 1
+        if self.next_control > 0:
+            return False, None
+
+        self.next_control = 1  # que siga mirando jugada a jugada
+
+        num_moves = len(self.game)
+
+        last_move: Move.Move = self.game.last_jg()
+        if not last_move.analysis:
+            return False, None
+        mrm, pos = last_move.analysis
+        rm_ult = mrm.li_rm[pos]
+        ant_move = self.game.move(-2)
+        if not ant_move.analysis:
+            return False, None
+        mrm, pos = ant_move.analysis
+        rm_ant = mrm.li_rm[pos]
+
+        p_ult = rm_ult.centipawns_abs()
+        p_ant = -rm_ant.centipawns_abs()
+
+        # Draw
+        dr = self.run_worker.draw_range
+        dmp = self.run_worker.draw_min_ply
+        if dmp and dr > 0 and num_moves >= dmp and abs(p_ult) <= dr and abs(p_ant) <= dr:
+            if self.manager_adjudicator:
+                return False, RESULT_DRAW
+            self.game.set_termination(TERMINATION_ADJUDICATION, RESULT_DRAW)
+            return True, None
+
+        # Resign
+        rs = self.run_worker.resign
+        if rs > p_ult:
+            # si el motor piensa que no hemos llegado al límite nos vamos
+            return False, None
+        if rs > p_ant and not self.manager_adjudicator:
+            # si el motor rival piensa que no se ha llegado al límite y no hay arbitro nos vamos
+            return False, None
+
+        result = RESULT_WIN_WHITE if last_move.is_white() else RESULT_WIN_BLACK
+
+        if self.manager_adjudicator:
+            # si hay arbitro el árbitro decide
+            return False, result
+
+        # si no hay arbitro y los dos piensan que el escore es superior al rs se adjudica
+        self.game.set_termination(TERMINATION_ADJUDICATION, result)
+        return True, None
+
+    def adjudicator_decides(self, result: str, rm: Optional[EngineResponse.EngineResponse]) -> bool:
+        """
+        With the answer rm of the adjudicator, sets the termination of the game if result is confirmed.
+        """
+        self.rejections_adjudicator += 1
+        self.next_control = 9 + self.rejections_adjudicator * 2
+        # Tras hacer un control de calidad si falla mirar dentro de 9 movimientos + rechazos
+        # el problema tipico es cuando los motores siempre envian score = 0
+        # next_control es impar para que la próxima vez pregunte al contrario
+        if rm is None:
+            return False
+        # el análisis es desde el punto de vista del rival, que es el que le toca mover
+        # como el escore se calcula en base al motor que acaba de mover, la evaluación es la contraria
+        p_tut = -rm.centipawns_abs()
+        if result == RESULT_DRAW:
+            if abs(p_tut) > self.run_worker.draw_range:
+                return False
+        elif p_tut < self.run_worker.resign:
+            return False
+        self.game.set_termination(TERMINATION_ADJUDICATION, result)
+        return True
@@ -0,0 +1,659 @@
+"""
+Benchmarks of the core routines, to compare before/after changes.
+    LucasR.py -benchmark [name]
+Without name all of them are run.
+"""
+import sqlite3
+import time
+import tracemalloc
+
+import Code
+
+
+def miniatures_xpv(limit=None):
+    path = Code.path_resource("IntFiles", "Miniatures.lcdb")
+    conexion = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    sql = "SELECT XPV FROM Games"
+    if limit:
+        sql += f" LIMIT {limit}"
+    li_xpv = [xpv for (xpv,) in conexion.execute(sql)]
+    conexion.close()
+    return li_xpv
+
+
+def report(label, seconds, num, unit):
+    print(f"{label:<40s} {seconds:8.3f}s {num / seconds if seconds else 0.0:12.1f} {unit}/s")
+
+
+def bench_game_restore():
+    from Code.Base import Game
+    from Code.Databases import DBgames
+
+    li_xpv = miniatures_xpv()
+    plies = 0
+
+    ini = time.perf_counter()
+    li_games = []
+    for xpv in li_xpv:
+        fen, pv = DBgames.DBgames.read_xpv(xpv)
+        game = Game.Game(fen=fen)
+        game.read_pv(pv)
+        plies += len(game)
+        li_games.append(game)
+    report("Game.read_pv (Miniatures.lcdb)", time.perf_counter() - ini, len(li_xpv), "games")
+
+    li_saved = [game.save() for game in li_games]
+    ini = time.perf_counter()
+    for saved in li_saved:
+        Game.Game().restore(saved)
+    seconds = time.perf_counter() - ini
+    report("Game.restore (Miniatures.lcdb)", seconds, len(li_saved), "games")
+    report("Game.restore plies", seconds, plies, "plies")
+
+    tracemalloc.start()
+    li_games = []
+    for saved in li_saved:
+        game = Game.Game()
+        game.restore(saved)
+        li_games.append(game)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'Game.restore memory kept':<40s} {size / plies:8.0f} bytes/ply")
+
+
+def bench_game_save():
+    from Code.Base import Game
+    from Code.Databases import DBgames
+    from Code.Z import Util
+
+    li_games = []
+    for xpv in miniatures_xpv():
+        fen, pv = DBgames.DBgames.read_xpv(xpv)
+        game = Game.Game(fen=fen)
+        game.read_pv(pv)
+        li_games.append(game)
+
+    def save_previous(game):
+        # Format previous to Game.SAVE_VERSION 1: a zipped dict with a zipped dict per move
+        game_data = {
+            "first_position": game.first_position.fen(),
+            "first_comment": game.first_comment,
+            "li_moves": [move.save() for move in game.li_moves],
+            "result": game.result,
+            "termination": game.termination,
+        }
+        if game.li_tags:
+            game_data["li_tags"] = game.li_tags
+        return Util.var2zip(game_data)
+
+    for label, save in (("previous", save_previous), ("binary", Game.Game.save)):
+        ini = time.perf_counter()
+        li_saved = [save(game) for game in li_games]
+        report(f"Game.save {label}", time.perf_counter() - ini, len(li_games), "games")
+        size = sum(len(saved) for saved in li_saved)
+        print(f"{'Game.save ' + label + ' size':<40s} {size / len(li_saved):8.1f} bytes/game")
+        ini = time.perf_counter()
+        for saved in li_saved:
+            Game.Game().restore(saved)
+        report(f"Game.restore {label}", time.perf_counter() - ini, len(li_saved), "games")
+
+
+def miniatures_pgn(path, repeat=1):
+    import FasterCode
+    from Code.Databases import DBgames
+
+    li_pgn = []
+    for num, xpv in enumerate(miniatures_xpv(), 1):
+        fen, pv = DBgames.DBgames.read_xpv(xpv)
+        board = FasterCode.Board(fen)
+        li_san = []
+        for ply, a1h8 in enumerate(pv.split(" ") if pv else []):
+            san = board.get_pgn(a1h8[:2], a1h8[2:4], a1h8[4:])
+            board.play(a1h8)
+            li_san.append(f"{ply // 2 + 1}.{san}" if ply % 2 == 0 else san)
+        tags = f'[Event "Miniature {num}"]\n[Result "*"]\n'
+        if fen:
+            tags += f'[FEN "{fen}"]\n'
+        li_pgn.append(f"{tags}\n{' '.join(li_san)} *\n\n")
+    with open(path, "w", encoding="utf-8") as f:
+        for x in range(repeat):
+            f.writelines(li_pgn)
+
+
+def bench_pgn_reader():
+    import os
+    import tempfile
+
+    import FasterCode
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "miniatures.pgn")
+        miniatures_pgn(path, 5)
+        ini = time.perf_counter()
+        with FasterCode.PGNreader(path, 0) as fpgn:
+            num = sum(1 for game in fpgn.games_raw())
+        report("PGNreader.games_raw", time.perf_counter() - ini, num, "games")
+        ini = time.perf_counter()
+        with FasterCode.PGNreader(path, 0) as fpgn:
+            num = sum(1 for game in fpgn)
+        report("PGNreader", time.perf_counter() - ini, num, "games")
+
+
+def bench_import_pgn():
+    import os
+    import tempfile
+
+    from Code.Databases import ImportPGN
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "miniatures.pgn")
+        miniatures_pgn(path, 5)
+        for label, parallel in (("sequential", False), (f"parallel x{ImportPGN.num_workers()}", True)):
+            ini = time.perf_counter()
+            with ImportPGN.PGNgames(path, 0, parallel) as games:
+                num = sum(1 for game in games)
+            report(f"ImportPGN {label}", time.perf_counter() - ini, num, "games")
+
+
+def bench_duplicates():
+    import os
+    import random
+    import tempfile
+
+    from Code.Databases import DBgamesDuplicates, DBgamesVersion
+
+    def random_xpv():
+        return "".join(random.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz") for x in range(40))
+
+    num_games, num_new = 500_000, 100_000
+    with tempfile.TemporaryDirectory() as folder:
+        conexion = sqlite3.connect(os.path.join(folder, "dup.lcdb"))
+        conexion.execute("CREATE TABLE Games(XPV VARCHAR,_DATA_ BLOB,PLYCOUNT INT);")
+        conexion.execute("CREATE INDEX XPV_INDEX ON Games (XPV);")
+        DBgamesVersion.check_triggers(conexion)
+        li_xpv = [random_xpv() for x in range(num_games)]
+        conexion.executemany("INSERT INTO Games (XPV) VALUES (?)", ((xpv,) for xpv in li_xpv))
+        conexion.commit()
+        li_check = [random_xpv() for x in range(num_new)] + random.sample(li_xpv, num_new // 10)
+
+        ini = time.perf_counter()
+        for xpv in li_check:
+            conexion.execute("SELECT 1 FROM Games WHERE XPV = ? LIMIT 1", (xpv,)).fetchone()
+        report("SELECT XPV", time.perf_counter() - ini, len(li_check), "games")
+
+        dup_index = DBgamesDuplicates.DuplicatesIndex(conexion)
+        ini = time.perf_counter()
+        dup_index.check()
+        report("DuplicatesIndex one-time build", time.perf_counter() - ini, num_games, "games")
+        ini = time.perf_counter()
+        dup_index.load(len(li_check))
+        report("DuplicatesIndex.load", time.perf_counter() - ini, num_games, "games")
+        ini = time.perf_counter()
+        for xpv in li_check:
+            dup_index.is_duplicate(xpv)
+        report("DuplicatesIndex.is_duplicate", time.perf_counter() - ini, len(li_check), "games")
+        conexion.close()
+
+
+def bench_tree_stat():
+    import os
+    import tempfile
+
+    import FasterCode
+
+    from Code.Databases import DBgamesST
+
+    li_pv = [FasterCode.xpv_pv(xpv) for xpv in miniatures_xpv() if not xpv.startswith("|")]
+    with tempfile.TemporaryDirectory() as folder:
+        db_stat = DBgamesST.TreeSTAT(os.path.join(folder, "one.st1"), 12)
+        ini = time.perf_counter()
+        for pv in li_pv[:2000]:
+            db_stat.append(pv, "1-0")
+        db_stat.commit()
+        report("TreeSTAT.append", time.perf_counter() - ini, 2000, "games")
+        db_stat.close()
+
+        db_stat = DBgamesST.TreeSTAT(os.path.join(folder, "bulk.st1"), 12)
+        ini = time.perf_counter()
+        db_stat.massive_append_set(True)
+        for pv in li_pv:
+            db_stat.append(pv, "1-0")
+        db_stat.massive_append_set(False)
+        db_stat.commit()
+        report("TreeSTAT.append massive (BulkSTAT)", time.perf_counter() - ini, len(li_pv), "games")
+        db_stat.close()
+
+
+def bench_ipc():
+    import os
+    import tempfile
+    import threading
+
+    from Code.Base import Game
+    from Code.Databases import DBgames
+    from Code.SQL import UtilSQL
+    from Code.Z import UtilIPC
+
+    fen, pv = DBgames.DBgames.read_xpv(miniatures_xpv(1)[0])
+    game = Game.Game(fen=fen)
+    game.read_pv(pv)
+    msg_game = {"__CLAVE__": "G", "GAME": game.save(), "IS_WHITE_BOTTOM": True}
+    num_progress, num_games = 5000, 500
+
+    def echo(ipc_in, ipc_out):
+        while True:
+            valor = ipc_in.pop()
+            if valor is None:
+                time.sleep(0)
+            elif valor == "END":
+                return
+            elif valor["__CLAVE__"] == "G":
+                ipc_out.push(valor)
+
+    def wait_pop(ipc):
+        while (valor := ipc.pop()) is None:
+            time.sleep(0)
+        return valor
+
+    with tempfile.TemporaryDirectory() as folder:
+        for label, cls in (("UtilSQL.IPC", UtilSQL.IPC), ("UtilIPC.IPC", UtilIPC.IPC)):
+            path_send, path_receive = os.path.join(folder, "send.ipc"), os.path.join(folder, "receive.ipc")
+            send, receive = cls(path_send, True), cls(path_receive, True)
+            child_receive, child_send = cls(path_send, False), cls(path_receive, False)
+            thread = threading.Thread(target=echo, args=(child_receive, child_send))
+            thread.start()
+
+            ini = time.perf_counter()
+            for x in range(num_progress):
+                send.push({"__CLAVE__": "R", "CURRENT": x, "TOTAL": num_progress})
+            send.push(msg_game)
+            wait_pop(receive)  # all the progress messages have been read
+            report(f"{label} progress", time.perf_counter() - ini, num_progress, "msgs")
+
+            ini = time.perf_counter()
+            for x in range(num_games):
+                send.push(msg_game)
+                wait_pop(receive)
+            seconds = time.perf_counter() - ini
+            report(f"{label} round trip game", seconds, num_games, "msgs")
+            print(f"{label + ' latency':<40s} {seconds * 1000 / num_games:8.3f}ms")
+
+            send.push("END")
+            thread.join()
+            for ipc in (send, receive, child_receive, child_send):
+                ipc.close()
+
+
+def bench_uci_output():
+    from Code.Engines import EngineResponse, EngineRun
+
+    li_moves = "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1 f8e7".split(" ") * 4
+    multipv, num_chunks = 5, 20
+    lines = []
+    nodes = 0
+    for depth in range(1, 31):
+        for iteration in range(3):  # the engines send again the lines of a depth when the pv changes
+            for k in range(1, multipv + 1):
+                nodes += 50000
+                pv_line = " ".join([li_moves[k]] + li_moves[iteration + k : iteration + k + depth])
+                lines.append(
+                    f"info depth {depth} seldepth {depth + 6} multipv {k} score cp {k * 7 - iteration} nodes {nodes}"
+                    f" nps 1500000 hashfull {depth * 10} tbhits 0 time {nodes // 1500} pv {pv_line}"
+                )
+    lines.append(f"bestmove {li_moves[0]}")
+    size = len(lines) // num_chunks + 1
+    li_chunks = [lines[pos : pos + size] for pos in range(0, len(lines), size)]
+
+    for label, coalesce in (("uci output all lines", False), ("uci output coalesced", True)):
+        ini = time.perf_counter()
+        for x in range(20):
+            mrm = EngineResponse.MultiEngineResponse("bench", True)
+            for chunk in li_chunks:
+                st_superseded = EngineRun.superseded_lines(chunk) if coalesce else set()
+                for pos, line in enumerate(chunk):
+                    if pos not in st_superseded:
+                        mrm.dispatch(line)
+        report(label, time.perf_counter() - ini, len(lines) * 20, "lines")
+
+
+def analysed_game(num_moves, multipv=5, seed=1):
+    import random
+
+    import FasterCode
+
+    from Code.Base import Game
+    from Code.Engines import EngineResponse
+
+    rnd = random.Random(seed)
+    while True:
+        FasterCode.set_init_fen()
+        li_pv = []
+        for ply in range(num_moves * 2):
+            li_exmoves = FasterCode.get_exmoves()
+            if not li_exmoves:
+                break
+            move = rnd.choice(li_exmoves).move()
+            li_pv.append(move)
+            FasterCode.make_move(move)
+        if len(li_pv) == num_moves * 2:
+            break
+
+    game = Game.Game()
+    game.read_pv(" ".join(li_pv))
+    for move in game.li_moves:
+        cp = move.position_before
+        FasterCode.set_fen(cp.fen())
+        li_exmoves = [exmove.move() for exmove in FasterCode.get_exmoves()]
+        mrm = EngineResponse.MultiEngineResponse("bench", cp.is_white)
+        for k, pv in enumerate(li_exmoves[:multipv], 1):
+            mrm.dispatch(f"info depth 20 multipv {k} score cp {rnd.randint(-300, 300)} nodes 1000 pv {pv}")
+        mrm.ordena()
+        move.analysis = mrm, 0
+    return game
+
+
+def bench_analysis_indexes():
+    from Code.Analysis import AnalysisIndexes
+
+    game = analysed_game(100)
+    li_cual = [cual for key, cual in AnalysisIndexes.MOVE_INDEXES]
+
+    def calc_formula_previous(cual, cp, mrm):
+        # Previous to the compiled formulas: the file is read, the variables replaced by its values and evaluated
+        with open(Code.path_resource("IntFiles", "Formulas", f"{cual}.formula"), "rt") as f:
+            formula = f.read().strip()
+        variables = AnalysisIndexes.formula_variables(cp, mrm)
+        for key, value in zip(AnalysisIndexes.FORMULA_VARIABLES, variables):
+            formula = formula.replace(key, f"{float(value):.10f}")
+        try:
+            return float(eval(formula, {"__builtins__": {}}, AnalysisIndexes.FORMULA_NAMES))
+        except Exception:
+            return 0.0
+
+    num = 10
+    ini = time.perf_counter()
+    for x in range(num):
+        for move in game.li_moves:
+            for cual in li_cual:
+                calc_formula_previous(cual, move.position_before, move.analysis[0])
+    report("indexes previous (100 moves game)", time.perf_counter() - ini, num * len(game), "moves")
+
+    ini = time.perf_counter()
+    for x in range(num):
+        for move in game.li_moves:
+            for cual in li_cual:
+                AnalysisIndexes.calc_formula(cual, move.position_before, move.analysis[0])
+    report("indexes one by one (100 moves game)", time.perf_counter() - ini, num * len(game), "moves")
+
+    ini = time.perf_counter()
+    for x in range(num):
+        AnalysisIndexes.set_game_indexes(game, only_missing=False)
+    report("indexes of the game (100 moves game)", time.perf_counter() - ini, num * len(game), "moves")
+
+def bench_position_commands():
+    from Code.Base import Game
+
+    game = analysed_game(150, multipv=1)
+    num = len(game)
+
+    ini = time.perf_counter()
+    li_previous = []
+    for njug in range(-1, num - 1):
+        # Previous: the first position with all the moves of the game
+        pv = game.pv_hasta(njug)
+        li_previous.append(f"position startpos moves {pv}" if pv else "position startpos")
+    report("position, all the moves (300 plies)", time.perf_counter() - ini, num, "plies")
+
+    ini = time.perf_counter()
+    li_delta = []
+    for njug in range(-1, num - 1):
+        fen, pv = game.fen_pv_hasta(njug)
+        order = f"position fen {fen}" if fen else "position startpos"
+        li_delta.append(f"{order} moves {pv}" if pv else order)
+    report("position, fen + delta (300 plies)", time.perf_counter() - ini, num, "plies")
+    print(f"{'position, size all/delta':<40s} {sum(len(x) for x in li_previous) / sum(len(x) for x in li_delta):8.1f}x")
+
+    ini = time.perf_counter()
+    for njug in range(-1, num - 1):
+        replay = Game.Game()
+        replay.read_pv(game.pv_hasta(njug))
+    report("worker replay, all the moves", time.perf_counter() - ini, num, "plies")
+
+    ini = time.perf_counter()
+    for njug in range(-1, num - 1):
+        fen, pv = game.fen_pv_hasta(njug)
+        replay = Game.Game(fen=fen)
+        replay.read_pv(pv)
+    report("worker replay, fen + delta", time.perf_counter() - ini, num, "plies")
+
+
+def bench_polyglot_probe():
+    import os
+
+    import FasterCode
+
+    from Code.Books import Polyglot
+    from Code.Databases import DBgames
+
+    path = Code.path_resource("Openings", "fics15.bin")
+    li_fens = []
+    for xpv in miniatures_xpv(2000):
+        fen, pv = DBgames.DBgames.read_xpv(xpv)
+        FasterCode.set_init_fen()
+        for move in pv.split(" ")[:16]:
+            li_fens.append(FasterCode.get_fen())
+            FasterCode.make_move(move)
+    li_keys = [FasterCode.hash_polyglot8(fen) for fen in li_fens]
+
+    def probe_previous(key):
+        # Previous reader: the file opened in every probe, binary search reading entries of 16 bytes
+        with open(path, "rb") as f:
+            f.seek(-16, os.SEEK_END)
+            first, last = -1, f.tell() // 16
+            while last - first > 1:
+                middle = (first + last) // 2
+                f.seek(16 * middle)
+                if key <= int.from_bytes(f.read(8), "big"):
+                    last = middle
+                else:
+                    first = middle
+            f.seek(16 * last)
+            li = []
+            while len(data := f.read(16)) == 16 and int.from_bytes(data[:8], "big") == key:
+                li.append((int.from_bytes(data[8:10], "big"), int.from_bytes(data[10:12], "big")))
+            return li
+
+    ini = time.perf_counter()
+    for key in li_keys:
+        probe_previous(key)
+    report("polyglot, open+read per probe", time.perf_counter() - ini, len(li_keys), "probes")
+
+    book = Polyglot.Polyglot()
+    ini = time.perf_counter()
+    for fen in li_fens:
+        book.lista(path, fen)
+    report("polyglot, mmap lista(fen)", time.perf_counter() - ini, len(li_fens), "probes")
+
+    bfile = Polyglot.book_file(path)
+    ini = time.perf_counter()
+    for key in li_keys:
+        bfile.probe(key)
+    report("polyglot, mmap probe(key)", time.perf_counter() - ini, len(li_keys), "probes")
+
+    ini = time.perf_counter()
+    bfile.probe_many(li_keys)
+    report("polyglot, mmap probe_many(keys)", time.perf_counter() - ini, len(li_keys), "probes")
+
+
+def bench_book_build():
+    import FasterCode
+
+    from Code.Base.Constantes import FEN_INITIAL
+    from Code.Books import PolyglotImportExports
+
+    li_xpv = [xpv for xpv in miniatures_xpv() if not xpv.startswith("|")]
+    plies = 30
+
+    ini = time.perf_counter()
+    # Previous: fen and hash of every position, text keys in a dict
+    dic = {}
+    num_moves = 0
+    for xpv in li_xpv:
+        FasterCode.set_fen(FEN_INITIAL)
+        is_white = True
+        for mv in FasterCode.xpv_lipv(xpv)[:plies]:
+            move = FasterCode.string_movepolyglot(mv)
+            key = FasterCode.hash_polyglot8(FasterCode.get_fen())
+            keymove = FasterCode.keymove_str(key, move)
+            c, s = dic.get(keymove, (0, 0))
+            dic[keymove] = (c + 1, s + (2 if is_white else 0))
+            FasterCode.make_move(mv)
+            is_white = not is_white
+            num_moves += 1
+    li_previous = [(FasterCode.str_keymove(keymove), value) for keymove, value in sorted(dic.items())]
+    report("book, fen+hash per move", time.perf_counter() - ini, num_moves, "moves")
+
+    ini = time.perf_counter()
+    counter = PolyglotImportExports.BookCounter()
+    for xpv in li_xpv:
+        counter.add_moves(FasterCode.xpv_polyglot(FEN_INITIAL, xpv, plies), 2, 0)
+    li_items = list(counter.items())
+    counter.close()
+    report("book, xpv_polyglot+BookCounter", time.perf_counter() - ini, num_moves, "moves")
+    if len(li_items) != len(li_previous):
+        print("Different number of entries", len(li_items), len(li_previous))
+
+
+def bench_book_db():
+    import os
+    import sqlite3
+    import tempfile
+
+    import FasterCode
+
+    from Code.Books import DBPolyglot
+
+    path = Code.path_resource("Openings", "fics15.bin")
+    li_entries = [entry for entry in FasterCode.Polyglot(path)]
+    folder = tempfile.mkdtemp()
+
+    # Previous: CKEY = int_str(key) text, a SELECT and then an UPDATE or INSERT for every entry
+    conexion = sqlite3.connect(os.path.join(folder, "previous.lcbin"))
+    conexion.execute("CREATE TABLE BOOK( CKEY TEXT, MOVE INT, WEIGHT INT, SCORE INT, DEPTH INT, LEARN INT);")
+    conexion.execute("CREATE INDEX CKEY_INDEX ON BOOK( CKEY );")
+    ini = time.perf_counter()
+    for repeat in range(2):  # the second time all are collisions, added
+        for entry in li_entries:
+            ckey = FasterCode.int_str(entry.key)
+            cursor = conexion.execute("SELECT ROWID, WEIGHT FROM BOOK WHERE CKEY=? AND MOVE=?", (ckey, entry.move))
+            if row := cursor.fetchone():
+                conexion.execute("UPDATE BOOK SET WEIGHT=? WHERE ROWID=?", (entry.weight + row[1], row[0]))
+            else:
+                conexion.execute(
+                    "INSERT INTO BOOK( CKEY, MOVE, WEIGHT, SCORE, DEPTH, LEARN ) VALUES( ?, ?, ?, ?, ?, ? );",
+                    (ckey, entry.move, entry.weight, entry.score, entry.depth, entry.learn),
+                )
+    conexion.commit()
+    report("book db, text keys select+update", time.perf_counter() - ini, 2 * len(li_entries), "entries")
+
+    ini = time.perf_counter()
+    num = 0
+    li_length = [length for (length,) in conexion.execute("SELECT DISTINCT length(CKEY) FROM BOOK ORDER BY 1")]
+    for length in li_length:
+        sql = "SELECT CKEY, MOVE, WEIGHT, SCORE, DEPTH, LEARN FROM BOOK WHERE LENGTH(CKEY) = ? ORDER BY CKEY"
+        for row in conexion.execute(sql, (length,)):
+            FasterCode.str_int(row[0])
+            num += 1
+    report("book db, text keys get_all", time.perf_counter() - ini, num, "entries")
+    conexion.close()
+
+    with DBPolyglot.DBPolyglot(os.path.join(folder, "book.lcbin")) as db:
+        ini = time.perf_counter()
+        for repeat in range(2):
+            for pos in range(0, len(li_entries), 10_000):
+                db.replace_entries(li_entries[pos : pos + 10_000], "add")
+        db.commit()
+        report("book db, integer keys upsert", time.perf_counter() - ini, 2 * len(li_entries), "entries")
+
+        ini = time.perf_counter()
+        num = sum(1 for entry in db.get_all() if entry is not None)
+        report("book db, integer keys get_all", time.perf_counter() - ini, num, "entries")
+
+    ini = time.perf_counter()
+    with DBPolyglot.DBPolyglot(os.path.join(folder, "previous.lcbin")):
+        pass
+    report("book db, migration to integer keys", time.perf_counter() - ini, num, "entries")
+
+    for entry in os.scandir(folder):
+        os.remove(entry.path)
+    os.rmdir(folder)
+
+
+def bench_openings(num_games=1_000_000):
+    import itertools
+
+    import FasterCode
+
+    from Code.Base import Position
+    from Code.Openings import OpeningsStd
+
+    li_miniatures = [xpv for xpv in miniatures_xpv() if not xpv.startswith("|")]
+    op_std = OpeningsStd.ListaOpeningsStd()
+    op_std.dic_fenm2_op, op_std.dic_fenm2_op_all, op_std.st_fenm2_test = op_std.read_fenm2_op()
+
+    ini = time.perf_counter()
+    # Previous: make_move + get_fen + legal_fenm2 of every position of the game
+    li_previous = []
+    for xpv in li_miniatures:
+        last_ap = None
+        FasterCode.set_init_fen()
+        for pv in FasterCode.xpv_pv(xpv).split(" "):
+            FasterCode.make_move(pv)
+            fenm2 = Position.legal_fenm2(FasterCode.get_fen())
+            if fenm2 in op_std.dic_fenm2_op:
+                last_ap = op_std.dic_fenm2_op[fenm2]
+        li_previous.append(last_ap)
+    seconds = time.perf_counter() - ini
+    report("openings, fenm2 per move", seconds, len(li_miniatures), "games")
+    seconds *= num_games / len(li_miniatures)
+    print(f"{'openings, fenm2 per move, estimated':<40s} {seconds:8.3f}s for {num_games} games")
+
+    ini = time.perf_counter()
+    index = op_std.index()
+    report("openings, index of openings.lkop", time.perf_counter() - ini, len(op_std.dic_fenm2_op), "openings")
+    if li_previous != [index.last_opening(xpv) for xpv in li_miniatures]:
+        print("Different openings")
+
+    li_xpv = list(itertools.islice(itertools.cycle(li_miniatures), num_games))
+    ini = time.perf_counter()
+    for xpv in li_xpv:
+        index.last_opening(xpv)
+    report("openings, trie + keys", time.perf_counter() - ini, len(li_xpv), "games")
+
+
+DIC_BENCHMARKS = {
+    "game_restore": bench_game_restore,
+    "game_save": bench_game_save,
+    "pgn_reader": bench_pgn_reader,
+    "import_pgn": bench_import_pgn,
+    "duplicates": bench_duplicates,
+    "tree_stat": bench_tree_stat,
+    "ipc": bench_ipc,
+    "uci_output": bench_uci_output,
+    "analysis_indexes": bench_analysis_indexes,
+    "position_commands": bench_position_commands,
+    "polyglot_probe": bench_polyglot_probe,
+    "book_build": bench_book_build,
+    "book_db": bench_book_db,
+    "openings": bench_openings,
+}
+
+
+def run(name=None):
+    li_names = [name] if name else list(DIC_BENCHMARKS)
+    for xname in li_names:
+        if xname not in DIC_BENCHMARKS:
+            print(f"Unknown benchmark: {xname}, available: {', '.join(DIC_BENCHMARKS)}")
+            continue
+        print(f":: {xname}")
+        DIC_BENCHMARKS[xname]()
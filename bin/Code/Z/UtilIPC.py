@@ -0,0 +1,110 @@
+"""
+Channel between the GUI and the processes it launches (analysis workers, kibitzers), same API than UtilSQL.IPC.
+
+The process that creates the channel listens in a local socket (unix socket, named pipe in windows) and writes
+the address and the key of the connection in path_file, the other process reads it and connects.
+Every message is a pickled object sent with its length, without disk access. push doesn't wait, the messages are
+sent by a thread, and pop returns None when there is nothing to read.
+"""
+import collections
+import os
+import pickle
+import queue
+import secrets
+import threading
+from multiprocessing import connection
+from typing import Any
+
+from Code.Z import Util
+
+FAMILY = "AF_PIPE" if Util.is_windows() else "AF_UNIX"
+TIMEOUT_CLOSE = 2.0  # seconds to send the pending messages when closing
+
+_STOP = object()
+
+
+class IPC(object):
+    def __init__(self, path_file: str, si_crear: bool):
+        self.path_file = path_file
+        self._listener = None
+        self._authkey = None
+        self._conexion = None
+        self._queue_send = queue.SimpleQueue()
+        self._received = collections.deque()
+        self._last = None
+        self.closed = False
+
+        if si_crear:
+            self._authkey = secrets.token_bytes(32)
+            self._listener = connection.Listener(connection.arbitrary_address(FAMILY), FAMILY, authkey=self._authkey)
+            Util.remove_file(path_file)
+            with open(path_file, "wb") as f:
+                pickle.dump({"ADDRESS": self._listener.address, "AUTHKEY": self._authkey}, f)
+        else:
+            with open(path_file, "rb") as f:
+                dic = pickle.load(f)
+            self._conexion = connection.Client(dic["ADDRESS"], FAMILY, authkey=dic["AUTHKEY"])
+            Util.remove_file(path_file)
+
+        self._thread_send = threading.Thread(target=self._send_loop, daemon=True)
+        self._thread_send.start()
+
+    def _send_loop(self):
+        if self._conexion is None:
+            try:
+                self._conexion = self._listener.accept()
+            except (OSError, EOFError, connection.AuthenticationError):  # closed before the other process connected
+                return
+        while (valor := self._queue_send.get()) is not _STOP:
+            try:
+                self._conexion.send(valor)
+            except OSError:  # the other process has finished
+                return
+
+    def _read(self) -> bool:
+        conexion = self._conexion
+        if conexion is None or self.closed:
+            return False
+        try:
+            while conexion.poll(0):
+                self._received.append(conexion.recv())
+        except (OSError, EOFError):  # the other process has finished
+            pass
+        return len(self._received) > 0
+
+    def pop(self) -> Any:
+        if not self._received and not self._read():
+            return None
+        self._last = self._received.popleft()
+        return self._last
+
+    def read_again(self) -> None:
+        if self._last is not None:
+            self._received.appendleft(self._last)
+            self._last = None
+
+    def has_more_data(self) -> bool:
+        return len(self._received) > 0 or self._read()
+
+    def push(self, valor: Any) -> None:
+        if not self.closed:
+            self._queue_send.put(valor)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._queue_send.put(_STOP)
+        if self._listener is not None and self._conexion is None:
+            # accept doesn't end closing the listener, a connection is needed
+            try:
+                connection.Client(self._listener.address, FAMILY, authkey=self._authkey).close()
+            except (OSError, EOFError, connection.AuthenticationError):
+                pass
+        self._thread_send.join(TIMEOUT_CLOSE)
+        if self._conexion is not None:
+            self._conexion.close()
+        if self._listener is not None:
+            self._listener.close()
+        if os.path.isfile(self.path_file):
+            Util.remove_file(self.path_file)
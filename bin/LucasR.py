@@ -5,58 +5,85 @@
 # Blog : https://lucaschess.blogspot.com
 # Licence : GPL 3.0
 # ==============================================================================
+import multiprocessing
 import sys
 
 import warnings
 
 warnings.simplefilter("ignore")
 
-n_args = len(sys.argv)
-if n_args == 1:
-    import Code.Main.Init
 
-    Code.Main.Init.init()
-
-elif n_args >= 2:
-    arg = sys.argv[1].lower()
-    if arg.endswith((".pgn", ".lcdb", ".lcsb", ".bmt", ".shortcut")) or arg in ("-play", "-playagainst"):
+def main():
+    n_args = len(sys.argv)
+    if n_args == 1:
         import Code.Main.Init
 
         Code.Main.Init.init()
 
-    elif arg == "-kibitzer":
-        import Code.Kibitzers.RunKibitzer
+    elif n_args >= 2:
+        arg = sys.argv[1].lower()
+        if arg.endswith((".pgn", ".lcdb", ".lcsb", ".bmt", ".shortcut")) or arg in ("-play", "-playagainst"):
+            import Code.Main.Init
+
+            Code.Main.Init.init()
+
+        elif arg == "-kibitzer":
+            import Code.Kibitzers.RunKibitzer
+
+            Code.Kibitzers.RunKibitzer.run(sys.argv[2])
+
+        elif arg == "-translate":
+            from Code.Translations import RunTranslate
+
+            RunTranslate.run_wtranslation(sys.argv[2])
+
+        elif arg == "-tournament":
+            import Code.Tournaments.RunTournament
+
+            user = sys.argv[3] if len(sys.argv) >= 4 else ""
+            Code.Tournaments.RunTournament.run(user, sys.argv[2])
+
+        elif arg == "-league":
+            import Code.Leagues.RunLeague
+
+            user = sys.argv[3] if len(sys.argv) >= 4 else ""
+            Code.Leagues.RunLeague.run(user, sys.argv[2])
 
-        Code.Kibitzers.RunKibitzer.run(sys.argv[2])
+        elif arg == "-swiss":
+            import Code.Swiss.RunSwiss
 
-    elif arg == "-translate":
-        from Code.Translations import RunTranslate
+            user = sys.argv[3] if len(sys.argv) >= 4 else ""
+            Code.Swiss.RunSwiss.run(user, sys.argv[2])
 
-        RunTranslate.run_wtranslation(sys.argv[2])
+        elif arg in ("-tournament-headless", "-league-headless", "-swiss-headless"):
+            from Code.Workers import RunHeadless
 
-    elif arg == "-tournament":
-        import Code.Tournaments.RunTournament
+            user = sys.argv[3] if len(sys.argv) >= 4 else ""
+            num_games = int(sys.argv[4]) if len(sys.argv) >= 5 else 0
+            RunHeadless.run(arg[1 : -len("-headless")], user, sys.argv[2], num_games)
 
-        user = sys.argv[3] if len(sys.argv) >= 4 else ""
-        Code.Tournaments.RunTournament.run(user, sys.argv[2])
+        elif arg == "-sts":
+            from Code.STS import RunSTS
 
-    elif arg == "-league":
-        import Code.Leagues.RunLeague
+            user = sys.argv[4] if len(sys.argv) >= 5 else ""
+            num_engines, threads, hash_mb = (int(x) for x in (sys.argv[5:8] + ["0", "0", "0"])[:3])
+            RunSTS.run(user, sys.argv[2], int(sys.argv[3]), num_engines, threads, hash_mb)
 
-        user = sys.argv[3] if len(sys.argv) >= 4 else ""
-        Code.Leagues.RunLeague.run(user, sys.argv[2])
+        elif arg == "-analysis":
+            import Code.Analysis.RunAnalysis
 
-    elif arg == "-swiss":
-        import Code.Swiss.RunSwiss
+            Code.Analysis.RunAnalysis.run(sys.argv[2])
 
-        user = sys.argv[3] if len(sys.argv) >= 4 else ""
-        Code.Swiss.RunSwiss.run(user, sys.argv[2])
+        elif arg == "-benchmark":
+            from Code.Z import Benchmark
 
-    elif arg == "-analysis":
-        import Code.Analysis.RunAnalysis
+            Benchmark.run(sys.argv[2] if len(sys.argv) >= 3 else None)
 
-        Code.Analysis.RunAnalysis.run(sys.argv[2])
+        elif arg == "-healthcheck":
+            sys.exit(0)
 
-    elif arg == "-healthcheck":
-        sys.exit(0)
 
+# The processes of multiprocessing (spawn) import this module as __mp_main__
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    main()
@@ -3,11 +3,13 @@ cimport cython
 import sys
 import os.path
 import os
+import mmap
 import shutil
-import tempfile
 from collections import deque
 from libc.stdio cimport FILE
 from libc.stdlib cimport malloc, free
+from libc.string cimport memchr
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE
 from typing import Dict, Tuple, Iterator, List, Optional
 
 """
@@ -42,6 +44,8 @@ def xpv_pv(xpv): convert xpv to a list of moves separated by spaces
 def xpv_pgn(xpv): convert xpv to a pgn
 def lipv_pgn(fen, lipv):
 def pv_xpv(pv): convert list of moves to xpv
+def xpv_polyglot(fen, xpv, plies): polyglot keys and moves of a xpv, updating the key move by move
+def xpv_polyglot_keys(fen, xpv, targets): polyglot keys of the positions after every move of a xpv
 def run_fen( fen, depth, ms, level ): plays internal engine of a level during ms time and a depth
 def set_fen(fen): internally fen is setted
 def get_fen(): returns current fen
@@ -75,6 +79,10 @@ def fen_ended(fen): returns if there are no moves from this fen
 def xparse_body(fen, body): returns all moves separated by \n and all other information in line appart, used to read a pgn from Match
 def xparse_pgn(pgn): returns all moves separated by \n and all other information in line appart, used to read a pgn from Match
 def get_pgn_descriptive(is_white, from_sq, to_sq, promotion)
+
+class Board: own irina position, independent of the global one used by set_fen/make_move/get_fen...
+    board = Board(fen=None)
+    board.make_move("e2e4"); board.get_fen(); board.unmake_move()
 """
 
 
@@ -87,6 +95,12 @@ cdef extern from "irina.h":
     void fen_board(char *fen)
     char *board_fen(char *fen)
     char *board_fenM2(char *fen)
+    void *board_new()
+    void board_free(void *b)
+    void *board_select(void *b)
+    void board_copy(void *dst, void *src)
+    int board_make_nummove(int num, int keep_history)
+    int board_unmake()
     int movegen()
     int pgn2pv(char *pgn, char *pv)
     int make_nummove(int num)
@@ -119,159 +133,212 @@ cdef extern from "irina.h":
     void close_poly()
     void set_ext_fen_body(char * ext_fen, char * ext_body, char * pv )
     void pv_xpv_c(const char* pv, char* res)
+    int polyglot_xpv(char *fen, char *xpv, int plies, int with_white, int with_black, int in_opening,
+                     unsigned long long *keys, unsigned int *moves, char *is_white)
+    int polyglot_xpv_keys(char *fen, char *xpv, unsigned int *pawns_out, int *men, int num_targets,
+                          unsigned long long *keys)
 
 
 def bmi2():
     return is_bmi2()
 
 
-class PGNreader:
+cdef inline bint is_blank(char c):
+    return c == 32 or 9 <= c <= 13
+
+
+cdef class PGNreader:
     """
-    Robust PGN reader designed for Cython integration.
-    Safe, deterministic, production-ready.
+    PGN reader over a memory map of the file, the lines are scanned in C, only the tags and the body
+    of every game are copied. Files with CR line endings are read as they are.
+    start, end: byte range of the file to read, they must be game boundaries, end=0 up to the end of file.
     """
-
-    def __init__(self, path_file: str, depth: int) -> None:
+    cdef public str original_path, path_file
+    cdef public int depth
+    cdef public Py_ssize_t size, start, end, inicio, final, body_ini
+    cdef public bint utf_bom, ok
+    cdef object f, mm
+    cdef Py_buffer buf
+    cdef bint has_buf, _started
+    cdef const char *data
+    cdef char eol
+    cdef Py_ssize_t pos
+
+    def __init__(self, path_file: str, depth: int, start: int = 0, end: int = 0) -> None:
         if not isinstance(depth, int) or depth < 0:
             raise ValueError("depth must be a non-negative integer")
 
         self.original_path = path_file
         self.path_file = path_file
         self.depth = depth
+        self.start = start
+        self.end = end
+        self.inicio = self.final = self.body_ini = 0
+        self.has_buf = False
+        self._started = False
 
-        self.size: int = 0
-        self.tmp_file: Optional[str] = None
-        self.utf_bom: bool = False
-        self.inicio: int = 0
-        self.final: int = 0
-        self.ok: bool = False
-        self._started: bool = False  # FIX 1: rastrear si pgn_start() completó
-
-        self._prepare_file()
-
-    def _prepare_file(self) -> None:
         try:
-            with open(self.path_file, "rb") as f:
-                start = f.read(3)
-                self.utf_bom = start.startswith(b"\xef\xbb\xbf")
-                f.seek(0)
+            with open(path_file, "rb") as f:
                 sample = f.read(2048)
-                has_lf = b"\n" in sample
-
                 f.seek(0, os.SEEK_END)
                 self.size = f.tell()
-
             self.ok = True
         except OSError:
             self.ok = False
-            return
+            self.size = 0
+            sample = b""
+        self.utf_bom = sample.startswith(b"\xef\xbb\xbf")
+        self.eol = 13 if b"\r" in sample and b"\n" not in sample else 10
 
-        if self.ok and not has_lf:
-            self._normalize_line_endings()
-
-    def _normalize_line_endings(self) -> None:
-        fd, temp_path = tempfile.mkstemp(prefix="pgnreader_", suffix=".pgn")
-        os.close(fd)
-
-        with open(self.path_file, "rb") as src, open(temp_path, "wb") as dst:
-            while True:
-                chunk = src.read(65536)
-                if not chunk:
-                    break
-                chunk = chunk.replace(b"\r\n", b"\n")
-                chunk = chunk.replace(b"\r", b"\n")
-                dst.write(chunk)
-
-        self.path_file = temp_path
-        self.tmp_file = temp_path
-
-    def __enter__(self) -> "PGNreader":
+    def __enter__(self):
         self.f = open(self.path_file, "rb")
-        if self.utf_bom:
-            self.f.seek(3)
-        self._started = False
+        if self.size:
+            self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+            PyObject_GetBuffer(self.mm, &self.buf, PyBUF_SIMPLE)
+            self.data = <const char *>self.buf.buf
+            self.has_buf = True
+        if self.start:
+            self.pos = self.start
+        else:
+            self.pos = 3 if self.utf_bom else 0
         pgn_start(self.depth)
         self._started = True
         return self
 
     def __exit__(self, exc_type, exc_value, traceback) -> bool:
-        if hasattr(self, "f"):
-            try:
-                self.f.close()
-            except Exception:
-                pass
-
-        if self.tmp_file:
-            try:
-                os.remove(self.tmp_file)
-            except OSError:
-                pass
+        self.close()
+        return False  # no suprimir excepciones del bloque with
 
+    def close(self) -> None:
+        """
+        Releases the map and the file, to call when it is not used with 'with', in Windows a file mapped
+        can't be removed or renamed.
+        """
+        self._release()
+
+    def __dealloc__(self):
+        self._release()
+
+    cdef void _release(self):
+        if self.has_buf:
+            self.has_buf = False
+            self.data = NULL
+            PyBuffer_Release(&self.buf)
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.f is not None:
+            self.f.close()
+            self.f = None
         if self._started:
-            try:
-                pgn_stop()
-            except Exception:
-                pass
+            pgn_stop()
             self._started = False
 
-        return False  # no suprimir excepciones del bloque with
-
-    def __iter__(self) -> Iterator:
-        return self
-
-    def __next__(self) -> Tuple:
-        self.inicio = self.f.tell()
-        readline = self.f.readline
-
-        labels_values: Dict[bytes, bytes] = {}
-        labels_keys: Dict[bytes, bytes] = {}
-
-        body_lines: List[bytes] = []
+    cdef Py_ssize_t _line_end(self, Py_ssize_t pos):
+        cdef const char *p = <const char *>memchr(self.data + pos, self.eol, self.size - pos)
+        return self.size if p == NULL else (p - self.data) + 1
+
+    cdef bint _is_label(self, Py_ssize_t pos, Py_ssize_t pos_end, Py_ssize_t *ini, Py_ssize_t *end):
+        # ini, end: line without blanks
+        while pos < pos_end and is_blank(self.data[pos]):
+            pos += 1
+        while pos_end > pos and is_blank(self.data[pos_end - 1]):
+            pos_end -= 1
+        ini[0] = pos
+        end[0] = pos_end
+        return pos_end > pos and self.data[pos] == b"[" and self.data[pos_end - 1] == b"]"
+
+    cdef bint _scan(self, dict values, dict keys):
+        """
+        Next game from self.pos: self.inicio, self.body_ini, self.final, and the labels if values is not None.
+        """
+        cdef Py_ssize_t pos = self.pos, nxt, ini, end
+        cdef Py_ssize_t limit = self.end if self.end else self.size
+
+        self.inicio = pos
+        if pos >= limit or not self.has_buf:
+            return False
 
         while True:
-            line = readline()
-            if not line:
-                raise StopIteration
+            if pos >= self.size:
+                self.pos = pos
+                return False
+            nxt = self._line_end(pos)
+            if self._is_label(pos, nxt, &ini, &end):
+                if values is not None:
+                    self._parse_label(ini, end, values, keys)
+            elif end > ini:
+                self.body_ini = pos
+                pos = nxt
+                break
+            pos = nxt
 
-            stripped = line.strip()
+        while pos < self.size:
+            nxt = self._line_end(pos)
+            if self._is_label(pos, nxt, &ini, &end):
+                break
+            pos = nxt
 
-            if stripped.startswith(b"[") and stripped.endswith(b"]"):
-                self._parse_label(stripped, labels_values, labels_keys)
-                continue
+        self.final = self.pos = pos
+        return True
 
-            if stripped:
-                body_lines.append(line)
-                break
+    cdef _parse_label(self, Py_ssize_t ini, Py_ssize_t end, dict values, dict keys):
+        cdef Py_ssize_t pos_space
+        if end - ini < 4:
+            return
+        ini += 1
+        end -= 1
+        while ini < end and is_blank(self.data[ini]):
+            ini += 1
+        while end > ini and is_blank(self.data[end - 1]):
+            end -= 1
+
+        pos_space = ini
+        while pos_space < end and self.data[pos_space] != b" ":
+            pos_space += 1
+        if pos_space >= end:
+            return
+        key = self.data[ini:pos_space]
 
-        while True:
-            pos = self.f.tell()
-            line = readline()
-            if not line:
-                break
+        ini = pos_space + 1
+        while ini < end and is_blank(self.data[ini]):
+            ini += 1
+        while ini < end and self.data[ini] == b'"':
+            ini += 1
+        while end > ini and self.data[end - 1] == b'"':
+            end -= 1
 
-            stripped = line.strip()
+        key_upper = key.upper()
+        values[key_upper] = self.data[ini:end]
+        keys[key_upper] = key
 
-            if stripped.startswith(b"[") and stripped.endswith(b"]"):
-                self.f.seek(pos)
-                break
+    def __iter__(self) -> Iterator:
+        return self
 
-            body_lines.append(line)
+    def __next__(self) -> Tuple:
+        cdef dict labels_values, labels_keys
+        while True:
+            labels_values = {}
+            labels_keys = {}
+            if not self._scan(labels_values, labels_keys):
+                raise StopIteration
 
-        body = b"".join(body_lines)
+            body = self.data[self.body_ini:self.final]
+            if self.eol == 13:
+                body = body.replace(b"\r", b"\n")
 
-        fen = labels_values.get(b"FEN", b"")
+            fen = labels_values.get(b"FEN", b"")
 
-        try:
-            pgn_read(body, fen)
-        except Exception as e:
-            return self.__next__()
+            try:
+                pgn_read(body, fen)
+            except Exception:
+                continue
+            break
 
         pv = pgn_pv()
         is_raw = pgn_raw()
         fens = [pgn_fen(i) for i in range(pgn_numfens())]
 
-        self.final = self.f.tell()
-
         return (
             body,
             is_raw,
@@ -282,35 +349,18 @@ class PGNreader:
             self.final,
         )
 
-    @staticmethod
-    def _parse_label(
-        line: bytes,
-        values: Dict[bytes, bytes],
-        keys: Dict[bytes, bytes],
-    ) -> None:
-
-        cdef Py_ssize_t n = len(line)
-        if n < 4:
-            return
-        content = line[1:n-1].strip()
-
-        try:
-            key, rest = content.split(b" ", 1)
-            value = rest.strip().strip(b'"')
-        except ValueError:
-            return
-
-        key_upper = key.upper()
-        values[key_upper] = value
-        keys[key_upper] = key
+    def games_raw(self) -> Iterator:
+        """
+        (offset, length) of the games, without parsing the moves nor the labels.
+        """
+        while self._scan(None, None):
+            yield self.inicio, self.final - self.inicio
 
     def bpgn(self) -> bytes:
-        if not hasattr(self, "f") or self.f.closed:
+        if not self.has_buf:
             return b""
-        self.f.seek(self.inicio)
-        return self.f.read(self.final - self.inicio)
-
-
+        bpgn = self.data[self.inicio:self.final]
+        return bpgn.replace(b"\r", b"\n") if self.eol == 13 else bpgn
 
 
 def xpgn_pv(pgn: str) -> str:
@@ -889,6 +939,163 @@ def fen_ended(fen):
     return set_fen(fen) == 0
 
 
+cdef class Board:
+    """
+    Position with its own irina board, the module functions (set_fen, make_move, get_fen...) share a global one.
+    Each method selects this board, works with it and restores the previous one while holding the GIL,
+    so boards can be interleaved freely and used from worker threads.
+    make_move/move_expv keep the history to allow unmake_move, play is faster for long sequences without undo.
+    """
+    cdef void *ptr
+
+    def __cinit__(self, fen=None):
+        self.ptr = board_new()
+        if self.ptr is NULL:
+            raise MemoryError()
+
+    def __init__(self, fen=None):
+        if fen:
+            self.set_fen(fen)
+
+    def __dealloc__(self):
+        if self.ptr is not NULL:
+            board_free(self.ptr)
+            self.ptr = NULL
+
+    def copy(self):
+        cdef Board other = Board()
+        board_copy(other.ptr, self.ptr)
+        return other
+
+    def set_fen(self, fen: str) -> int:
+        cdef int nmoves
+        bfen = fen.encode("utf-8")
+        prev = board_select(self.ptr)
+        fen_board(bfen)
+        nmoves = movegen()
+        board_select(prev)
+        return nmoves
+
+    def set_init_fen(self):
+        prev = board_select(self.ptr)
+        fen_board(b"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+        movegen()
+        board_select(prev)
+
+    def get_fen(self) -> str:
+        cdef char fen[256]
+        prev = board_select(self.ptr)
+        board_fen(fen)
+        board_select(prev)
+        return fen.decode("utf-8")
+
+    def get_fenm2(self) -> str:
+        cdef char fen[256]
+        prev = board_select(self.ptr)
+        board_fenM2(fen)
+        board_select(prev)
+        return fen.decode("utf-8")
+
+    def num_moves(self) -> int:
+        prev = board_select(self.ptr)
+        n = num_moves()
+        board_select(prev)
+        return n
+
+    def get_moves(self) -> list:
+        prev = board_select(self.ptr)
+        li = get_moves()
+        board_select(prev)
+        return li
+
+    def get_exmoves(self) -> list:
+        prev = board_select(self.ptr)
+        li = get_exmoves()
+        board_select(prev)
+        return li
+
+    def ischeck(self) -> bool:
+        prev = board_select(self.ptr)
+        check = incheck()
+        board_select(prev)
+        return bool(check)
+
+    def is_finished(self) -> bool:
+        return self.num_moves() == 0
+
+    def is_mate(self) -> bool:
+        return self.num_moves() == 0 and self.ischeck()
+
+    cdef int _search(self, str a1h8):
+        bfrom = a1h8[:2].encode("utf-8")
+        bto = a1h8[2:4].encode("utf-8")
+        bpromotion = a1h8[4:].encode("utf-8")
+        return search_move(bfrom, bto, bpromotion)
+
+    def get_pgn(self, from_a1h8: str, to_a1h8: str, promotion: str) -> str:
+        cdef char san[32]
+        prev = board_select(self.ptr)
+        num = self._search(from_a1h8 + to_a1h8 + (promotion or ""))
+        if num != -1:
+            to_san(num, san)
+        board_select(prev)
+        return None if num == -1 else san.decode("utf-8")
+
+    def move_expv(self, xfrom: str, xto: str, promotion: str):
+        prev = board_select(self.ptr)
+        num = self._search(xfrom + xto + (promotion or ""))
+        if num == -1:
+            board_select(prev)
+            return None
+        info_move = InfoMove(num)
+        resp = board_make_nummove(num, 1)
+        board_select(prev)
+        if resp < 0:
+            raise OverflowError("Board history is full")
+        return info_move
+
+    def play_expv(self, xfrom: str, xto: str, promotion: str):
+        prev = board_select(self.ptr)
+        num = self._search(xfrom + xto + (promotion or ""))
+        if num == -1:
+            board_select(prev)
+            return None
+        info_move = InfoMove(num)
+        board_make_nummove(num, 0)
+        board_select(prev)
+        return info_move
+
+    def make_move(self, a1h8: str) -> bool:
+        prev = board_select(self.ptr)
+        num = self._search(a1h8)
+        resp = board_make_nummove(num, 1) if num != -1 else 0
+        board_select(prev)
+        if resp < 0:
+            raise OverflowError("Board history is full")
+        return num != -1
+
+    def unmake_move(self) -> bool:
+        prev = board_select(self.ptr)
+        ok = board_unmake()
+        board_select(prev)
+        return ok == 1
+
+    def play(self, a1h8: str) -> bool:
+        prev = board_select(self.ptr)
+        num = self._search(a1h8)
+        if num != -1:
+            board_make_nummove(num, 0)
+        board_select(prev)
+        return num != -1
+
+    def play_pv(self, pv: str) -> bool:
+        if pv:
+            for a1h8 in pv.split(" "):
+                if not self.play(a1h8):
+                    return False
+        return True
+
+
 def xparse_body(fen, body):
     body = bytes(body, "utf-8")
     fen = bytes(fen, "utf-8")
@@ -45,6 +45,64 @@ def string_movepolyglot(cmove):
     return move_from_string(cmove.encode())
 
 
+def xpv_polyglot(fen, xpv, int plies, bint with_white=True, bint with_black=True, bint in_opening=False):
+    """
+    [(is_white, key, move)...] of the first plies moves of the xpv from fen, the key is updated move by move,
+    without fens. with_white, with_black: sides whose moves are returned.
+    in_opening: stops in the first position of a returned side that is not in the opening.
+    """
+    cdef int n, i, size
+    cdef unsigned long long *keys
+    cdef unsigned int *moves
+    cdef char *sides
+
+    bxpv = xpv.encode()
+    size = min(plies, len(bxpv) // 2)
+    if size <= 0:
+        return []
+    keys = <unsigned long long *>malloc(size * sizeof(unsigned long long))
+    moves = <unsigned int *>malloc(size * sizeof(unsigned int))
+    sides = <char *>malloc(size)
+    try:
+        n = polyglot_xpv(fen.encode(), bxpv, size, with_white, with_black, in_opening, keys, moves, sides)
+        return [(sides[i] == 1, keys[i], moves[i]) for i in range(n)]
+    finally:
+        free(keys)
+        free(moves)
+        free(sides)
+
+
+def xpv_polyglot_keys(fen, xpv, targets=None):
+    """
+    [key...] of the positions after every move of the xpv from fen, the key is updated move by move, without fens.
+    targets: [(pawns_out, men)...] of the positions looked up, pawns_out with the bits 0-7 of the white pawns out of
+    a2-h2 and 8-15 of the black pawns out of a7-h7, the keys end in the first position from which none of them can
+    be reached.
+    """
+    cdef int n, i, size, num_targets
+    cdef unsigned long long *keys
+    cdef unsigned int *pawns_out
+    cdef int *men
+
+    bxpv = xpv.encode()
+    size = len(bxpv) // 2
+    if size <= 0:
+        return []
+    num_targets = len(targets) if targets else 0
+    keys = <unsigned long long *>malloc(size * sizeof(unsigned long long))
+    pawns_out = <unsigned int *>malloc((num_targets + 1) * sizeof(unsigned int))
+    men = <int *>malloc((num_targets + 1) * sizeof(int))
+    try:
+        for i in range(num_targets):
+            pawns_out[i], men[i] = targets[i]
+        n = polyglot_xpv_keys(fen.encode(), bxpv, pawns_out, men, num_targets, keys)
+        return [keys[i] for i in range(n)]
+    finally:
+        free(keys)
+        free(pawns_out)
+        free(men)
+
+
 class Entry:
     key = 0
     move = 0
@@ -26,6 +26,13 @@ void get_move( int num, char * pv );
 char *board_fen(char *fen);
 char *board_fenM2(char *fen);
 
+void *board_new(void);
+void board_free(void *b);
+void *board_select(void *b);
+void board_copy(void *dst, void *src);
+int board_make_nummove(int num, int keep_history);
+int board_unmake(void);
+
 int num_base_move( void );
 int search_move( char *desde, char *hasta, char * promotion );
 void get_move_ex( int num, char * info );
@@ -58,4 +65,9 @@ void set_ext_fen_body(char * ext_fen, char * ext_body, char * ext_pv );
 
 void pv_xpv_c(const char* pv, char* res);
 
+int polyglot_xpv(char *fen, char *xpv, int plies, int with_white, int with_black, int in_opening,
+                 unsigned long long *keys, unsigned int *moves, char *is_white);
+int polyglot_xpv_keys(char *fen, char *xpv, unsigned int *pawns_out, int *men, int num_targets,
+                      unsigned long long *keys);
+
 #endif
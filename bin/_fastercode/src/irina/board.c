@@ -1,6 +1,7 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <stddef.h>
 #include "defs.h"
 #include "protos.h"
 #include "globals.h"
@@ -10,8 +11,6 @@ void init_board() {
 }
 
 
-static Board stb;
-
 void fen_board(char *fen) {
     int i, f, c;
     char xmoves[256];
@@ -22,7 +21,7 @@ void fen_board(char *fen) {
     if( !HASH_wk ) init_hash();
     init_data();
 
-    board = stb;
+    memset(&board, 0, offsetof(Board, moves));
     board.fifty = 0;
     board.fullmove = 1;
 
@@ -322,3 +321,292 @@ Bitmap board_hashkey(void) {
     return h;
 }
 
+
+/*
+ * Independent boards.
+ * All the irina routines work on *cur_board, so every caller can own its own Board
+ * and select it before working with it. The default board is board_main.
+ */
+
+void *board_new(void) {
+    Board *b, *prev;
+
+    b = (Board *) calloc(1, sizeof(Board));
+    if (b) {
+        prev = board_select(b);
+        init_board();
+        movegen();
+        board_select(prev);
+    }
+    return b;
+}
+
+void board_free(void *b) {
+    if (b == cur_board) board_select(NULL);
+    free(b);
+}
+
+void *board_select(void *b) {
+    Board *prev = cur_board;
+    cur_board = b ? (Board *) b : &board_main;
+    return prev;
+}
+
+void board_copy(void *dst, void *src) {
+    Board *d = (Board *) dst;
+    Board *s = (Board *) src;
+
+    // Only the used part of the move stack and history
+    memcpy(d, s, offsetof(Board, moves));
+    memcpy(d->moves, s->moves, s->ply_moves[s->ply] * sizeof(MoveBin));
+    memcpy(d->ply_moves, s->ply_moves, (s->ply + 1) * sizeof(unsigned));
+    memcpy(d->history, s->history, (s->ply + 1) * sizeof(History));
+}
+
+int board_make_nummove(int num, int keep_history) {
+    if (keep_history) {
+        if (board.ply >= MAX_GAMELINE - 2 || board.idx_moves >= MAX_MOVES - 256) return -1;
+        return make_nummove(num);
+    }
+    make_move(board.moves[num]);
+    board_reset();
+    return movegen();
+}
+
+int board_unmake(void) {
+    if (board.ply <= 1) return 0;
+    unmake_move();
+    return 1;
+}
+
+
+/*
+ * Polyglot keys.
+ * The key of the position is calculated from the board, without the fen, and updated with the squares changed
+ * by every move, to build books from the games of the databases.
+ */
+
+extern Bitmap Random64[781];
+
+#define PG_RANDOM_PIECE(piece, sq) Random64[64 * PG_PIECE[piece] + (sq)]
+#define PG_RANDOM_CASTLE           (Random64 + 768)
+#define PG_RANDOM_EP               (Random64 + 772)
+#define PG_RANDOM_TURN             Random64[780]
+
+// irina piece -> polyglot piece (pPnNbBrRqQkK)
+static const int PG_PIECE[16] = {-1, 1, 11, 3, -1, 5, 7, 9, -1, 0, 10, 2, -1, 4, 6, 8};
+
+// irina promotion & 7 -> polyglot promotion ( nbrq)
+static const int PG_PROMOTION[8] = {0, 0, 0, 1, 0, 2, 3, 4};
+
+static Bitmap polyglot_castle(unsigned castle) {
+    Bitmap key = 0;
+
+    if (castle & CASTLE_OO_WHITE) key ^= PG_RANDOM_CASTLE[0];
+    if (castle & CASTLE_OOO_WHITE) key ^= PG_RANDOM_CASTLE[1];
+    if (castle & CASTLE_OO_BLACK) key ^= PG_RANDOM_CASTLE[2];
+    if (castle & CASTLE_OOO_BLACK) key ^= PG_RANDOM_CASTLE[3];
+    return key;
+}
+
+// As in the fen, the en passant square only counts when a pawn can capture
+static Bitmap polyglot_ep(void) {
+    unsigned ep = board.ep;
+    unsigned pawn;
+    int dl, dr;
+
+    if (!ep) return 0;
+    if (board.color == WHITE) {
+        pawn = WHITE_PAWN;
+        dl = -9;
+        dr = -7;
+    } else {
+        pawn = BLACK_PAWN;
+        dl = 7;
+        dr = 9;
+    }
+    if (((ep % 8) > 0 && board.pz[ep + dl] == pawn) || ((ep % 8) < 7 && board.pz[ep + dr] == pawn)) {
+        return PG_RANDOM_EP[ep % 8];
+    }
+    return 0;
+}
+
+Bitmap board_polyglot_key(void) {
+    Bitmap key = 0;
+    int sq;
+
+    for (sq = 0; sq < 64; sq++) {
+        if (board.pz[sq]) key ^= PG_RANDOM_PIECE(board.pz[sq], sq);
+    }
+    key ^= polyglot_castle(board.castle);
+    key ^= polyglot_ep();
+    if (board.color == WHITE) key ^= PG_RANDOM_TURN;
+    return key;
+}
+
+unsigned int polyglot_move(int num) {
+    MoveBin move = board.moves[num];
+
+    return (PG_PROMOTION[move.promotion & 7] << 12) | (move.from << 6) | move.to;
+}
+
+// Makes the move num, and returns the key updated
+Bitmap polyglot_make_nummove(Bitmap key, int num) {
+    MoveBin move = board.moves[num];
+    int squares[4];
+    unsigned before[4];
+    int n = 0, i, rank;
+
+    squares[n++] = move.from;
+    squares[n++] = move.to;
+    if (move.is_ep) {
+        squares[n++] = (move.from & 070) | (move.to & 07);
+    } else if (move.is_castle) {
+        rank = move.from & 070;
+        squares[n++] = rank + ((move.is_castle & CASTLE_OO) ? 7 : 0);
+        squares[n++] = rank + ((move.is_castle & CASTLE_OO) ? 5 : 3);
+    }
+    for (i = 0; i < n; i++) {
+        before[i] = board.pz[squares[i]];
+    }
+    key ^= polyglot_castle(board.castle) ^ polyglot_ep();
+
+    board_make_nummove(num, 0);
+
+    for (i = 0; i < n; i++) {
+        if (before[i]) key ^= PG_RANDOM_PIECE(before[i], squares[i]);
+        if (board.pz[squares[i]]) key ^= PG_RANDOM_PIECE(board.pz[squares[i]], squares[i]);
+    }
+    key ^= polyglot_castle(board.castle) ^ polyglot_ep();
+    return key ^ PG_RANDOM_TURN;
+}
+
+// Position.phase() == OPENING
+int board_in_opening(void) {
+    static const int NPM[16] = {0, 0, 0, 1, 0, 1, 2, 4, 0, 0, 0, 1, 0, 1, 2, 4};
+    static const int SQ_WHITE[4] = {B1, C1, F1, G1};
+    static const int SQ_BLACK[4] = {B8, C8, F8, G8};
+    int npm = 0, white_developed = 0, black_developed = 0;
+    int i;
+    unsigned piece;
+
+    for (i = 0; i < 64; i++) {
+        npm += NPM[board.pz[i]];
+    }
+    if (npm < 10) return 0;
+
+    for (i = 0; i < 4; i++) {
+        piece = board.pz[SQ_WHITE[i]];
+        if (piece != WHITE_KNIGHT && piece != WHITE_BISHOP) white_developed++;
+        piece = board.pz[SQ_BLACK[i]];
+        if (piece != BLACK_KNIGHT && piece != BLACK_BISHOP) black_developed++;
+    }
+    if (white_developed >= 3 && black_developed >= 3) return 0;
+    if (!(board.castle & (CASTLE_OO_WHITE | CASTLE_OOO_WHITE)) && white_developed == 4) return 0;
+    if (!(board.castle & (CASTLE_OO_BLACK | CASTLE_OOO_BLACK)) && black_developed == 4) return 0;
+
+    return npm >= 20;
+}
+
+static int search_nummove(int from, int to, int promotion) {
+    int i;
+    MoveBin move;
+
+    for (i = board.ply_moves[board.ply - 1]; i < (int) board.ply_moves[board.ply]; i++) {
+        move = board.moves[i];
+        if (move.from == from && move.to == to && (move.promotion & 7) == promotion) return i;
+    }
+    return -1;
+}
+
+// Number of the next move of the xpv in the moves generated, and advances x; -1 when it is not legal
+static int xpv_nummove(unsigned char **px) {
+    static const int XPV_PROMOTION[4] = {WHITE_QUEEN, WHITE_ROOK, WHITE_BISHOP, WHITE_KNIGHT};
+    unsigned char *x = *px;
+    int from, to, promotion = 0;
+
+    if (x[0] < 58 || x[1] < 58) return -1;
+    from = x[0] - 58;
+    to = x[1] - 58;
+    x += 2;
+    if (*x >= 50 && *x <= 53) {
+        promotion = XPV_PROMOTION[*x - 50] & 7;
+        x++;
+    }
+    *px = x;
+    return search_nummove(from, to, promotion);
+}
+
+/*
+ * Polyglot keys and moves of the first plies moves of a xpv from fen.
+ * with_white, with_black: sides whose moves are returned, is_white[n] is the side of the move n.
+ * in_opening: stops in the first position of a returned side that is not in the opening.
+ * Returns the number of moves, the buffers must have room for plies moves.
+ */
+int polyglot_xpv(char *fen, char *xpv, int plies, int with_white, int with_black, int in_opening,
+                 Bitmap *keys, unsigned int *moves, char *is_white) {
+    unsigned char *x = (unsigned char *) xpv;
+    int n = 0, ply, num, white;
+    Bitmap key;
+
+    fen_board(fen);
+    movegen();
+    key = board_polyglot_key();
+    for (ply = 0; ply < plies; ply++) {
+        num = xpv_nummove(&x);
+        if (num < 0) break;
+
+        white = board.color == WHITE;
+        if (white ? with_white : with_black) {
+            if (in_opening && !board_in_opening()) break;
+            keys[n] = key;
+            moves[n] = polyglot_move(num);
+            is_white[n] = white;
+            n++;
+        }
+        key = polyglot_make_nummove(key, num);
+    }
+    return n;
+}
+
+/*
+ * Polyglot keys of the positions after every move of a xpv from fen, to look them up in a table.
+ * The positions of the table are summarized by pawns_out (bits 0-7: white pawns out of a2-h2, 8-15: black pawns out
+ * of a7-h7) and men, num_targets of them (0 to walk all the moves). Captures and pawn moves are irreversible, so the
+ * walk stops in the first position from which none of them can be reached.
+ * Returns the number of keys, the buffer must have room for the moves of the xpv.
+ */
+int polyglot_xpv_keys(char *fen, char *xpv, unsigned int *pawns_out, int *men, int num_targets, Bitmap *keys) {
+    unsigned char *x = (unsigned char *) xpv;
+    int n = 0, num, sq, i, pos_men, last_men = -1;
+    unsigned int pos_out, last_out = 0;
+    Bitmap key;
+
+    fen_board(fen);
+    movegen();
+    key = board_polyglot_key();
+    while ((num = xpv_nummove(&x)) >= 0) {
+        key = polyglot_make_nummove(key, num);
+        if (num_targets) {
+            pos_men = 0;
+            for (sq = 0; sq < 64; sq++) {
+                if (board.pz[sq]) pos_men++;
+            }
+            pos_out = 0;
+            for (i = 0; i < 8; i++) {
+                if (board.pz[A1 + 8 + i] != WHITE_PAWN) pos_out |= 1 << i;
+                if (board.pz[A1 + 48 + i] != BLACK_PAWN) pos_out |= 1 << (8 + i);
+            }
+            if (pos_men != last_men || pos_out != last_out) {
+                for (i = 0; i < num_targets; i++) {
+                    if ((pawns_out[i] & pos_out) == pos_out && men[i] <= pos_men) break;
+                }
+                if (i == num_targets) break;
+                last_men = pos_men;
+                last_out = pos_out;
+            }
+        }
+        keys[n++] = key;
+    }
+    return n;
+}
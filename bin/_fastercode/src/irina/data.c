@@ -5,7 +5,8 @@
 #include "defs.h"
 #include "protos.h"
 
-Board board;
+Board board_main;
+Board *cur_board = &board_main;
 Bitmap BITSET[64];
 Bitmap FREEWAY[64][64];
 Bitmap WHITE_PAWN_ATTACKS[64];
@@ -1,7 +1,9 @@
 #ifndef IRINA_GLOBALS_H
 #define IRINA_GLOBALS_H
 
-extern Board  board;
+extern Board  board_main;
+extern Board  *cur_board;
+#define board (*cur_board)
 extern Bitmap BITSET[64];
 extern Bitmap FREEWAY[64][64];
 extern Bitmap WHITE_PAWN_ATTACKS[64];
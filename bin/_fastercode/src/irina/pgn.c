@@ -51,6 +51,7 @@ void pgn_stop( void )
     for( i=0; i < MAX_MDEPTH; i++)
     {
         free(fens[i]);
+        fens[i] = NULL;
     }
 }
 
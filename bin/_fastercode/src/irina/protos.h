@@ -57,6 +57,19 @@ void bitmap_pz(unsigned pz[], Bitmap bm, int piece);
 char *board_fen(char *fen);
 char *board_fenM2(char *fen);
 Bitmap board_hashkey(void);
+void *board_new(void);
+void board_free(void *b);
+void *board_select(void *b);
+void board_copy(void *dst, void *src);
+int board_make_nummove(int num, int keep_history);
+int board_unmake(void);
+Bitmap board_polyglot_key(void);
+unsigned int polyglot_move(int num);
+Bitmap polyglot_make_nummove(Bitmap key, int num);
+int board_in_opening(void);
+int polyglot_xpv(char *fen, char *xpv, int plies, int with_white, int with_black, int in_opening,
+                 Bitmap *keys, unsigned int *moves, char *is_white);
+int polyglot_xpv_keys(char *fen, char *xpv, unsigned int *pawns_out, int *men, int num_targets, Bitmap *keys);
 
 // movegen.c
 int movegen(void);